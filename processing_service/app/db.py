@@ -100,6 +100,35 @@ def upsert_transcription(data):
     cur.close()
     conn.close()
 
+def upsert_transcription_result(data):
+    # Schreibt nur die Ergebnisfelder einer Transkription; Meeting-Infos und Teilnehmer bleiben erhalten
+    data = data.copy()
+    filepath = data.pop("filepath")
+    data["filename"] = os.path.basename(filepath)
+    data["transcription_inputpath"] = filepath
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO transcriptions (
+            filename, transcription_inputpath, recording_date, detected_language, transcript_text, corrected_text,
+            participants_firstname, participants_lastname, transcription_duration, audio_duration, created_at, transcription_status
+        ) VALUES (
+            %(filename)s, %(transcription_inputpath)s, %(recording_date)s, %(detected_language)s, %(transcript_text)s, '',
+            '', '', %(transcription_duration)s, %(audio_duration)s, %(created_at)s, %(transcription_status)s
+        )
+        ON CONFLICT (filename) DO UPDATE SET
+            transcription_inputpath = EXCLUDED.transcription_inputpath,
+            recording_date = EXCLUDED.recording_date,
+            detected_language = EXCLUDED.detected_language,
+            transcript_text = EXCLUDED.transcript_text,
+            transcription_duration = EXCLUDED.transcription_duration,
+            audio_duration = EXCLUDED.audio_duration,
+            transcription_status = EXCLUDED.transcription_status;
+    """, data)
+    conn.commit()
+    cur.close()
+    conn.close()
+
 def upsert_mp3_file(filepath):
     filename = os.path.basename(filepath)
     transcription_inputpath = filepath  # kompletter Pfad inkl. Dateiname
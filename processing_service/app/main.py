@@ -3,9 +3,9 @@ from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from pydantic import BaseModel
 from .sync import sync_recipient_names
-from .transcript import tokenize_transcript, replace_tokens
+from .transcript import tokenize_transcript, replace_tokens, format_transcript
 from .matcher import match_tokens
-from .db import init_db, upsert_transcription, upsert_mp3_file, get_db_connection, update_transcription_meeting_info, get_pending_transcriptions
+from .db import init_db, upsert_transcription, upsert_transcription_result, upsert_mp3_file, get_db_connection, update_transcription_meeting_info, get_pending_transcriptions
 from .confluence import (
     build_auth_header,
     get_space_id,
@@ -17,7 +17,10 @@ from typing import Optional
 import json
 import os
 import glob
+import hashlib
+import hmac
 import re
+import time
 from datetime import datetime
 import pytz
 from dotenv import load_dotenv
@@ -27,6 +30,8 @@ load_dotenv()
 
 app = FastAPI()
 
+TRANSCRIPTION_FINISHED_DIR = "/data/shared/transcription_finished"
+
 # Initialisiere die DB beim Start
 @app.on_event("startup")
 def on_startup():
@@ -131,16 +136,24 @@ def sync_now():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def parse_recording_date(base_name):
+    # Zeitstempel aus Dateiname ("YYYY-MM-DD HH-MM-SS"), mit lokaler Zeitzone aus .env
+    local_tz = pytz.timezone(os.getenv("TIMEZONE", "Europe/Berlin"))
+    m = re.match(r"(\d{4}-\d{2}-\d{2}) (\d{2}-\d{2}-\d{2})", base_name)
+    if m:
+        date_str = m.group(1) + " " + m.group(2).replace("-", ":")
+        try:
+            return local_tz.localize(datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S"))
+        except Exception:
+            pass
+    return datetime.utcnow().replace(tzinfo=pytz.UTC)
+
 @app.post("/update_transcript_data")
 def update_transcript_data():
-    base_dir = "/data/shared/transcription_finished"
+    base_dir = TRANSCRIPTION_FINISHED_DIR
     json_files = glob.glob(os.path.join(base_dir, "*.json"))
     processed = []
     
-    # Zeitzone aus .env laden
-    timezone_str = os.getenv("TIMEZONE", "Europe/Berlin")
-    local_tz = pytz.timezone(timezone_str)
-    
     for json_path in json_files:
         base_name = os.path.splitext(os.path.basename(json_path))[0]
         txt_path = os.path.join(base_dir, base_name + ".txt")
@@ -160,22 +173,10 @@ def update_transcript_data():
                 transcript_text = f.read()
         except Exception as e:
             continue
-        # Zeitstempel aus Dateiname
-        m = re.match(r"(\d{4}-\d{2}-\d{2}) (\d{2}-\d{2}-\d{2})", base_name)
-        if m:
-            date_str = m.group(1) + " " + m.group(2).replace("-", ":")
-            try:
-                recording_date = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
-                # Mit lokaler Zeitzone versehen
-                recording_date = local_tz.localize(recording_date)
-            except Exception:
-                recording_date = datetime.utcnow().replace(tzinfo=pytz.UTC)
-        else:
-            recording_date = datetime.utcnow().replace(tzinfo=pytz.UTC)
         # Datenbank-Eintrag
         data = {
             "filepath": txt_path,
-            "recording_date": recording_date,
+            "recording_date": parse_recording_date(base_name),
             "detected_language": meta.get("metadata", {}).get("language"),
             "set_language": None,
             "transcript_text": transcript_text,
@@ -191,6 +192,59 @@ def update_transcript_data():
         processed.append(base_name)
     return {"status": "success", "processed": processed}
 
+def verify_callback_signature(body, timestamp, signature):
+    # Prüft die HMAC-SHA256-Signatur von whisperX (CALLBACK_SECRET), falls WHISPERX_CALLBACK_SECRET gesetzt ist
+    secret = os.getenv("WHISPERX_CALLBACK_SECRET")
+    if not secret:
+        return
+    if not timestamp or not signature:
+        raise HTTPException(status_code=401, detail="Signatur fehlt.")
+    try:
+        age = abs(time.time() - int(timestamp))
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Ungültiger Zeitstempel.")
+    # Alte Callbacks ablehnen, damit mitgeschnittene Requests nicht wiederholt werden können
+    if age > int(os.getenv("CALLBACK_MAX_AGE_SECONDS", "300")):
+        raise HTTPException(status_code=401, detail="Callback ist zu alt.")
+    expected = "sha256=" + hmac.new(secret.encode(), timestamp.encode() + b"." + body, hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, signature):
+        raise HTTPException(status_code=401, detail="Ungültige Signatur.")
+
+@app.post("/transcription_callback")
+async def transcription_callback(request: Request):
+    # Nimmt das Ergebnis eines whisperX-Tasks (callback_url) entgegen und schreibt es direkt in transcriptions.
+    # Gleicher Eintrag wie /update_transcript_data für die Dateien in /data/shared/transcription_finished.
+    body = await request.body()
+    verify_callback_signature(
+        body,
+        request.headers.get("X-WhisperX-Timestamp"),
+        request.headers.get("X-WhisperX-Signature"),
+    )
+    try:
+        task = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body muss JSON sein.")
+    # Fehlgeschlagene Tasks werden nur quittiert, damit whisperX nicht erneut sendet
+    if task.get("status") != "completed":
+        return {"status": "ignored", "identifier": task.get("identifier"), "task_status": task.get("status")}
+    meta = task.get("metadata") or {}
+    if not meta.get("file_name"):
+        raise HTTPException(status_code=400, detail="metadata.file_name fehlt.")
+    base_name = os.path.splitext(os.path.basename(meta["file_name"]))[0]
+    result = task.get("result") or {}
+    data = {
+        "filepath": os.path.join(TRANSCRIPTION_FINISHED_DIR, base_name + ".txt"),
+        "recording_date": parse_recording_date(base_name),
+        "detected_language": meta.get("language") or result.get("language"),
+        "transcript_text": format_transcript(result.get("segments", [])),
+        "transcription_duration": meta.get("duration"),
+        "audio_duration": meta.get("audio_duration"),
+        "created_at": datetime.utcnow(),
+        "transcription_status": "imported"
+    }
+    upsert_transcription_result(data)
+    return {"status": "success", "filename": base_name + ".txt", "identifier": task.get("identifier")}
+
 @app.post("/import_mp3_files")
 def import_mp3_files():
     base_dir = "/data/shared/transcription_input"
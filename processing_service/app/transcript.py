@@ -12,4 +12,22 @@ def replace_tokens(transcript, matches):
         corrected = match['corrected']
         # Nur ganzes Wort ersetzen
         transcript = re.sub(rf'\b{re.escape(original)}\b', corrected, transcript)
-    return transcript 
\ No newline at end of file
+    return transcript
+
+def format_timestamp(seconds):
+    # Sekunden -> [HH:MM:SS.mmm]
+    total_ms = int(seconds * 1000)
+    ms = total_ms % 1000
+    total_sec = total_ms // 1000
+    return f"[{total_sec // 3600:02d}:{total_sec // 60 % 60:02d}:{total_sec % 60:02d}.{ms:03d}]"
+
+def format_transcript(segments):
+    # Zeitstempel + Speaker + Text je Segment, Blöcke durch Leerzeile getrennt
+    # (gleiches Format wie der Node "Merge Transcript Segments" im n8n-Workflow "Transcribe MP3")
+    lines = []
+    for seg in segments:
+        header = format_timestamp(seg["start"])
+        if seg.get("speaker"):
+            header += f" {seg['speaker']}"
+        lines.append(f"{header}:\n{seg['text'].strip()}")
+    return "\n\n".join(lines)
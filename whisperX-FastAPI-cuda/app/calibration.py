@@ -0,0 +1,249 @@
+"""This module tunes the ASR parameters to the host and serves them as defaults of requests.
+
+Calibration benchmarks WHISPER_MODEL on CPU, one parameter after the other, and
+keeps the fastest value of each in the profile file CALIBRATION_PROFILE. Requests
+leaving ``batch_size``, ``chunk_size``, ``compute_type`` or ``threads`` unset use
+the values of the profile; fields set by a request are never replaced.
+
+Run ``python -m app.calibration`` to calibrate again, e.g. after changing the model.
+"""
+
+import argparse
+import json
+import os
+import platform
+import threading
+from datetime import datetime
+from tempfile import NamedTemporaryFile
+
+from .config import Config
+from .logger import logger
+
+TUNED_FIELDS = ("batch_size", "chunk_size", "compute_type", "threads")
+# Candidates of each field, tried in this order with the best values found so far
+BATCH_SIZES = (4, 8, 16, 32)
+CHUNK_SIZES = (10, 20, 30)
+COMPUTE_TYPES = ("int8", "float32")
+# Options of app.benchmark sweeping each field
+SWEEP_OPTIONS = {
+    "batch_size": "batch_sizes",
+    "chunk_size": "chunk_sizes",
+    "compute_type": "compute_types",
+    "threads": "threads",
+}
+# Share of the host memory the peak RSS of a task may reach
+MEMORY_SHARE = 0.8
+
+_lock = threading.Lock()
+# Modification time and content of the profile file, None if it is missing or invalid
+_cached = (None, None)
+
+
+def host_threads() -> int:
+    """Return the cores available to each of the WORKER_SLOTS tasks running at once."""
+    return max(1, (os.cpu_count() or 4) // max(1, Config.WORKER_SLOTS))
+
+
+def host_memory_mb() -> float:
+    """Return the physical memory of the host in MB, None if it is unknown."""
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / 1024**2
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def host_fingerprint() -> dict:
+    """
+    Describe the host a profile was calibrated on.
+
+    Returns:
+        dict: Architecture, core count, memory and worker slots.
+    """
+    memory_mb = host_memory_mb()
+    return {
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "memory_mb": round(memory_mb) if memory_mb else None,
+        "worker_slots": Config.WORKER_SLOTS,
+    }
+
+
+def static_defaults(device) -> dict:
+    """
+    Return the values of the tuned fields without a calibration.
+
+    Args:
+        device: Device of the request.
+
+    Returns:
+        dict: Value per field of ``TUNED_FIELDS``.
+    """
+    if str(getattr(device, "value", device)) == "cuda":
+        return {
+            "batch_size": 8,
+            "chunk_size": 20,
+            "compute_type": "float16",
+            "threads": 0,
+        }
+    return {
+        "batch_size": 8,
+        "chunk_size": 20,
+        "compute_type": "int8",
+        "threads": host_threads(),
+    }
+
+
+def load_profile() -> dict:
+    """
+    Return the calibration profile of this host.
+
+    The file is read again whenever it changes. Profiles calibrated on another
+    host, e.g. a volume mounted on a bigger machine, are ignored.
+
+    Returns:
+        dict: The profile, or None if there is no valid profile for this host.
+    """
+    global _cached
+    try:
+        mtime = os.stat(Config.CALIBRATION_PROFILE).st_mtime_ns
+    except OSError:
+        return None
+    with _lock:
+        if _cached[0] != mtime:
+            try:
+                with open(Config.CALIBRATION_PROFILE) as file:
+                    profile = json.load(file)
+            except (OSError, ValueError) as exc:
+                logger.warning(
+                    "Ignoring calibration profile %s: %s",
+                    Config.CALIBRATION_PROFILE,
+                    exc,
+                )
+                profile = None
+            if profile is not None and profile.get("host") != host_fingerprint():
+                logger.warning(
+                    "Ignoring calibration profile %s of another host",
+                    Config.CALIBRATION_PROFILE,
+                )
+                profile = None
+            _cached = (mtime, profile)
+        return _cached[1]
+
+
+def host_defaults(device) -> dict:
+    """
+    Return the values of the tuned fields for requests that leave them unset.
+
+    Args:
+        device: Device of the request; only CPU requests are calibrated.
+
+    Returns:
+        dict: Value per field of ``TUNED_FIELDS``.
+    """
+    defaults = static_defaults(device)
+    profile = load_profile()
+    if profile is not None and str(getattr(device, "value", device)) == "cpu":
+        defaults.update(profile["defaults"]["cpu"])
+    return defaults
+
+
+def save_profile(profile: dict):
+    """
+    Write a calibration profile to CALIBRATION_PROFILE.
+
+    Args:
+        profile (dict): Profile as returned by ``calibrate``.
+    """
+    directory = os.path.dirname(Config.CALIBRATION_PROFILE) or "."
+    os.makedirs(directory, exist_ok=True)
+    with NamedTemporaryFile(
+        "w", dir=directory, suffix=".partial", delete=False
+    ) as file:
+        json.dump(profile, file, indent=2)
+    os.replace(file.name, Config.CALIBRATION_PROFILE)
+
+
+def calibrate(model: str = None, seconds: float = None) -> dict:
+    """
+    Benchmark the ASR on CPU and save the fastest parameters as the profile of this host.
+
+    Starting from the static defaults, the candidates of ``compute_type``,
+    ``threads``, ``batch_size`` and ``chunk_size`` are tried one field at a time,
+    each with the best values found for the fields before. Runs whose peak RSS
+    exceeds the share of memory of one worker slot are not chosen.
+
+    Args:
+        model (str, optional): Whisper model, defaults to WHISPER_MODEL.
+        seconds (float, optional): Length of the benchmark audio, defaults to CALIBRATION_SECONDS.
+
+    Returns:
+        dict: The saved profile, with all benchmark runs.
+
+    Raises:
+        ValueError: If no model is given or configured.
+    """
+    from .benchmark import BUNDLED_AUDIO, benchmark_transcription, load_source, looped
+
+    model = model or Config.WHISPER_MODEL
+    if not model:
+        raise ValueError("Set WHISPER_MODEL to calibrate")
+    seconds = seconds or Config.CALIBRATION_SECONDS
+    audio = BUNDLED_AUDIO if os.path.exists(BUNDLED_AUDIO) else "synthetic"
+    samples, _ = load_source(audio)
+    clips = {float(seconds): looped(samples, seconds)}
+    memory_mb = host_memory_mb()
+    budget_mb = (
+        memory_mb * MEMORY_SHARE / max(1, Config.WORKER_SLOTS) if memory_mb else None
+    )
+
+    best = static_defaults("cpu")
+    candidates = {
+        "compute_type": COMPUTE_TYPES,
+        "threads": sorted({host_threads(), max(1, host_threads() // 2)}),
+        "batch_size": BATCH_SIZES,
+        "chunk_size": CHUNK_SIZES,
+    }
+    runs = []
+    for field, values in candidates.items():
+        args = argparse.Namespace(
+            model=model,
+            language="en" if audio == BUNDLED_AUDIO else None,
+            repeats=1,
+            **{option: [best[name]] for name, option in SWEEP_OPTIONS.items()},
+        )
+        setattr(args, SWEEP_OPTIONS[field], list(values))
+        rows, _ = benchmark_transcription(args, clips)
+        runs += rows
+        fitting = [
+            row
+            for row in rows
+            if row["rtf"] is not None
+            and (budget_mb is None or (row["peak_rss_mb"] or 0.0) <= budget_mb)
+        ]
+        if fitting:
+            best[field] = min(fitting, key=lambda row: row["rtf"])[field]
+        logger.info("Calibrated %s: %s", field, best[field])
+
+    profile = {
+        "host": host_fingerprint(),
+        "model": model,
+        "audio": audio,
+        "audio_seconds": float(seconds),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "defaults": {"cpu": best},
+        "runs": runs,
+    }
+    save_profile(profile)
+    logger.info("Saved calibration profile %s: %s", Config.CALIBRATION_PROFILE, best)
+    return profile
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="python -m app.calibration",
+        description="Calibrate the ASR defaults of this host.",
+    )
+    parser.add_argument("--model", help="Whisper model (default: WHISPER_MODEL)")
+    parser.add_argument("--seconds", type=float, help="Length of the benchmark audio")
+    options = parser.parse_args()
+    print(json.dumps(calibrate(options.model, options.seconds)["defaults"], indent=2))
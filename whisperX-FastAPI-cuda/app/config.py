@@ -1,24 +1,50 @@
 """Configuration module for the WhisperX FastAPI application."""
 
+import ctypes
 import os
+import tempfile
 
-import torch
 from dotenv import load_dotenv
 
 # Load environment variables from .env
 load_dotenv()
 
 
+def cuda_available() -> bool:
+    """
+    Return whether a CUDA device is present.
+
+    NVML is asked directly: importing torch only for this check would add seconds
+    to the start of the service, and unlike the CUDA driver API, NVML does not
+    initialize CUDA in processes that fork workers afterwards.
+
+    Returns:
+        bool: True if NVML reports at least one GPU.
+    """
+    try:
+        nvml = ctypes.CDLL("libnvidia-ml.so.1")
+    except OSError:
+        return False
+    count = ctypes.c_uint(0)
+    if nvml.nvmlInit_v2() != 0:
+        return False
+    try:
+        return nvml.nvmlDeviceGetCount_v2(ctypes.byref(count)) == 0 and count.value > 0
+    finally:
+        nvml.nvmlShutdown()
+
+
+CUDA_AVAILABLE = cuda_available()
+
+
 class Config:
     """Configuration class for WhisperX FastAPI application settings."""
 
     LANG = os.getenv("DEFAULT_LANG", "en")
     HF_TOKEN = os.getenv("HF_TOKEN")
     WHISPER_MODEL = os.getenv("WHISPER_MODEL")
-    DEVICE = os.getenv("DEVICE", "cuda" if torch.cuda.is_available() else "cpu")
-    COMPUTE_TYPE = os.getenv(
-        "COMPUTE_TYPE", "float16" if torch.cuda.is_available() else "int8"
-    )
+    DEVICE = os.getenv("DEVICE", "cuda" if CUDA_AVAILABLE else "cpu")
+    COMPUTE_TYPE = os.getenv("COMPUTE_TYPE", "float16" if CUDA_AVAILABLE else "int8")
     ENVIRONMENT = os.getenv("ENVIRONMENT", "production").lower()
     LOG_LEVEL = os.getenv(
         "LOG_LEVEL", "DEBUG" if ENVIRONMENT == "development" else "INFO"
@@ -37,5 +63,101 @@ class Config:
     }
     VIDEO_EXTENSIONS = {".mp4", ".mov", ".avi", ".wmv", ".mkv"}
     ALLOWED_EXTENSIONS = AUDIO_EXTENSIONS | VIDEO_EXTENSIONS
+    # Largest accepted upload in MB, 0 disables the limit
+    MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "4096"))
+
+    # Downloads of /speech-to-text-url
+    DOWNLOAD_MAX_MB = int(os.getenv("DOWNLOAD_MAX_MB", str(MAX_UPLOAD_MB)))
+    DOWNLOAD_CONNECT_TIMEOUT = float(os.getenv("DOWNLOAD_CONNECT_TIMEOUT", "10"))
+    DOWNLOAD_READ_TIMEOUT = float(os.getenv("DOWNLOAD_READ_TIMEOUT", "60"))
+    DOWNLOAD_MAX_CONNECTIONS = int(os.getenv("DOWNLOAD_MAX_CONNECTIONS", "20"))
+    DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", "3"))
+
+    # Comma separated directories whose files /speech-to-text-path may transcribe in place,
+    # e.g. a volume shared with the workflow engine. Empty disables path submission.
+    SHARED_INPUT_ROOTS = [
+        root.strip()
+        for root in os.getenv("SHARED_INPUT_ROOTS", "").split(",")
+        if root.strip()
+    ]
 
     DB_URL = os.getenv("DB_URL", "sqlite:///records.db")
+
+    # Memory budgets (MB) for models kept resident between tasks
+    MODEL_CACHE_CPU_MB = int(os.getenv("MODEL_CACHE_CPU_MB", "4096"))
+    MODEL_CACHE_GPU_MB = int(os.getenv("MODEL_CACHE_GPU_MB", "8192"))
+    ALIGN_MODEL_CACHE_CPU_MB = int(os.getenv("ALIGN_MODEL_CACHE_CPU_MB", "2048"))
+    ALIGN_MODEL_CACHE_GPU_MB = int(os.getenv("ALIGN_MODEL_CACHE_GPU_MB", "2048"))
+    # Load WHISPER_MODEL at startup and run it on a synthetic clip, for requests with
+    # default options in ASR_WARMUP_LANGUAGE (empty: requests that detect the language)
+    ASR_WARMUP = os.getenv("ASR_WARMUP", "false").lower() == "true"
+    ASR_WARMUP_LANGUAGE = os.getenv("ASR_WARMUP_LANGUAGE") or None
+    # Benchmark WHISPER_MODEL at the first start on a host and use the fastest batch_size,
+    # chunk_size, compute_type and threads for CPU requests that leave them unset
+    CALIBRATE = os.getenv("CALIBRATE", "false").lower() == "true"
+    CALIBRATION_PROFILE = os.getenv(
+        "CALIBRATION_PROFILE",
+        os.path.join(tempfile.gettempdir(), "whisperx-calibration.json"),
+    )
+    CALIBRATION_SECONDS = float(os.getenv("CALIBRATION_SECONDS", "30"))
+    # Comma separated language codes whose alignment models are loaded at startup
+    ALIGN_WARMUP_LANGUAGES = [
+        lang.strip()
+        for lang in os.getenv("ALIGN_WARMUP_LANGUAGES", "").split(",")
+        if lang.strip()
+    ]
+    # Load the diarization pipeline at startup instead of on the first request
+    DIARIZATION_WARMUP = os.getenv("DIARIZATION_WARMUP", "false").lower() == "true"
+    # Diarizations run at the same time as the ASR and alignment of other stages
+    DIARIZATION_WORKERS = int(os.getenv("DIARIZATION_WORKERS", "1"))
+
+    # Content-addressed cache of stage outputs (decoded audio, transcripts, alignments,
+    # diarizations) keyed by the audio hash, 0 MB disables it
+    ARTIFACT_CACHE_DIR = os.getenv(
+        "ARTIFACT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "whisperx-artifacts")
+    )
+    ARTIFACT_CACHE_MB = int(os.getenv("ARTIFACT_CACHE_MB", "2048"))
+
+    # Classes pickled in the model checkpoints, remembered between restarts so the
+    # checkpoints are only scanned once for torch.load(weights_only=True)
+    SAFE_GLOBALS_CACHE = os.getenv(
+        "SAFE_GLOBALS_CACHE",
+        os.path.join(tempfile.gettempdir(), "whisperx-safe-globals.json"),
+    )
+
+    # Durable task queue
+    WORKER_SLOTS = int(os.getenv("WORKER_SLOTS", "1"))
+    TASK_LEASE_SECONDS = int(os.getenv("TASK_LEASE_SECONDS", "300"))
+    TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", "3"))
+    QUEUE_POLL_SECONDS = float(os.getenv("QUEUE_POLL_SECONDS", "2"))
+
+    # Speech segments of concurrently running tasks share model forwards, a segment
+    # waits at most ASR_BATCH_MAX_DELAY_MS for a fuller batch
+    ASR_BATCHING = (
+        os.getenv("ASR_BATCHING", "true" if WORKER_SLOTS > 1 else "false").lower()
+        == "true"
+    )
+    ASR_BATCH_MAX_DELAY_MS = float(os.getenv("ASR_BATCH_MAX_DELAY_MS", "50"))
+
+    # Scheduler: memory budget (MB) shared by the running tasks, and how many seconds of
+    # estimated runtime a task gains in priority per second it waits in the queue
+    SCHEDULER_CPU_MB = int(os.getenv("SCHEDULER_CPU_MB", "16384"))
+    SCHEDULER_GPU_MB = int(os.getenv("SCHEDULER_GPU_MB", "16384"))
+    SCHEDULER_AGING_FACTOR = float(os.getenv("SCHEDULER_AGING_FACTOR", "1.0"))
+
+    # Results of finished tasks POSTed to their callback_url, signed with HMAC-SHA256 if
+    # CALLBACK_SECRET is set; failed deliveries are retried with exponential backoff
+    CALLBACK_SECRET = os.getenv("CALLBACK_SECRET") or None
+    CALLBACK_ATTEMPTS = int(os.getenv("CALLBACK_ATTEMPTS", "5"))
+    CALLBACK_BACKOFF_SECONDS = float(os.getenv("CALLBACK_BACKOFF_SECONDS", "2"))
+    CALLBACK_TIMEOUT_SECONDS = float(os.getenv("CALLBACK_TIMEOUT_SECONDS", "10"))
+    CALLBACK_WORKERS = int(os.getenv("CALLBACK_WORKERS", "2"))
+
+    # Decoded task results kept for repeated polls, limited by the size of their packed JSON
+    RESULT_CACHE_MB = float(os.getenv("RESULT_CACHE_MB", "64"))
+
+    # Long recordings on CPU are transcribed in parallel windows, 0 or 1 process disables it
+    LONG_AUDIO_PROCESSES = int(os.getenv("LONG_AUDIO_PROCESSES", "0"))
+    LONG_AUDIO_THREADS = int(os.getenv("LONG_AUDIO_THREADS", "0"))
+    LONG_AUDIO_MIN_SECONDS = float(os.getenv("LONG_AUDIO_MIN_SECONDS", "1200"))
+    LONG_AUDIO_WINDOW_SECONDS = float(os.getenv("LONG_AUDIO_WINDOW_SECONDS", "600"))
@@ -0,0 +1,244 @@
+"""This module downloads remote media files asynchronously while decoding them with ffmpeg."""
+
+import asyncio
+import os
+from tempfile import NamedTemporaryFile
+
+import httpx
+from fastapi import HTTPException
+
+from .audio import decoded_audio_path, ffmpeg_decode_command
+from .config import Config
+from .files import ALLOWED_EXTENSIONS, validate_extension
+from .logger import logger
+
+MAX_DOWNLOAD_BYTES = Config.DOWNLOAD_MAX_MB * 1024 * 1024
+
+_client = None
+_client_loop = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared, connection pooling HTTP client of the running event loop.
+
+    Returns:
+        httpx.AsyncClient: The shared client.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=httpx.Timeout(
+                Config.DOWNLOAD_READ_TIMEOUT, connect=Config.DOWNLOAD_CONNECT_TIMEOUT
+            ),
+            limits=httpx.Limits(max_connections=Config.DOWNLOAD_MAX_CONNECTIONS),
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_http_client():
+    """Close the shared HTTP client, if it was created."""
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = _client_loop = None
+
+
+def filename_from_response(response: httpx.Response, url: str) -> str:
+    """
+    Return the file name from the Content-Disposition header, or from the URL path.
+
+    Args:
+        response (httpx.Response): Response of the download request.
+        url (str): Requested URL.
+
+    Returns:
+        str: The file name.
+    """
+    content_disposition = response.headers.get("Content-Disposition")
+    if content_disposition and "filename=" in content_disposition:
+        return content_disposition.split("filename=")[1].strip('"')
+    return os.path.basename(httpx.URL(url).path)
+
+
+class StreamingDecoder:
+    """Decode media to a float32 PCM file with ffmpeg while its bytes are still arriving."""
+
+    def __init__(self, pcm_file: str):
+        """
+        Initialize the decoder.
+
+        Args:
+            pcm_file (str): Path the decoded samples are written to.
+        """
+        self.pcm_file = pcm_file
+        self._process = None
+        self._failed = False
+
+    async def start(self):
+        """Start ffmpeg reading from stdin; decoding is skipped if ffmpeg is unavailable."""
+        try:
+            with open(self.pcm_file, "wb") as output:
+                self._process = await asyncio.create_subprocess_exec(
+                    *ffmpeg_decode_command(),
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=output,
+                    stderr=asyncio.subprocess.DEVNULL,
+                )
+        except OSError as e:
+            logger.warning("Streaming decode unavailable: %s", e)
+            self._failed = True
+
+    async def feed(self, chunk: bytes):
+        """Pass a downloaded chunk to ffmpeg."""
+        if self._failed:
+            return
+        try:
+            self._process.stdin.write(chunk)
+            await self._process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # ffmpeg gave up, e.g. on a container that needs a seekable input
+            self._failed = True
+
+    async def finish(self) -> bool:
+        """
+        Wait for ffmpeg to decode the remaining input.
+
+        Returns:
+            bool: True if the PCM file holds the complete decoded audio.
+        """
+        if self._process is not None and not self._failed:
+            try:
+                self._process.stdin.close()
+            except (BrokenPipeError, ConnectionResetError):
+                self._failed = True
+        if self._process is not None and await self._process.wait() != 0:
+            self._failed = True
+        if self._failed or not os.path.getsize(self.pcm_file):
+            self.remove()
+            return False
+        return True
+
+    def abort(self):
+        """Stop ffmpeg after a failed download."""
+        if self._process is not None and self._process.returncode is None:
+            self._process.kill()
+        self.remove()
+
+    def remove(self):
+        """Delete the (partial) PCM file."""
+        if os.path.exists(self.pcm_file):
+            os.remove(self.pcm_file)
+
+
+async def _stream_to_file(url, dest, decoder, client, max_bytes, retries):
+    """Stream ``url`` into ``dest`` and the decoder, resuming with Range requests."""
+    written = 0
+    filename = None
+    attempt = 0
+    while True:
+        headers = {"Range": f"bytes={written}-"} if written else {}
+        try:
+            async with client.stream("GET", url, headers=headers) as response:
+                if response.status_code >= 400:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Could not download {url}: HTTP {response.status_code}",
+                    )
+                if filename is None:
+                    filename = filename_from_response(response, url)
+                    validate_extension(filename, ALLOWED_EXTENSIONS)
+                    await decoder.start()
+                length = response.headers.get("Content-Length")
+                if max_bytes and not written and length and int(length) > max_bytes:
+                    raise _too_large(max_bytes)
+                # A server ignoring the Range header sends the whole file again
+                skip = written if written and response.status_code != 206 else 0
+                # Chunks are written as they arrive, so nothing received is lost on errors
+                async for chunk in response.aiter_bytes():
+                    if skip:
+                        dropped = min(skip, len(chunk))
+                        chunk, skip = chunk[dropped:], skip - dropped
+                        if not chunk:
+                            continue
+                    written += len(chunk)
+                    if max_bytes and written > max_bytes:
+                        raise _too_large(max_bytes)
+                    dest.write(chunk)
+                    await decoder.feed(chunk)
+            return filename, written
+        except httpx.TransportError as e:
+            attempt += 1
+            if attempt > retries:
+                raise HTTPException(
+                    status_code=400, detail=f"Could not download {url}: {e}"
+                )
+            logger.warning(
+                "Download of %s interrupted after %d bytes (%s), resuming",
+                url,
+                written,
+                e,
+            )
+
+
+def _too_large(max_bytes):
+    return HTTPException(
+        status_code=413,
+        detail=f"File exceeds the maximum download size of {max_bytes // (1024 * 1024)} MB",
+    )
+
+
+async def download_audio(
+    url: str,
+    client: httpx.AsyncClient = None,
+    max_bytes: int = MAX_DOWNLOAD_BYTES,
+    retries: int = None,
+):
+    """
+    Download a media file without blocking the event loop and decode it on the fly.
+
+    The file is streamed to a temporary file and into ffmpeg at the same time, which
+    writes the decoded samples to the sidecar file the worker loads the audio from.
+    Interrupted transfers are resumed with Range requests. Formats that ffmpeg cannot
+    decode from a pipe are left without sidecar file and decoded by the worker.
+
+    Args:
+        url (str): URL of the media file.
+        client (httpx.AsyncClient, optional): HTTP client. Defaults to the shared client.
+        max_bytes (int, optional): Largest accepted size, 0 or None for no limit.
+        retries (int, optional): Resume attempts. Defaults to DOWNLOAD_RETRIES.
+
+    Returns:
+        tuple: Path of the temporary file and original file name.
+
+    Raises:
+        HTTPException: If the download fails, is too large or has an invalid extension.
+    """
+    client = client or get_http_client()
+    retries = Config.DOWNLOAD_RETRIES if retries is None else retries
+    suffix = os.path.splitext(httpx.URL(url).path)[1]
+    dest = NamedTemporaryFile(suffix=suffix, delete=False)
+    decoder = StreamingDecoder(decoded_audio_path(dest.name))
+    try:
+        with dest:
+            filename, size = await _stream_to_file(
+                url, dest, decoder, client, max_bytes, retries
+            )
+        decoded = await decoder.finish()
+    except BaseException:
+        decoder.abort()
+        os.remove(dest.name)
+        raise
+
+    logger.info("Downloaded %s (%d bytes) to %s", url, size, dest.name)
+    path = dest.name
+    _, extension = os.path.splitext(filename)
+    if extension.lower() != suffix.lower():
+        path = os.path.splitext(dest.name)[0] + extension
+        os.replace(dest.name, path)
+        if decoded:
+            os.replace(decoder.pcm_file, decoded_audio_path(path))
+    return path, filename
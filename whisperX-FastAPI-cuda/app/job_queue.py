@@ -0,0 +1,476 @@
+"""This module provides a durable, database backed queue that runs whisperX tasks in worker threads."""
+
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from .callbacks import resume_callbacks, schedule_callback
+from .config import Config
+from .db import SessionLocal
+from .logger import logger
+from .metrics import TaskMetrics
+from .models import Task
+from .artifact_cache import file_sha256
+from .pcm_store import open_audio, remove_spill
+from .progress import TaskProgress, reporting
+from .scheduler import select_next_task
+from .schemas import (
+    AlignmentParams,
+    ASROptions,
+    DiarizationParams,
+    DraftParams,
+    SpeechToTextProcessingParams,
+    TaskStatus,
+    TaskType,
+    VADOptions,
+    WhisperModelParams,
+)
+from .services import (
+    process_alignment,
+    process_diarize,
+    process_speaker_assignment,
+    process_transcribe,
+)
+from .tasks import add_task_to_db, update_task_status_in_db
+from .whisperx_services import process_audio_common
+
+# Statuses of tasks that a worker is (or was, before a restart) working on
+ACTIVE_STATUSES = (TaskStatus.running, TaskStatus.processing)
+
+
+def enqueue_task(session: Session = None, **task_fields) -> str:
+    """
+    Persist a new task as queued and wake up the workers.
+
+    Args:
+        session (Session): Database session.
+        **task_fields: Columns of the task, see ``add_task_to_db``.
+
+    Returns:
+        str: Identifier of the queued task.
+    """
+    identifier = add_task_to_db(
+        status=TaskStatus.queued, session=session, **task_fields
+    )
+    task_workers.notify()
+    return identifier
+
+
+def claim_next_task(session: Session, worker_id: str, lease_seconds: int = None):
+    """
+    Claim the task chosen by the scheduler by moving it to running with a lease.
+
+    The status check in the UPDATE makes the claim atomic, so several workers
+    (threads or processes) sharing one database never run the same task twice.
+
+    Args:
+        session (Session): Database session.
+        worker_id (str): Identifier of the claiming worker.
+        lease_seconds (int, optional): Length of the lease. Defaults to TASK_LEASE_SECONDS.
+
+    Returns:
+        str: Identifier of the claimed task, or None if no queued task can be admitted.
+    """
+    lease_seconds = lease_seconds or Config.TASK_LEASE_SECONDS
+    while True:
+        candidate = select_next_task(session)
+        if candidate is None:
+            return None
+        claimed = (
+            session.query(Task)
+            .filter(Task.id == candidate.id, Task.status == TaskStatus.queued)
+            .update(
+                {
+                    Task.status: TaskStatus.running,
+                    Task.worker_id: worker_id,
+                    Task.lease_expires_at: datetime.utcnow()
+                    + timedelta(seconds=lease_seconds),
+                    Task.attempts: func.coalesce(Task.attempts, 0) + 1,
+                },
+                synchronize_session=False,
+            )
+        )
+        session.commit()
+        if claimed:
+            return candidate.uuid
+
+
+def renew_lease(
+    session: Session, identifier: str, worker_id: str, lease_seconds: int = None
+) -> bool:
+    """
+    Extend the lease of a running task held by ``worker_id``.
+
+    Returns:
+        bool: False if the worker no longer holds the lease.
+    """
+    lease_seconds = lease_seconds or Config.TASK_LEASE_SECONDS
+    renewed = (
+        session.query(Task)
+        .filter(Task.uuid == identifier, Task.worker_id == worker_id)
+        .update(
+            {
+                Task.lease_expires_at: datetime.utcnow()
+                + timedelta(seconds=lease_seconds)
+            },
+            synchronize_session=False,
+        )
+    )
+    session.commit()
+    return bool(renewed)
+
+
+def release_lease(session: Session, identifier: str, worker_id: str):
+    """Drop the lease of a finished task, failing it if the handler left it running."""
+    task = (
+        session.query(Task)
+        .filter(Task.uuid == identifier, Task.worker_id == worker_id)
+        .first()
+    )
+    if task is None:
+        return
+    if task.status in ACTIVE_STATUSES:
+        task.status = TaskStatus.failed
+        task.error = task.error or "Task finished without a result"
+    task.worker_id = None
+    task.lease_expires_at = None
+    session.commit()
+
+
+def requeue_expired_tasks(session: Session, max_attempts: int = None) -> int:
+    """
+    Put tasks whose worker lease expired back into the queue.
+
+    Tasks left running by a crashed or restarted process are re-enqueued. Tasks that
+    already used up ``max_attempts`` or cannot be re-run are marked as failed.
+
+    Args:
+        session (Session): Database session.
+        max_attempts (int, optional): Defaults to TASK_MAX_ATTEMPTS.
+
+    Returns:
+        int: Number of re-enqueued tasks.
+    """
+    max_attempts = max_attempts or Config.TASK_MAX_ATTEMPTS
+    expired = (
+        session.query(Task)
+        .filter(
+            Task.status.in_(ACTIVE_STATUSES),
+            or_(
+                Task.lease_expires_at.is_(None),
+                Task.lease_expires_at < datetime.utcnow(),
+            ),
+        )
+        .all()
+    )
+    requeued = 0
+    for task in expired:
+        recoverable = task.audio_path is not None or task.payload is not None
+        if not recoverable or (task.attempts or 0) >= max_attempts:
+            task.status = TaskStatus.failed
+            task.error = (
+                f"Worker lease expired after {task.attempts or 0} attempt(s)"
+                if recoverable
+                else "Task was interrupted and cannot be recovered"
+            )
+            logger.warning("Task %s failed: %s", task.uuid, task.error)
+        else:
+            task.status = TaskStatus.queued
+            requeued += 1
+            logger.warning(
+                "Re-enqueued task %s after its worker lease expired", task.uuid
+            )
+        task.worker_id = None
+        task.lease_expires_at = None
+    session.commit()
+    return requeued
+
+
+def queue_counts(session: Session) -> dict:
+    """
+    Return the number of queued and running tasks and the number of worker slots.
+
+    Args:
+        session (Session): Database session.
+
+    Returns:
+        dict: ``queued``, ``running`` and ``worker_slots``.
+    """
+    counts = dict(
+        session.query(Task.status, func.count(Task.id))
+        .filter(Task.status.in_([TaskStatus.queued, TaskStatus.running]))
+        .group_by(Task.status)
+        .all()
+    )
+    return {
+        "queued": counts.get(TaskStatus.queued.value, 0),
+        "running": counts.get(TaskStatus.running.value, 0),
+        "worker_slots": Config.WORKER_SLOTS,
+    }
+
+
+def _audio_hash(task: Task, session: Session) -> str:
+    """Return the SHA-256 of the audio of a task, hashing files that were not uploaded."""
+    if task.audio_hash is None:
+        task.audio_hash = file_sha256(task.audio_path)
+        session.commit()
+    return task.audio_hash
+
+
+def _load_audio(task: Task, session: Session):
+    """Return a memory-mapped view of the audio of a task, decoded only now that it runs."""
+    return open_audio(task.audio_path, _audio_hash(task, session), task.uuid)
+
+
+def _run_full_process(task: Task, session: Session):
+    params = task.task_params
+    # process_audio_common adds its stages to the metrics recording on this thread,
+    # they and the segments of the ASR are reported to the progress of the task
+    progress = TaskProgress(
+        task.uuid,
+        persist=lambda update_data: update_task_status_in_db(
+            task.uuid, update_data, session=session
+        ),
+    )
+    metrics = TaskMetrics(progress=progress)
+    with metrics.recording(), reporting(progress):
+        process_audio_common(
+            SpeechToTextProcessingParams(
+                audio=metrics.measure("decode", _load_audio, task, session),
+                identifier=task.uuid,
+                audio_hash=task.audio_hash,
+                vad_options=VADOptions(**params["vad_options"]),
+                asr_options=ASROptions(**params["asr_options"]),
+                whisper_model_params=WhisperModelParams.model_validate(params),
+                alignment_params=AlignmentParams.model_validate(params),
+                diarization_params=DiarizationParams.model_validate(params),
+                draft_params=DraftParams(draft_model=params.get("draft_model")),
+            ),
+            session,
+        )
+
+
+def _run_transcription(task: Task, session: Session):
+    params = task.task_params
+    process_transcribe(
+        _load_audio(task, session),
+        task.uuid,
+        WhisperModelParams.model_validate(params),
+        ASROptions(**params["asr_options"]),
+        VADOptions(**params["vad_options"]),
+        session,
+    )
+
+
+def _run_alignment(task: Task, session: Session):
+    params = task.task_params
+    process_alignment(
+        _load_audio(task, session),
+        task.payload["transcript"],
+        task.uuid,
+        params["device"],
+        AlignmentParams.model_validate(params),
+        session,
+    )
+
+
+def _run_diarization(task: Task, session: Session):
+    params = task.task_params
+    process_diarize(
+        _load_audio(task, session),
+        task.uuid,
+        params["device"],
+        DiarizationParams.model_validate(params),
+        session,
+    )
+
+
+def _run_speaker_assignment(task: Task, session: Session):
+    import pandas as pd
+
+    process_speaker_assignment(
+        pd.json_normalize(task.payload["diarization_segments"]),
+        task.payload["transcript"],
+        task.uuid,
+        session,
+    )
+
+
+TASK_HANDLERS = {
+    TaskType.full_process: _run_full_process,
+    TaskType.transcription: _run_transcription,
+    TaskType.transcription_alignment: _run_alignment,
+    TaskType.diarization: _run_diarization,
+    TaskType.combine_transcript_diarization: _run_speaker_assignment,
+}
+
+
+def run_task(task: Task, session: Session):
+    """
+    Run a claimed task with the handler registered for its task type.
+
+    Args:
+        task (Task): The claimed task.
+        session (Session): Database session used by the handler.
+    """
+    handler = TASK_HANDLERS[TaskType(task.task_type)]
+    handler(task, session)
+
+
+class TaskWorkerPool:
+    """Fixed number of worker threads that claim and run queued tasks."""
+
+    def __init__(self, slots: int = None, poll_seconds: float = None):
+        """
+        Initialize the pool.
+
+        Args:
+            slots (int, optional): Number of tasks run at once. Defaults to WORKER_SLOTS.
+            poll_seconds (float, optional): Idle polling interval. Defaults to QUEUE_POLL_SECONDS.
+        """
+        self.slots = slots or Config.WORKER_SLOTS
+        self.poll_seconds = poll_seconds or Config.QUEUE_POLL_SECONDS
+        self._threads = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+    @property
+    def running(self) -> bool:
+        """Return whether the worker threads are started."""
+        return bool(self._threads) and not self._stop.is_set()
+
+    def start(self):
+        """Re-enqueue expired tasks and start the worker threads (idempotent)."""
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            session = SessionLocal()
+            try:
+                requeued = requeue_expired_tasks(session)
+                resumed = resume_callbacks(session)
+            finally:
+                session.close()
+            if requeued:
+                logger.info("Re-enqueued %d task(s) with expired leases", requeued)
+            if resumed:
+                logger.info("Resumed %d pending callback(s)", resumed)
+            self._threads = [
+                threading.Thread(
+                    target=self._work,
+                    args=(f"{self.worker_prefix}:{slot}",),
+                    name=f"task-worker-{slot}",
+                    daemon=True,
+                )
+                for slot in range(self.slots)
+            ]
+            for thread in self._threads:
+                thread.start()
+            logger.info("Started %d task worker(s)", self.slots)
+
+    def stop(self, timeout: float = 5.0):
+        """Ask the worker threads to stop after their current task."""
+        with self._lock:
+            self._stop.set()
+            self._wakeup.set()
+            for thread in self._threads:
+                thread.join(timeout)
+            self._threads = []
+
+    def notify(self):
+        """Wake up idle workers because a task was queued, starting the pool if needed."""
+        if not self.running:
+            self.start()
+        self._wakeup.set()
+
+    def _work(self, worker_id: str):
+        """Claim and run tasks until the pool is stopped."""
+        polls = 0
+        while not self._stop.is_set():
+            session = SessionLocal()
+            try:
+                # Leases of crashed workers elsewhere expire while we are running
+                polls += 1
+                if polls % 30 == 0:
+                    requeue_expired_tasks(session)
+                identifier = claim_next_task(session, worker_id)
+            except Exception:
+                logger.exception("Worker %s could not claim a task", worker_id)
+                identifier = None
+            finally:
+                session.close()
+
+            if identifier is None:
+                self._wakeup.wait(self.poll_seconds)
+                self._wakeup.clear()
+                continue
+            try:
+                self._run(identifier, worker_id)
+            except Exception:
+                logger.exception(
+                    "Worker %s could not finish task %s", worker_id, identifier
+                )
+
+    def _run(self, identifier: str, worker_id: str):
+        """Run one claimed task while keeping its lease alive."""
+        logger.info("Worker %s claimed task %s", worker_id, identifier)
+        finished = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat,
+            args=(identifier, worker_id, finished),
+            name=f"lease-{identifier}",
+            daemon=True,
+        )
+        heartbeat.start()
+
+        session = SessionLocal()
+        audio_path = None
+        try:
+            task = session.query(Task).filter(Task.uuid == identifier).first()
+            audio_path = task.audio_path
+            run_task(task, session)
+        except Exception as exc:
+            logger.exception("Task %s failed in worker %s", identifier, worker_id)
+            session.rollback()
+            update_task_status_in_db(
+                identifier=identifier,
+                update_data={"status": TaskStatus.failed, "error": str(exc)},
+                session=session,
+            )
+        finally:
+            finished.set()
+            heartbeat.join()
+            if audio_path is not None:
+                remove_spill(audio_path, identifier)
+            try:
+                release_lease(session, identifier, worker_id)
+                schedule_callback(identifier, session)
+            finally:
+                session.close()
+            # Memory of the finished task is free again, held back tasks may fit now
+            self._wakeup.set()
+
+    def _heartbeat(self, identifier: str, worker_id: str, finished: threading.Event):
+        """Renew the lease of a running task until it is finished."""
+        interval = max(Config.TASK_LEASE_SECONDS / 3, 1)
+        while not finished.wait(interval):
+            session = SessionLocal()
+            try:
+                if not renew_lease(session, identifier, worker_id):
+                    logger.warning(
+                        "Worker %s lost the lease on task %s", worker_id, identifier
+                    )
+                    return
+            except Exception:
+                logger.exception("Could not renew the lease on task %s", identifier)
+            finally:
+                session.close()
+
+
+task_workers = TaskWorkerPool()
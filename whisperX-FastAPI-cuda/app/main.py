@@ -9,20 +9,30 @@ from contextlib import asynccontextmanager  # noqa: E402
 
 from dotenv import load_dotenv  # noqa: E402
 from fastapi import FastAPI, status  # noqa: E402
-from fastapi.responses import JSONResponse, RedirectResponse  # noqa: E402
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse  # noqa: E402
 from sqlalchemy import text  # noqa: E402
 import logging  # noqa: E402
 
+from .chunked_transcription import shutdown_pool  # noqa: E402
 from .config import Config  # noqa: E402
-from .db import engine  # noqa: E402
+from .db import SessionLocal, add_missing_columns, engine  # noqa: E402
 from .docs import generate_db_schema, save_openapi_json  # noqa: E402
+from .downloads import close_http_client  # noqa: E402
+from .job_queue import queue_counts, task_workers  # noqa: E402
+from .metrics import render_prometheus  # noqa: E402
 from .models import Base  # noqa: E402
+from .result_store import migrate_results  # noqa: E402
 from .routers import stt, stt_services, task  # noqa: E402
+from .warmup import loaded_models, model_warmup  # noqa: E402
+from .whisperx_services import diarization_executor  # noqa: E402
 
 # Load environment variables from .env
 load_dotenv()
 
 Base.metadata.create_all(bind=engine)
+add_missing_columns(Base.metadata)
+with SessionLocal() as session:
+    migrate_results(session)
 
 
 @asynccontextmanager
@@ -31,14 +41,22 @@ async def lifespan(app: FastAPI):
     Lifespan context manager for the FastAPI application.
 
     This function is used to perform startup and shutdown tasks for the FastAPI application.
-    It saves the OpenAPI JSON and generates the database schema.
+    It saves the OpenAPI JSON, generates the database schema, starts the task
+    workers (re-enqueueing tasks whose lease expired) and warms up the configured
+    ASR, alignment and diarization models in the background.
 
     Args:
         app (FastAPI): The FastAPI application instance.
     """
     save_openapi_json(app)
     generate_db_schema(Base.metadata.tables.values())
+    model_warmup.start()
+    task_workers.start()
     yield
+    task_workers.stop()
+    diarization_executor.shutdown()
+    shutdown_pool()
+    await close_http_client()
 
 
 tags_metadata = [
@@ -138,21 +156,35 @@ async def liveness_check():
 async def readiness_check():
     """Check if the application is ready to accept requests.
 
-    Verifies dependencies like the database are connected and ready.
-    Returns HTTP 200 if all systems are operational, HTTP 503 if any dependency
-    has failed.
+    Verifies dependencies like the database are connected and ready, and that the
+    models configured for warm-up are loaded. Returns HTTP 200 if all systems are
+    operational, HTTP 503 while the models are warming up or if any dependency
+    has failed. The response includes the queue depth, the number of running
+    tasks and the loaded models, so clients can pick the least busy replica.
     """
     try:
         # Check database connection
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
+        with SessionLocal() as session:
+            queue = queue_counts(session)
 
+        ready = model_warmup.ready
         return JSONResponse(
-            status_code=status.HTTP_200_OK,
+            status_code=status.HTTP_200_OK
+            if ready
+            else status.HTTP_503_SERVICE_UNAVAILABLE,
             content={
-                "status": "ok",
+                "status": "ok" if ready else "warming_up",
                 "database": "connected",
-                "message": "Application is ready to accept requests",
+                "message": (
+                    "Application is ready to accept requests"
+                    if ready
+                    else "Models are still being warmed up"
+                ),
+                "warmup": model_warmup.status(),
+                "queue": queue,
+                "models": loaded_models(),
             },
         )
     except Exception:
@@ -165,3 +197,21 @@ async def readiness_check():
                 "message": "Application is not ready due to an internal error.",
             },
         )
+
+
+@app.get(
+    "/metrics",
+    tags=["Health"],
+    summary="Processing metrics",
+    response_class=PlainTextResponse,
+)
+async def metrics():
+    """Export the processing metrics in the Prometheus text format.
+
+    Histograms of the wall time, real-time factor, peak RSS and peak GPU memory
+    of the processing stages (decode, vad, transcription, alignment, diarization,
+    speaker_assignment, db_write and total) of the tasks completed by this process.
+    """
+    return PlainTextResponse(
+        render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
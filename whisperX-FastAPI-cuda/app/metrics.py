@@ -0,0 +1,354 @@
+"""This module measures the processing stages of tasks and exports them in the Prometheus text format."""
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds of the histogram buckets
+SECONDS_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+RTF_BUCKETS = (0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5)
+MEGABYTES_BUCKETS = (256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+
+# Interval in seconds at which memory is sampled while a stage runs
+SAMPLE_SECONDS = 0.05
+
+_PAGE_MB = os.sysconf("SC_PAGE_SIZE") / 1024**2 if hasattr(os, "sysconf") else 0.0
+
+_current = threading.local()
+
+# GPU peaks of the running stages, which resetting the peak statistics of torch would lose
+_gpu_lock = threading.Lock()
+_gpu_peaks = set()
+
+
+def rss_mb():
+    """
+    Return the resident set size of the process.
+
+    Returns:
+        float: Size in MB, or None where ``/proc`` is not available.
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * _PAGE_MB
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _initialized_cuda():
+    """
+    Return ``torch.cuda`` if the process has a CUDA context, else None.
+
+    torch is never imported or initialized for this: without a CUDA context in the
+    process, there is no GPU memory to report.
+    """
+    torch = sys.modules.get("torch")
+    if torch is None or not torch.cuda.is_initialized():
+        return None
+    return torch.cuda
+
+
+def _max(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+class _GpuPeak:
+    """
+    Peak memory allocated by torch on the current CUDA device while a stage runs.
+
+    The peak statistics of torch are reset when a stage starts. The peaks reached
+    until then by stages still running, e.g. the ASR around its VAD, are kept first.
+    """
+
+    def __init__(self):
+        self.peak_mb = None
+        with _gpu_lock:
+            cuda = _initialized_cuda()
+            if cuda is not None:
+                allocated_mb = cuda.max_memory_allocated() / 1024**2
+                for running in _gpu_peaks:
+                    running.peak_mb = _max(running.peak_mb, allocated_mb)
+                cuda.reset_peak_memory_stats()
+            _gpu_peaks.add(self)
+
+    def stop(self):
+        """Stop measuring and take the peak since the start or the last reset."""
+        with _gpu_lock:
+            _gpu_peaks.discard(self)
+            cuda = _initialized_cuda()
+            if cuda is not None:
+                self.peak_mb = _max(self.peak_mb, cuda.max_memory_allocated() / 1024**2)
+
+
+class _PeakSampler:
+    """Samples RSS in a background thread and keeps the peaks of RSS and GPU memory."""
+
+    def __init__(self):
+        self.peak_rss_mb = rss_mb()
+        self._gpu = _GpuPeak()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="memory-sampler", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def peak_gpu_mb(self):
+        """Peak GPU memory in MB, None without CUDA or before ``stop``."""
+        return self._gpu.peak_mb
+
+    def _sample(self):
+        self.peak_rss_mb = _max(self.peak_rss_mb, rss_mb())
+
+    def _run(self):
+        while not self._stopped.wait(SAMPLE_SECONDS):
+            self._sample()
+
+    def stop(self):
+        """Stop sampling and take a last sample."""
+        self._stopped.set()
+        self._thread.join()
+        self._sample()
+        self._gpu.stop()
+
+
+class Histogram:
+    """A Prometheus histogram with one series per stage."""
+
+    def __init__(self, name: str, documentation: str, buckets: tuple):
+        """
+        Initialize the histogram.
+
+        Args:
+            name (str): Metric name.
+            documentation (str): Help text.
+            buckets (tuple): Upper bounds of the buckets, ascending.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        # Stage -> cumulative bucket counts, sum and count
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, value: float):
+        """
+        Add an observation to the series of a stage.
+
+        Args:
+            stage (str): Name of the stage.
+            value (float): Observed value.
+        """
+        with self._lock:
+            series = self._series.setdefault(stage, [[0] * len(self.buckets), 0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        """
+        Return the histogram in the Prometheus text exposition format.
+
+        Returns:
+            list: Lines of the exposition.
+        """
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            for stage, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(
+                        f'{self.name}_bucket{{stage="{stage}",le="{bound}"}} {bucket_count}'
+                    )
+                lines.append(f'{self.name}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+                lines.append(f'{self.name}_sum{{stage="{stage}"}} {total}')
+                lines.append(f'{self.name}_count{{stage="{stage}"}} {count}')
+        return lines
+
+
+stage_seconds = Histogram(
+    "whisperx_stage_seconds",
+    "Wall time of the processing stages of tasks.",
+    SECONDS_BUCKETS,
+)
+stage_rtf = Histogram(
+    "whisperx_stage_real_time_factor",
+    "Wall time of the processing stages divided by the audio duration.",
+    RTF_BUCKETS,
+)
+stage_peak_rss = Histogram(
+    "whisperx_stage_peak_rss_megabytes",
+    "Peak resident set size of the process during the processing stages.",
+    MEGABYTES_BUCKETS,
+)
+stage_peak_gpu = Histogram(
+    "whisperx_stage_peak_gpu_megabytes",
+    "Peak memory allocated by torch on the CUDA device during the processing stages.",
+    MEGABYTES_BUCKETS,
+)
+HISTOGRAMS = (stage_seconds, stage_rtf, stage_peak_rss, stage_peak_gpu)
+
+
+def render_prometheus() -> str:
+    """
+    Return all stage histograms in the Prometheus text exposition format.
+
+    Returns:
+        str: The exposition.
+    """
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
+
+def current_task_metrics():
+    """
+    Return the metrics of the task recording on the calling thread.
+
+    Returns:
+        TaskMetrics: The metrics, or None outside of ``TaskMetrics.recording``.
+    """
+    return getattr(_current, "metrics", None)
+
+
+class TaskMetrics:
+    """
+    Wall time, real-time factor and memory peaks of the processing stages of one task.
+
+    RSS is sampled for the whole process while a stage runs, and the GPU peak is
+    taken from the allocator statistics of torch for the process, so with several
+    tasks or stages at once the peaks include the memory of the others.
+    """
+
+    def __init__(self, audio_seconds: float = None, progress=None):
+        """
+        Initialize empty metrics.
+
+        Args:
+            audio_seconds (float, optional): Duration of the audio of the task.
+            progress (TaskProgress, optional): Progress the stages report their start and end to.
+        """
+        self.audio_seconds = audio_seconds
+        self.progress = progress
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Measure the code run inside the ``with`` block as the stage ``name``.
+
+        A stage measured more than once, e.g. the VAD of several windows, adds up
+        its wall time and keeps the highest peaks.
+
+        Args:
+            name (str): Name of the stage.
+        """
+        if self.progress is not None:
+            self.progress.start_stage(name)
+        sampler = _PeakSampler()
+        start = time.perf_counter()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            seconds = time.perf_counter() - start
+            sampler.stop()
+            with self._lock:
+                previous = self.stages.get(name, {})
+                self.stages[name] = {
+                    "seconds": previous.get("seconds", 0.0) + seconds,
+                    "peak_rss_mb": _max(
+                        previous.get("peak_rss_mb"), sampler.peak_rss_mb
+                    ),
+                    "gpu_peak_mb": _max(
+                        previous.get("gpu_peak_mb"), sampler.peak_gpu_mb
+                    ),
+                }
+            if self.progress is not None:
+                self.progress.finish_stage(name, seconds, failed=failed)
+
+    def measure(self, name: str, func, /, *args, **kwargs):
+        """
+        Call ``func`` and measure it as the stage ``name``.
+
+        Args:
+            name (str): Name of the stage.
+            func (callable): The stage to run.
+            *args: Positional arguments of ``func``.
+            **kwargs: Keyword arguments of ``func``.
+
+        Returns:
+            The result of ``func``.
+        """
+        with self.stage(name):
+            return func(*args, **kwargs)
+
+    @contextmanager
+    def recording(self):
+        """Make these the metrics that code on the calling thread records its stages to."""
+        previous = current_task_metrics()
+        _current.metrics = self
+        try:
+            yield self
+        finally:
+            _current.metrics = previous
+
+    def as_dict(self, total_seconds: float = None) -> dict:
+        """
+        Return the metrics with the real-time factor of every stage.
+
+        Args:
+            total_seconds (float, optional): Wall time of the whole task, added as ``total``.
+
+        Returns:
+            dict: ``audio_seconds`` and the ``stages`` with ``seconds``, ``rtf``,
+            ``peak_rss_mb`` and ``gpu_peak_mb``.
+        """
+        with self._lock:
+            stages = {name: dict(values) for name, values in self.stages.items()}
+        if total_seconds is not None:
+            stages["total"] = {
+                "seconds": total_seconds,
+                "peak_rss_mb": _max(
+                    *(values["peak_rss_mb"] for values in stages.values())
+                ),
+                "gpu_peak_mb": _max(
+                    *(values["gpu_peak_mb"] for values in stages.values())
+                ),
+            }
+        for values in stages.values():
+            values["rtf"] = (
+                values["seconds"] / self.audio_seconds if self.audio_seconds else None
+            )
+        return {"audio_seconds": self.audio_seconds, "stages": stages}
+
+    def export(self, total_seconds: float = None) -> dict:
+        """
+        Add the stages to the Prometheus histograms and return them as ``as_dict`` does.
+
+        Args:
+            total_seconds (float, optional): Wall time of the whole task, added as ``total``.
+
+        Returns:
+            dict: The metrics of the task.
+        """
+        metrics = self.as_dict(total_seconds)
+        for name, values in metrics["stages"].items():
+            stage_seconds.observe(name, values["seconds"])
+            if values["rtf"] is not None:
+                stage_rtf.observe(name, values["rtf"])
+            if values["peak_rss_mb"] is not None:
+                stage_peak_rss.observe(name, values["peak_rss_mb"])
+            if values["gpu_peak_mb"] is not None:
+                stage_peak_gpu.observe(name, values["gpu_peak_mb"])
+        return metrics
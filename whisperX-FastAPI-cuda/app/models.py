@@ -3,8 +3,17 @@
 from datetime import datetime
 from uuid import uuid4
 
-from sqlalchemy import JSON, Column, DateTime, Float, Integer, String
-from sqlalchemy.orm import declarative_base
+from sqlalchemy import (
+    JSON,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Integer,
+    LargeBinary,
+    String,
+)
+from sqlalchemy.orm import declarative_base, deferred, relationship
 
 Base = declarative_base()
 
@@ -17,13 +26,28 @@ class Task(Base):
     - id: Unique identifier for each task (Primary Key).
     - uuid: Universally unique identifier for each task.
     - status: Current status of the task.
-    - result: JSON data representing the result of the task.
+    - result: JSON data representing the result of the task, as written by older versions.
     - file_name: Name of the file associated with the task.
     - task_type: Type/category of the task.
     - duration: Duration of the task execution.
     - error: Error message, if any, associated with the task.
+    - metrics: Wall time, real-time factor and peak memory of the processing stages.
+    - draft_result: Provisional transcript of the draft pass, until the result replaces it.
+    - progress: Current stage, share of the audio transcribed and state of the stages.
+    - callback_status: Delivery of the result to the callback URL: pending, delivered or failed.
+    - callback_attempts: Number of times the result was POSTed to the callback URL.
+    - callback_error: Error of the last failed delivery to the callback URL.
+    - audio_path: Path of the stored audio/video file the task processes.
+    - audio_hash: SHA-256 of the audio/video file, key of its cached artifacts.
+    - payload: Additional input data needed to (re-)run the task.
+    - batch_id: Identifier of the batch the task was submitted in, if any.
+    - attempts: Number of times a worker claimed the task.
+    - worker_id: Identifier of the worker holding the lease on the task.
+    - lease_expires_at: Time at which the lease of the worker expires.
     - created_at: Date and time of creation.
     - updated_at: Date and time of last update.
+    - stored_result: Compact result of the task, loaded on first access.
+    - partial_segments: ASR segments finalised so far, until the result replaces them.
     """
 
     __tablename__ = "tasks"
@@ -39,7 +63,12 @@ class Task(Base):
         comment="Universally unique identifier for each task",
     )
     status = Column(String, comment="Current status of the task")
-    result = Column(JSON, comment="JSON data representing the result of the task")
+    result = deferred(
+        Column(
+            JSON,
+            comment="JSON data representing the result of the task, as written by older versions",
+        )
+    )
     file_name = Column(String, comment="Name of the file associated with the task")
     url = Column(String, comment="URL of the file associated with the task")
     audio_duration = Column(Float, comment="Duration of the audio in seconds")
@@ -50,6 +79,47 @@ class Task(Base):
     start_time = Column(DateTime, comment="Start time of the task execution")
     end_time = Column(DateTime, comment="End time of the task execution")
     error = Column(String, comment="Error message, if any, associated with the task")
+    metrics = Column(
+        JSON,
+        comment="Wall time, real-time factor and peak memory of the processing stages",
+    )
+    draft_result = Column(
+        JSON,
+        comment="Provisional transcript of the draft pass, until the result replaces it",
+    )
+    progress = Column(
+        JSON,
+        comment="Current stage, share of the audio transcribed and state of the stages",
+    )
+    callback_status = Column(
+        String,
+        comment="Delivery of the result to the callback URL: pending, delivered or failed",
+    )
+    callback_attempts = Column(
+        Integer, comment="Number of times the result was POSTed to the callback URL"
+    )
+    callback_error = Column(
+        String, comment="Error of the last failed delivery to the callback URL"
+    )
+    audio_path = Column(
+        String, comment="Path of the stored audio/video file the task processes"
+    )
+    audio_hash = Column(
+        String, comment="SHA-256 of the audio/video file, key of its cached artifacts"
+    )
+    payload = Column(JSON, comment="Additional input data needed to (re-)run the task")
+    batch_id = Column(
+        String, comment="Identifier of the batch the task was submitted in, if any"
+    )
+    attempts = Column(
+        Integer, default=0, comment="Number of times a worker claimed the task"
+    )
+    worker_id = Column(
+        String, comment="Identifier of the worker holding the lease on the task"
+    )
+    lease_expires_at = Column(
+        DateTime, comment="Time at which the lease of the worker expires"
+    )
     created_at = Column(
         DateTime, default=datetime.utcnow, comment="Date and time of creation"
     )
@@ -59,3 +129,120 @@ class Task(Base):
         onupdate=datetime.utcnow,
         comment="Date and time of last update",
     )
+    stored_result = relationship(
+        "TaskResult", uselist=False, cascade="all, delete-orphan", lazy="select"
+    )
+    partial_segments = relationship(
+        "TaskSegment",
+        order_by="TaskSegment.position",
+        cascade="all, delete-orphan",
+        lazy="select",
+    )
+
+
+class TaskResult(Base):
+    """
+    Table to store the results of tasks in a compact form, see ``app.result_store``.
+
+    Attributes:
+    - id: Unique identifier for each result (Primary Key).
+    - task_id: Task the result belongs to.
+    - encoding: Compression of the packed result.
+    - format_version: Version of the columnar layout of the packed result.
+    - data: Packed and compressed result, loaded on first access.
+    - size: Size of the packed result in bytes before compression.
+    - checksum: CRC-32 of the packed result, identifying it in the result cache.
+    - created_at: Date and time of creation.
+    """
+
+    __tablename__ = "task_results"
+    id = Column(
+        Integer,
+        primary_key=True,
+        autoincrement=True,
+        comment="Unique identifier for each result (Primary Key)",
+    )
+    task_id = Column(
+        Integer,
+        ForeignKey("tasks.id", ondelete="CASCADE"),
+        unique=True,
+        index=True,
+        comment="Task the result belongs to",
+    )
+    encoding = Column(String, comment="Compression of the packed result")
+    format_version = Column(
+        Integer, comment="Version of the columnar layout of the packed result"
+    )
+    data = deferred(Column(LargeBinary, comment="Packed and compressed result"))
+    size = Column(
+        Integer, comment="Size of the packed result in bytes before compression"
+    )
+    checksum = Column(
+        Integer,
+        comment="CRC-32 of the packed result, identifying it in the result cache",
+    )
+    created_at = Column(
+        DateTime, default=datetime.utcnow, comment="Date and time of creation"
+    )
+
+
+class TaskSegment(Base):
+    """
+    Table to store the ASR segments of running tasks as they are finalised.
+
+    Segments are only appended, so writing the progress of a long recording does
+    not rewrite the segments written before.
+
+    Attributes:
+    - id: Unique identifier for each segment (Primary Key).
+    - task_id: Task the segment belongs to.
+    - position: Index of the segment in the transcript.
+    - start: Start of the segment in seconds.
+    - end: End of the segment in seconds.
+    - text: Text of the segment.
+    """
+
+    __tablename__ = "task_segments"
+    id = Column(
+        Integer,
+        primary_key=True,
+        autoincrement=True,
+        comment="Unique identifier for each segment (Primary Key)",
+    )
+    task_id = Column(
+        Integer,
+        ForeignKey("tasks.id", ondelete="CASCADE"),
+        index=True,
+        comment="Task the segment belongs to",
+    )
+    position = Column(Integer, comment="Index of the segment in the transcript")
+    start = Column(Float, comment="Start of the segment in seconds")
+    end = Column(Float, comment="End of the segment in seconds")
+    text = Column(String, comment="Text of the segment")
+
+
+class Batch(Base):
+    """
+    Table to store batches of tasks submitted together.
+
+    Attributes:
+    - id: Unique identifier for each batch (Primary Key).
+    - uuid: Universally unique identifier for each batch.
+    - created_at: Date and time of creation.
+    """
+
+    __tablename__ = "batches"
+    id = Column(
+        Integer,
+        primary_key=True,
+        autoincrement=True,
+        comment="Unique identifier for each batch (Primary Key)",
+    )
+    uuid = Column(
+        String,
+        default=lambda: str(uuid4()),
+        comment="Universally unique identifier for each batch",
+    )
+    created_at = Column(
+        DateTime, default=datetime.utcnow, comment="Date and time of creation"
+    )
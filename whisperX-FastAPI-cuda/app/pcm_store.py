@@ -0,0 +1,90 @@
+"""This module spills decoded audio to disk and hands out memory-mapped views of it."""
+
+import os
+
+import numpy as np
+
+from .artifact_cache import artifact_cache
+from .audio import decode_audio, decoded_audio_path
+from .logger import logger
+
+
+def spill_path(audio_file: str, identifier: str = None) -> str:
+    """
+    Return the path of the raw float32 file holding the decoded audio of a media file.
+
+    Args:
+        audio_file (str): The path to the media file.
+        identifier (str, optional): Identifier of the task, which owns the spill
+            file of a file on a shared input root.
+
+    Returns:
+        str: The path of the spill file.
+    """
+    return decoded_audio_path(audio_file, identifier)
+
+
+def _decode_to_spill(audio_file: str, path: str):
+    """Let ffmpeg write the samples straight into the spill file."""
+    partial = path + ".partial"
+    try:
+        decode_audio(audio_file, output_file=partial)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    os.replace(partial, path)
+
+
+def open_audio(
+    audio_file: str, audio_hash: str = None, identifier: str = None
+) -> np.ndarray:
+    """
+    Return the decoded audio of a media file as a memory-mapped array.
+
+    The audio is decoded by a single ffmpeg run straight to disk, or was already
+    decoded while it was downloaded. All stages of a task read slices of the same
+    mapping, so the waveform is not held in memory per task and pages not in use
+    can be dropped by the operating system. The mapping is copy-on-write, so
+    stages that modify samples never change the file.
+
+    With ``audio_hash``, audio decoded before is taken from the artifact cache and
+    newly decoded audio is added to it.
+
+    Args:
+        audio_file (str): The path to the media file.
+        audio_hash (str, optional): SHA-256 of the media file.
+        identifier (str, optional): Identifier of the task, see ``spill_path``.
+
+    Returns:
+        np.ndarray: Memory-mapped float32 waveform sampled at 16 kHz.
+    """
+    path = spill_path(audio_file, identifier)
+    if not os.path.exists(path) and audio_hash:
+        if artifact_cache.restore_pcm(audio_hash, path):
+            logger.debug("Reusing cached decoded audio of %s", audio_file)
+    if not os.path.exists(path):
+        _decode_to_spill(audio_file, path)
+        logger.debug("Spilled decoded audio of %s to %s", audio_file, path)
+    if audio_hash:
+        artifact_cache.store_pcm(audio_hash, path)
+    if not os.path.getsize(path):
+        # Empty files cannot be mapped
+        return np.zeros(0, dtype=np.float32)
+    return np.memmap(path, dtype=np.float32, mode="c")
+
+
+def remove_spill(audio_file: str, identifier: str = None):
+    """
+    Delete the spill file of a media file, if present.
+
+    Args:
+        audio_file (str): The path to the media file.
+        identifier (str, optional): Identifier of the task, see ``spill_path``.
+    """
+    try:
+        os.remove(spill_path(audio_file, identifier))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning("Could not remove spill file of %s: %s", audio_file, e)
@@ -0,0 +1,377 @@
+"""This module reports the progress of running tasks to their database row and to the clients following their events.
+
+A task run by the job queue has a ``TaskProgress``. Its stages report when they
+start and finish, the ASR reports its segments as soon as their text is decoded.
+Every change is handed to the clients subscribed to the task through
+``task_events`` and written to the ``progress`` column of the task, and new
+segments are appended to its partial segments, so clients polling
+``/task/{identifier}`` see it as well. Segments written before are never
+written again.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from .logger import logger
+
+# Shortest interval in seconds between two writes of new segments to the task row
+PERSIST_SECONDS = 1.0
+# Interval in seconds of keep-alive comments on idle event streams
+KEEPALIVE_SECONDS = 15.0
+# Statuses after which a task sends no more events
+FINAL_STATUSES = ("completed", "failed")
+
+_current = threading.local()
+# Identifier -> progress of the tasks running in this process
+_running = {}
+_running_lock = threading.Lock()
+
+
+def status_value(status) -> str:
+    """Return the plain value of a task status given as ``TaskStatus`` or string."""
+    return getattr(status, "value", status)
+
+
+class TaskEvents:
+    """Hands the events of tasks, published by any thread, to the event loops of their subscribers."""
+
+    def __init__(self):
+        """Initialize without subscribers."""
+        # Identifier -> list of (event loop, queue)
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, identifier: str) -> asyncio.Queue:
+        """
+        Subscribe to the events of a task; must be called on the event loop reading them.
+
+        Args:
+            identifier (str): Identifier of the task.
+
+        Returns:
+            asyncio.Queue: Queue receiving ``(event, data)`` tuples.
+        """
+        queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subscribers.setdefault(identifier, []).append((loop, queue))
+        return queue
+
+    def unsubscribe(self, identifier: str, queue: asyncio.Queue):
+        """
+        Stop handing the events of a task to a queue.
+
+        Args:
+            identifier (str): Identifier of the task.
+            queue (asyncio.Queue): Queue returned by ``subscribe``.
+        """
+        with self._lock:
+            subscribers = [
+                subscriber
+                for subscriber in self._subscribers.get(identifier, [])
+                if subscriber[1] is not queue
+            ]
+            if subscribers:
+                self._subscribers[identifier] = subscribers
+            else:
+                self._subscribers.pop(identifier, None)
+
+    def publish(self, identifier: str, event: str, data: dict):
+        """
+        Hand an event to all subscribers of a task.
+
+        Args:
+            identifier (str): Identifier of the task.
+            event (str): Name of the event.
+            data (dict): Payload of the event.
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.get(identifier, []))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+            except RuntimeError:
+                # The event loop of the subscriber is closed
+                logger.debug(
+                    "Dropping %s event of task %s for a closed event loop",
+                    event,
+                    identifier,
+                )
+
+
+task_events = TaskEvents()
+
+
+def current_task_progress():
+    """
+    Return the progress of the task running on the calling thread.
+
+    Returns:
+        TaskProgress: The progress, or None outside of ``reporting``.
+    """
+    return getattr(_current, "progress", None)
+
+
+def running_task_progress(identifier: str):
+    """
+    Return the progress of a task running in this process.
+
+    Args:
+        identifier (str): Identifier of the task.
+
+    Returns:
+        TaskProgress: The progress, or None if the task does not run here.
+    """
+    with _running_lock:
+        return _running.get(identifier)
+
+
+@contextmanager
+def reporting(progress):
+    """
+    Make ``progress`` the one that code on the calling thread reports to.
+
+    Args:
+        progress (TaskProgress): Progress of the task, None to report nothing.
+    """
+    previous = current_task_progress()
+    _current.progress = progress
+    if progress is not None:
+        with _running_lock:
+            _running[progress.identifier] = progress
+    try:
+        yield progress
+    finally:
+        _current.progress = previous
+        if progress is not None:
+            with _running_lock:
+                if _running.get(progress.identifier) is progress:
+                    del _running[progress.identifier]
+
+
+class TaskProgress:
+    """
+    Stages, share of the audio transcribed and finalised ASR segments of one running task.
+
+    Stages may report from any thread, but the task row is only written on the
+    thread that created the progress, which owns the database session. Changes
+    reported elsewhere, e.g. by the diarization, are written with the next one.
+    """
+
+    def __init__(self, identifier: str, persist=None, audio_seconds: float = None):
+        """
+        Initialize the progress of a task that did not start yet.
+
+        Args:
+            identifier (str): Identifier of the task.
+            persist (callable, optional): Writes a dict of columns to the task row.
+            audio_seconds (float, optional): Duration of the audio of the task.
+        """
+        self.identifier = identifier
+        self.persist = persist
+        self.audio_seconds = audio_seconds
+        self.percent = 0.0
+        # Stage -> "started", "completed" or "failed", in the order of their last change
+        self.stages = {}
+        self.segments = []
+        self._lock = threading.Lock()
+        self._owner = threading.get_ident()
+        self._persisted_at = None
+        # Number of segments written to the database
+        self._persisted_segments = 0
+
+    @property
+    def stage(self) -> str:
+        """The stage started last that is still running, else the stage finished last."""
+        with self._lock:
+            running = [
+                name for name, state in self.stages.items() if state == "started"
+            ]
+            return running[-1] if running else next(reversed(self.stages), None)
+
+    def as_dict(self) -> dict:
+        """
+        Return the progress as stored in the ``progress`` column.
+
+        Returns:
+            dict: Current ``stage``, ``percent`` of the audio transcribed and state of all ``stages``.
+        """
+        stage = self.stage
+        with self._lock:
+            return {
+                "stage": stage,
+                "percent": self.percent,
+                "stages": dict(self.stages),
+            }
+
+    def start_stage(self, name: str):
+        """
+        Report that a stage started.
+
+        Args:
+            name (str): Name of the stage.
+        """
+        with self._lock:
+            self.stages.pop(name, None)
+            self.stages[name] = "started"
+        task_events.publish(
+            self.identifier,
+            "stage",
+            {"stage": name, "state": "started", "percent": self.percent},
+        )
+        self._write()
+
+    def finish_stage(self, name: str, seconds: float = None, failed: bool = False):
+        """
+        Report that a stage finished.
+
+        Args:
+            name (str): Name of the stage.
+            seconds (float, optional): Wall time of the stage.
+            failed (bool): Whether the stage raised an error.
+        """
+        state = "failed" if failed else "completed"
+        with self._lock:
+            self.stages.pop(name, None)
+            self.stages[name] = state
+        task_events.publish(
+            self.identifier,
+            "stage",
+            {
+                "stage": name,
+                "state": state,
+                "seconds": seconds,
+                "percent": self.percent,
+            },
+        )
+        self._write()
+
+    def add_segments(self, segments: list):
+        """
+        Report ASR segments whose text is final, in the order of the audio.
+
+        Args:
+            segments (list): Segments with ``start``, ``end`` and ``text``.
+        """
+        events = []
+        with self._lock:
+            for segment in segments:
+                segment = {
+                    "start": segment["start"],
+                    "end": segment["end"],
+                    "text": segment["text"],
+                }
+                if self.audio_seconds:
+                    self.percent = max(
+                        self.percent,
+                        min(100.0, round(100 * segment["end"] / self.audio_seconds, 1)),
+                    )
+                events.append(
+                    {"index": len(self.segments), **segment, "percent": self.percent}
+                )
+                self.segments.append(segment)
+        for event in events:
+            task_events.publish(self.identifier, "segment", event)
+        if events:
+            self._write(throttle=True)
+
+    def complete_segments(self, segments: list):
+        """
+        Report the segments of a finished transcription that were not reported while it ran.
+
+        A transcription taken from the cache reports all its segments here.
+
+        Args:
+            segments (list): All segments of the transcription.
+        """
+        self.add_segments(segments[len(self.segments) :])
+        with self._lock:
+            self.percent = 100.0
+        self._write()
+
+    def _write(self, throttle: bool = False):
+        """Write the progress and the segments not written yet, if this thread owns the session."""
+        if self.persist is None or threading.get_ident() != self._owner:
+            return
+        now = time.monotonic()
+        if (
+            throttle
+            and self._persisted_at is not None
+            and now - self._persisted_at < PERSIST_SECONDS
+        ):
+            return
+        self._persisted_at = now
+        progress = self.as_dict()
+        with self._lock:
+            start = self._persisted_segments
+            segments = [
+                {"index": index, **segment}
+                for index, segment in enumerate(self.segments[start:], start)
+            ]
+        update_data = {"progress": progress}
+        if segments:
+            update_data["partial_segments"] = segments
+        self.persist(update_data)
+        self._persisted_segments = start + len(segments)
+
+
+def format_event(event: str, data) -> str:
+    """
+    Encode an event in the Server-Sent Events wire format.
+
+    Args:
+        event (str): Name of the event.
+        data: JSON-serializable payload.
+
+    Returns:
+        str: The event, terminated by a blank line.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def stream_task_events(
+    identifier: str, queue: asyncio.Queue, snapshot: dict, is_disconnected, poll_status
+):
+    """
+    Yield the events of a task in the Server-Sent Events format until it completes or fails.
+
+    The stream starts with a ``snapshot`` of the task, followed by its ``stage``,
+    ``segment`` and ``status`` events. When no event arrives for
+    ``KEEPALIVE_SECONDS``, the status is read from the database, as the task may run
+    in another process whose events never arrive here, and a comment keeps the
+    connection open.
+
+    Args:
+        identifier (str): Identifier of the task.
+        queue (asyncio.Queue): Queue subscribed to the task with ``task_events``.
+        snapshot (dict): Status, progress and segments of the task when subscribing.
+        is_disconnected (callable): Coroutine function telling whether the client left.
+        poll_status (callable): Returns the status of the task in the database, None if it was deleted.
+
+    Yields:
+        str: Encoded events.
+    """
+    try:
+        yield format_event("snapshot", snapshot)
+        if snapshot["status"] in FINAL_STATUSES:
+            return
+        while not await is_disconnected():
+            try:
+                event, data = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                status = poll_status()
+                if status is None:
+                    return
+                if status in FINAL_STATUSES:
+                    yield format_event("status", {"status": status})
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            yield format_event(event, data)
+            if event == "status" and data["status"] in FINAL_STATUSES:
+                return
+    finally:
+        task_events.unsubscribe(identifier, queue)
@@ -4,13 +4,10 @@ This module provides API endpoints for speech-to-text services including transcr
 Alignment, diarization, and combining transcripts with diarization results.
 """
 
-import json
 from datetime import datetime
 
-import pandas as pd
 from fastapi import (
     APIRouter,
-    BackgroundTasks,
     Depends,
     File,
     HTTPException,
@@ -20,14 +17,22 @@ from fastapi import (
 from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
-from ..audio import get_audio_duration, process_audio_file
+from ..audio import probe_audio_duration
 from ..db import get_db_session
-from ..files import ALLOWED_EXTENSIONS, save_temporary_file, validate_extension
+from ..files import (
+    ALLOWED_EXTENSIONS,
+    iter_json_array,
+    load_json_object,
+    save_temporary_file,
+    validate_extension,
+)
+from ..job_queue import enqueue_task
 from ..logger import logger  # Import the logger from the new module
 from ..schemas import (
     AlignedTranscription,
     AlignmentParams,
     ASROptions,
+    CallbackParams,
     Device,
     DiarizationParams,
     DiarizationSegment,
@@ -36,13 +41,6 @@ from ..schemas import (
     VADOptions,
     WhisperModelParams,
 )
-from ..services import (
-    process_alignment,
-    process_diarize,
-    process_speaker_assignment,
-    process_transcribe,
-)
-from ..tasks import add_task_to_db
 from ..transcript import filter_aligned_transcription
 from ..whisperx_services import device
 
@@ -54,11 +52,11 @@ service_router = APIRouter()
     tags=["Speech-2-Text services"],
     name="1. Transcribe",
 )
-async def transcribe(
-    background_tasks: BackgroundTasks,
+def transcribe(
     model_params: WhisperModelParams = Depends(),
     asr_options_params: ASROptions = Depends(),
     vad_options_params: VADOptions = Depends(),
+    callback_params: CallbackParams = Depends(),
     file: UploadFile = File(..., description="Audio/video file to transcribe"),
     session: Session = Depends(get_db_session),
 ) -> Response:
@@ -66,10 +64,10 @@ async def transcribe(
     Transcribe an uploaded audio file.
 
     Args:
-        background_tasks (BackgroundTasks): Background tasks dependency.
         model_params (WhisperModelParams): Whisper model parameters.
         asr_options_params (ASROptions): ASR options parameters.
         vad_options_params (VADOptions): VAD options parameters.
+        callback_params (CallbackParams): URL the result is delivered to.
         file (UploadFile): Uploaded audio file.
         session (Session): Database session dependency.
 
@@ -81,34 +79,24 @@ async def transcribe(
     validate_extension(file.filename, ALLOWED_EXTENSIONS)
 
     temp_file = save_temporary_file(file.file, file.filename)
-    audio = process_audio_file(temp_file)
 
-    identifier = add_task_to_db(
-        status="processing",
+    identifier = enqueue_task(
         file_name=file.filename,
-        audio_duration=get_audio_duration(audio),
+        audio_path=temp_file,
+        audio_duration=probe_audio_duration(temp_file),
         language=model_params.language,
         task_type="transcription",
         task_params={
             **model_params.model_dump(),
             "asr_options": asr_options_params.model_dump(),
             "vad_options": vad_options_params.model_dump(),
+            **callback_params.model_dump(),
         },
         start_time=datetime.utcnow(),
         session=session,
     )
 
-    background_tasks.add_task(
-        process_transcribe,
-        audio,
-        identifier,
-        model_params,
-        asr_options_params,
-        vad_options_params,
-        session,
-    )
-
-    logger.info("Background task scheduled for processing: ID %s", identifier)
+    logger.info("Task queued for processing: ID %s", identifier)
     return Response(identifier=identifier, message="Task queued")
 
 
@@ -118,7 +106,6 @@ async def transcribe(
     name="2. Align Transcript",
 )
 def align(
-    background_tasks: BackgroundTasks,
     transcript: UploadFile = File(
         ..., description="Whisper style transcript json file"
     ),
@@ -130,17 +117,18 @@ def align(
         description="Device to use for PyTorch inference",
     ),
     align_params: AlignmentParams = Depends(),
+    callback_params: CallbackParams = Depends(),
     session: Session = Depends(get_db_session),
 ) -> Response:
     """
     Align a transcript with an audio file.
 
     Args:
-        background_tasks (BackgroundTasks): Background tasks dependency.
         transcript (UploadFile): Uploaded transcript file.
         file (UploadFile): Uploaded audio file.
         device (Device): Device for PyTorch inference.
         align_params (AlignmentParams): Alignment parameters.
+        callback_params (CallbackParams): URL the result is delivered to.
         session (Session): Database session dependency.
 
     Returns:
@@ -156,7 +144,7 @@ def align(
 
     try:
         # Read the content of the transcript file
-        transcript = Transcript(**json.loads(transcript.file.read()))
+        transcript = Transcript(**load_json_object(transcript))
     except ValidationError as e:
         logger.error("Invalid JSON content in transcript file: %s", str(e))
         raise HTTPException(status_code=400, detail=f"Invalid JSON content. {str(e)}")
@@ -164,41 +152,31 @@ def align(
     validate_extension(file.filename, ALLOWED_EXTENSIONS)
 
     temp_file = save_temporary_file(file.file, file.filename)
-    audio = process_audio_file(temp_file)
 
-    identifier = add_task_to_db(
-        status="processing",
+    identifier = enqueue_task(
         file_name=file.filename,
-        audio_duration=get_audio_duration(audio),
+        audio_path=temp_file,
+        audio_duration=probe_audio_duration(temp_file),
         language=transcript.language,
         task_type="transcription_alignment",
         task_params={
             **align_params.model_dump(),
             "device": device,
+            **callback_params.model_dump(),
         },
+        payload={"transcript": transcript.model_dump()},
         start_time=datetime.utcnow(),
         session=session,
     )
 
-    background_tasks.add_task(
-        process_alignment,
-        audio,
-        transcript.model_dump(),
-        identifier,
-        device,
-        align_params,
-        session,
-    )
-
-    logger.info("Background task scheduled for processing: ID %s", identifier)
+    logger.info("Task queued for processing: ID %s", identifier)
     return Response(identifier=identifier, message="Task queued")
 
 
 @service_router.post(
     "/service/diarize", tags=["Speech-2-Text services"], name="3. Diarize"
 )
-async def diarize(
-    background_tasks: BackgroundTasks,
+def diarize(
     file: UploadFile = File(...),
     session: Session = Depends(get_db_session),
     device: Device = Query(
@@ -206,16 +184,17 @@ async def diarize(
         description="Device to use for PyTorch inference",
     ),
     diarize_params: DiarizationParams = Depends(),
+    callback_params: CallbackParams = Depends(),
 ) -> Response:
     """
     Perform diarization on an uploaded audio file.
 
     Args:
-        background_tasks (BackgroundTasks): Background tasks dependency.
         file (UploadFile): Uploaded audio file.
         session (Session): Database session dependency.
         device (Device): Device for PyTorch inference.
         diarize_params (DiarizationParams): Diarization parameters.
+        callback_params (CallbackParams): URL the result is delivered to.
 
     Returns:
         Response: Confirmation message of task queuing.
@@ -225,31 +204,22 @@ async def diarize(
     validate_extension(file.filename, ALLOWED_EXTENSIONS)
 
     temp_file = save_temporary_file(file.file, file.filename)
-    audio = process_audio_file(temp_file)
 
-    identifier = add_task_to_db(
-        # identifier=identifier,
-        status="processing",
+    identifier = enqueue_task(
         file_name=file.filename,
-        audio_duration=get_audio_duration(audio),
+        audio_path=temp_file,
+        audio_duration=probe_audio_duration(temp_file),
         task_type="diarization",
         task_params={
             **diarize_params.model_dump(),
             "device": device,
+            **callback_params.model_dump(),
         },
         start_time=datetime.utcnow(),
         session=session,
     )
-    background_tasks.add_task(
-        process_diarize,
-        audio,
-        identifier,
-        device,
-        diarize_params,
-        session,
-    )
 
-    logger.info("Background task scheduled for processing: ID %s", identifier)
+    logger.info("Task queued for processing: ID %s", identifier)
     return Response(identifier=identifier, message="Task queued")
 
 
@@ -258,19 +228,19 @@ async def diarize(
     tags=["Speech-2-Text services"],
     name="4. Combine Transcript and Diarization result",
 )
-async def combine(
-    background_tasks: BackgroundTasks,
+def combine(
     aligned_transcript: UploadFile = File(...),
     diarization_result: UploadFile = File(...),
+    callback_params: CallbackParams = Depends(),
     session: Session = Depends(get_db_session),
 ) -> Response:
     """
     Combine a transcript with diarization results.
 
     Args:
-        background_tasks (BackgroundTasks): Background tasks dependency.
         aligned_transcript (UploadFile): Uploaded aligned transcript file.
         diarization_result (UploadFile): Uploaded diarization result file.
+        callback_params (CallbackParams): URL the result is delivered to.
         session (Session): Database session dependency.
 
     Returns:
@@ -287,7 +257,7 @@ async def combine(
 
     try:
         # Read the content of the transcript file
-        transcript = AlignedTranscription(**json.loads(aligned_transcript.file.read()))
+        transcript = AlignedTranscription(**load_json_object(aligned_transcript))
         # removing words within each segment that have missing start, end, or score values
         transcript = filter_aligned_transcription(transcript)
     except ValidationError as e:
@@ -296,26 +266,25 @@ async def combine(
     try:
         # Map JSON to list of models
         diarization_segments = []
-        for item in json.loads(diarization_result.file.read()):
+        for item in iter_json_array(diarization_result):
             diarization_segments.append(DiarizationSegment(**item))
     except ValidationError as e:
         logger.error("Invalid JSON content in diarization result file: %s", str(e))
         raise HTTPException(status_code=400, detail=f"Invalid JSON content. {str(e)}")
 
-    identifier = add_task_to_db(
-        status="processing",
+    identifier = enqueue_task(
         file_name=None,
         task_type="combine_transcript&diarization",
+        task_params=callback_params.model_dump(),
+        payload={
+            "diarization_segments": [
+                segment.model_dump() for segment in diarization_segments
+            ],
+            "transcript": transcript.model_dump(),
+        },
         start_time=datetime.utcnow(),
         session=session,
     )
-    background_tasks.add_task(
-        process_speaker_assignment,
-        pd.json_normalize([segment.model_dump() for segment in diarization_segments]),
-        transcript.model_dump(),
-        identifier,
-        session,
-    )
 
-    logger.info("Background task scheduled for processing: ID %s", identifier)
+    logger.info("Task queued for processing: ID %s", identifier)
     return Response(identifier=identifier, message="Task queued")
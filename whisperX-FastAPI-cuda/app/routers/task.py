@@ -1,15 +1,20 @@
 """This module contains the task management routes for the FastAPI application."""
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from ..db import get_db_session
+from ..db import SessionLocal, get_db_session
 from ..logger import logger  # Import the logger from the new module
-from ..schemas import Response, Result, ResultTasks
+from ..progress import stream_task_events, task_events
+from ..schemas import BatchResult, Response, Result, ResultTasks
 from ..tasks import (
     delete_task_from_db,
     get_all_tasks_status_from_db,
+    get_batch_status_from_db,
+    get_task_progress_from_db,
     get_task_status_from_db,
+    get_task_status_value_from_db,
 )
 
 task_router = APIRouter()
@@ -61,6 +66,54 @@ async def get_transcription_status(
         raise HTTPException(status_code=404, detail="Identifier not found")
 
 
+@task_router.get("/task/{identifier}/events", tags=["Tasks Management"])
+async def get_task_events(
+    identifier: str,
+    request: Request,
+    session: Session = Depends(get_db_session),
+) -> StreamingResponse:
+    """
+    Stream the progress of a task as Server-Sent Events.
+
+    The stream starts with a ``snapshot`` event holding the status, progress and
+    segments finalised so far. It continues with ``stage`` events when a processing
+    stage starts or finishes, ``segment`` events for each ASR segment once its text
+    is final, and ends with the ``status`` event of the completed or failed task.
+
+    Args:
+        identifier (str): The identifier of the task.
+        request (Request): The request, to notice when the client disconnects.
+        session (Session): Database session dependency.
+
+    Returns:
+        StreamingResponse: The event stream.
+
+    Raises:
+        HTTPException: If the identifier is not found.
+    """
+    logger.info("Streaming events of task ID: %s", identifier)
+    # Subscribe before taking the snapshot, so that no event falls in between
+    queue = task_events.subscribe(identifier)
+    snapshot = get_task_progress_from_db(identifier, session)
+    if snapshot is None:
+        task_events.unsubscribe(identifier, queue)
+        logger.error("Task ID not found: %s", identifier)
+        raise HTTPException(status_code=404, detail="Identifier not found")
+
+    def poll_status():
+        # The request session may be closed while the response streams
+        with SessionLocal() as poll_session:
+            return get_task_status_value_from_db(identifier, poll_session)
+
+    return StreamingResponse(
+        stream_task_events(
+            identifier, queue, snapshot, request.is_disconnected, poll_status
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @task_router.delete("/task/{identifier}/delete", tags=["Tasks Management"])
 async def delete_task(
     identifier: str,
@@ -86,3 +139,29 @@ async def delete_task(
     else:
         logger.error("Task not found: ID %s", identifier)
         raise HTTPException(status_code=404, detail="Task not found")
+
+
+@task_router.get("/batch/{identifier}", tags=["Tasks Management"])
+async def get_batch_status(
+    identifier: str,
+    session: Session = Depends(get_db_session),
+) -> BatchResult:
+    """
+    Retrieve the aggregate progress of a batch and the status of its tasks.
+
+    Args:
+        identifier (str): The identifier of the batch.
+        session (Session): Database session dependency.
+
+    Returns:
+        BatchResult: The progress of the batch.
+
+    Raises:
+        HTTPException: If the identifier is not found.
+    """
+    logger.info("Retrieving status for batch ID: %s", identifier)
+    status = get_batch_status_from_db(identifier, session)
+    if status is None:
+        logger.error("Batch ID not found: %s", identifier)
+        raise HTTPException(status_code=404, detail="Identifier not found")
+    return status
@@ -0,0 +1,244 @@
+"""This module decides which queued task runs next, based on estimated runtime and memory."""
+
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from .chunked_transcription import long_audio_enabled
+from .config import Config
+from .model_cache import (
+    DIARIZATION_PIPELINE_MB,
+    WHISPER_MODEL_PARAMS_M,
+    device_pool,
+    estimate_align_model_mb,
+    estimate_whisper_model_mb,
+)
+from .models import Task
+from .schemas import TaskStatus, TaskType
+
+# Audio duration assumed for tasks whose duration is unknown
+DEFAULT_AUDIO_SECONDS = 600
+
+# 16 kHz float32 samples, plus features, emissions and embeddings computed from them
+AUDIO_MB_PER_SECOND = 16000 * 4 / 1024**2
+AUDIO_WORKING_SET_FACTOR = 3
+
+# Processing seconds per second of audio, per device pool
+WHISPER_LARGE_RTF = {"cpu": 0.8, "cuda": 0.08}
+ALIGN_RTF = {"cpu": 0.15, "cuda": 0.02}
+DIARIZATION_RTF = {"cpu": 0.3, "cuda": 0.03}
+COMPUTE_TYPE_SPEEDUP = {"float32": 1.0, "float16": 0.6, "int8": 0.5}
+
+TRANSCRIBING_TASKS = {TaskType.full_process, TaskType.transcription}
+ALIGNING_TASKS = {TaskType.full_process, TaskType.transcription_alignment}
+DIARIZING_TASKS = {TaskType.full_process, TaskType.diarization}
+
+
+def _task_type(task) -> TaskType:
+    return TaskType(task.task_type)
+
+
+def _params(task) -> dict:
+    return task.task_params or {}
+
+
+def task_device_pool(task) -> str:
+    """Return the memory pool ("cpu" or "cuda") a task runs in."""
+    if _task_type(task) == TaskType.combine_transcript_diarization:
+        return "cpu"
+    return device_pool(_params(task).get("device", Config.DEVICE))
+
+
+def _audio_seconds(task) -> float:
+    return (
+        task.audio_duration
+        if task.audio_duration is not None
+        else DEFAULT_AUDIO_SECONDS
+    )
+
+
+def _transcription_processes(task) -> int:
+    """Return the number of processes transcribing the task in parallel."""
+    if long_audio_enabled(_audio_seconds(task), task_device_pool(task)):
+        return Config.LONG_AUDIO_PROCESSES
+    return 1
+
+
+def estimate_task_memory_mb(task) -> float:
+    """
+    Estimate the peak memory of a task: the models it needs plus its audio working set.
+
+    Args:
+        task: Task row (or any object with the task columns).
+
+    Returns:
+        float: Estimated memory in MB.
+    """
+    task_type = _task_type(task)
+    if task_type == TaskType.combine_transcript_diarization:
+        return 0.0
+    params = _params(task)
+    memory = _audio_seconds(task) * AUDIO_MB_PER_SECOND * AUDIO_WORKING_SET_FACTOR
+    if task_type in TRANSCRIBING_TASKS:
+        model_mb = estimate_whisper_model_mb(
+            params.get("model", Config.WHISPER_MODEL),
+            params.get("compute_type", Config.COMPUTE_TYPE),
+        )
+        if params.get("draft_model"):
+            model_mb += estimate_whisper_model_mb(
+                params["draft_model"], params.get("compute_type", Config.COMPUTE_TYPE)
+            )
+        # Every worker process of the long-audio mode loads its own model
+        memory += model_mb * _transcription_processes(task)
+    if task_type in ALIGNING_TASKS:
+        memory += estimate_align_model_mb(task.language, params.get("align_model"))
+    if task_type in DIARIZING_TASKS:
+        memory += DIARIZATION_PIPELINE_MB
+    return memory
+
+
+def estimate_task_seconds(task) -> float:
+    """
+    Estimate the runtime of a task from its audio duration, model size and compute type.
+
+    Args:
+        task: Task row (or any object with the task columns).
+
+    Returns:
+        float: Estimated runtime in seconds.
+    """
+    task_type = _task_type(task)
+    if task_type == TaskType.combine_transcript_diarization:
+        return 1.0
+    params = _params(task)
+    pool = task_device_pool(task)
+    rtf = 0.0
+    if task_type in TRANSCRIBING_TASKS:
+        models = [params.get("model", Config.WHISPER_MODEL)]
+        if params.get("draft_model"):
+            models.append(params["draft_model"])
+        size = sum(
+            WHISPER_MODEL_PARAMS_M.get(
+                str(model).removesuffix(".en"), WHISPER_MODEL_PARAMS_M["large"]
+            )
+            for model in models
+        )
+        rtf += (
+            WHISPER_LARGE_RTF[pool]
+            * size
+            / WHISPER_MODEL_PARAMS_M["large"]
+            * COMPUTE_TYPE_SPEEDUP.get(
+                str(params.get("compute_type", Config.COMPUTE_TYPE)), 1.0
+            )
+            / _transcription_processes(task)
+        )
+    if task_type in ALIGNING_TASKS:
+        rtf += ALIGN_RTF[pool]
+    if task_type in DIARIZING_TASKS:
+        rtf += DIARIZATION_RTF[pool]
+    return _audio_seconds(task) * rtf
+
+
+def priority(task, now: datetime = None) -> float:
+    """
+    Return the scheduling priority of a queued task, lower runs first.
+
+    Shorter jobs come first; every second spent waiting lowers the value by
+    SCHEDULER_AGING_FACTOR, so long jobs are not starved by a stream of short ones.
+
+    Args:
+        task: Queued task.
+        now (datetime, optional): Reference time. Defaults to the current time.
+
+    Returns:
+        float: Priority value.
+    """
+    now = now or datetime.utcnow()
+    waited = (now - task.created_at).total_seconds() if task.created_at else 0.0
+    return estimate_task_seconds(task) - Config.SCHEDULER_AGING_FACTOR * waited
+
+
+def memory_budget_mb(pool: str) -> float:
+    """Return the memory budget shared by the running tasks of a device pool."""
+    return Config.SCHEDULER_GPU_MB if pool == "cuda" else Config.SCHEDULER_CPU_MB
+
+
+def _queued_tasks_in_order(session: Session, now: datetime) -> list:
+    """
+    Return the queued tasks sorted by priority.
+
+    Tasks of a batch are kept together at the priority of their most urgent task,
+    so they run back to back with the same models loaded.
+    """
+    queued = session.query(Task).filter(Task.status == TaskStatus.queued).all()
+    priorities = {task.id: priority(task, now) for task in queued}
+    group_priorities = {}
+    for task in queued:
+        group = task.batch_id or task.id
+        group_priorities[group] = min(
+            group_priorities.get(group, priorities[task.id]), priorities[task.id]
+        )
+    return sorted(
+        queued,
+        key=lambda task: (
+            group_priorities[task.batch_id or task.id],
+            str(task.batch_id or ""),
+            priorities[task.id],
+            task.created_at,
+            task.id,
+        ),
+    )
+
+
+def select_next_task(session: Session):
+    """
+    Pick the queued task to run next, or None if no queued task fits the memory budget.
+
+    Tasks are considered in priority order. A task is admitted if its estimated memory
+    fits next to the running tasks of its device pool, or if nothing runs in that pool.
+    Once a task does not fit, lower priority tasks of the same pool are held back as
+    well, so a large task is not overtaken forever by smaller ones.
+
+    Args:
+        session (Session): Database session.
+
+    Returns:
+        Task: The selected task, or None.
+    """
+    now = datetime.utcnow()
+    used = {"cpu": 0.0, "cuda": 0.0}
+    running = {"cpu": 0, "cuda": 0}
+    for task in session.query(Task).filter(Task.status == TaskStatus.running):
+        pool = task_device_pool(task)
+        used[pool] += estimate_task_memory_mb(task)
+        running[pool] += 1
+
+    blocked = set()
+    for task in _queued_tasks_in_order(session, now):
+        pool = task_device_pool(task)
+        if pool in blocked:
+            continue
+        required = used[pool] + estimate_task_memory_mb(task)
+        if not running[pool] or required <= memory_budget_mb(pool):
+            return task
+        blocked.add(pool)
+    return None
+
+
+def queue_position(session: Session, identifier: str):
+    """
+    Return the 1-based position of a queued task in scheduling order.
+
+    Args:
+        session (Session): Database session.
+        identifier (str): Identifier of the task.
+
+    Returns:
+        int: Queue position, or None if the task is not queued.
+    """
+    for position, task in enumerate(
+        _queued_tasks_in_order(session, datetime.utcnow()), 1
+    ):
+        if task.uuid == identifier:
+            return position
+    return None
@@ -0,0 +1,124 @@
+"""This module warms up the models at startup and reports whether the service is ready for traffic."""
+
+import threading
+import time
+
+from .audio import synthetic_clip
+from .calibration import calibrate, load_profile
+from .config import Config
+from .logger import logger
+from .model_cache import align_models, diarization_pipelines, whisper_models
+from .whisperx_services import (
+    warm_up_align_models,
+    warm_up_diarization,
+    warm_up_whisper,
+)
+
+
+def warm_up_enabled() -> bool:
+    """Return whether any model is configured to be calibrated or warmed up at startup."""
+    return bool(
+        Config.CALIBRATE
+        or Config.ASR_WARMUP
+        or Config.ALIGN_WARMUP_LANGUAGES
+        or Config.DIARIZATION_WARMUP
+    )
+
+
+def loaded_models() -> dict:
+    """
+    Return the models currently resident in the model caches.
+
+    Returns:
+        dict: Lists of models (key, pool, size and load time) per cache.
+    """
+    return {
+        "asr": whisper_models.stats()["models"],
+        "alignment": align_models.stats()["models"],
+        "diarization": diarization_pipelines.stats()["models"],
+    }
+
+
+class ModelWarmUp:
+    """
+    Loads the configured models in the background and runs each on a synthetic clip.
+
+    On the first start of a host with CALIBRATE set, the ASR is calibrated before,
+    so the ASR warm-up already uses the calibrated defaults.
+
+    Until the warm-up has finished, the readiness probe reports the service as not
+    ready, so load balancers do not route the first requests to a replica that would
+    still pay for loading its models. A model that fails to warm up is reported,
+    but does not keep the service from becoming ready.
+    """
+
+    def __init__(self):
+        """Initialize the warm-up as not started."""
+        self.state = "pending"
+        self.seconds = None
+        self.errors = {}
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        """Return whether the warm-up has finished or there is nothing to warm up."""
+        return self.state == "completed" or not warm_up_enabled()
+
+    def start(self):
+        """Run the warm-up in a background thread, if any model is configured for it."""
+        if not warm_up_enabled():
+            self.state = "completed"
+            return
+        self._thread = threading.Thread(
+            target=self.run, name="model-warmup", daemon=True
+        )
+        self._thread.start()
+
+    def run(self):
+        """Calibrate and warm up the configured models one after the other."""
+        self.state = "running"
+        start = time.perf_counter()
+        clip = synthetic_clip()
+        if Config.CALIBRATE and load_profile() is None:
+            self._step("calibration", calibrate)
+        if Config.ASR_WARMUP:
+            self._step("asr", warm_up_whisper, Config.ASR_WARMUP_LANGUAGE)
+        if Config.ALIGN_WARMUP_LANGUAGES:
+            failed = self._step(
+                "alignment",
+                warm_up_align_models,
+                Config.ALIGN_WARMUP_LANGUAGES,
+                audio=clip,
+            )
+            if failed:
+                self.errors["alignment"] = f"No alignment model for {', '.join(failed)}"
+        if Config.DIARIZATION_WARMUP:
+            self._step("diarization", warm_up_diarization, audio=clip)
+        self.seconds = time.perf_counter() - start
+        self.state = "completed"
+        logger.info("Model warm-up completed in %.2fs", self.seconds)
+
+    def _step(self, name: str, func, *args, **kwargs):
+        """Run one warm-up step, recording instead of raising its error."""
+        try:
+            return func(*args, **kwargs)
+        except Exception as exc:
+            logger.exception("%s warm-up failed:", name)
+            self.errors[name] = str(exc)
+            return None
+
+    def status(self) -> dict:
+        """
+        Return the state of the warm-up.
+
+        Returns:
+            dict: State, duration in seconds and errors per model.
+        """
+        return {
+            "state": self.state if warm_up_enabled() else "disabled",
+            "seconds": self.seconds,
+            "errors": dict(self.errors),
+        }
+
+
+model_warmup = ModelWarmUp()
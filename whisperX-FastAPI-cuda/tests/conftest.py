@@ -0,0 +1,47 @@
+"""Fixtures shared by the tests working on the database."""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import Base, Task
+from app.schemas import TaskStatus
+
+
+@pytest.fixture
+def session_factory():
+    """Session factory of a fresh in-memory database."""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def session(session_factory):
+    """Session bound to a fresh in-memory database."""
+    with session_factory() as db:
+        yield db
+
+
+@pytest.fixture
+def add_task(session):
+    """Return a function inserting a queued full_process task with the given columns."""
+    defaults = {
+        "status": TaskStatus.queued,
+        "task_type": "full_process",
+        "audio_path": "/tmp/audio.wav",
+    }
+
+    def add(**fields) -> Task:
+        task = Task(**{**defaults, **fields})
+        session.add(task)
+        session.commit()
+        return task
+
+    return add
@@ -0,0 +1,148 @@
+"""Tests for the callbacks module."""
+
+import hashlib
+import hmac
+import json
+from unittest.mock import Mock, patch
+
+import httpx
+import pytest
+
+from app import callbacks
+from app.callbacks import (
+    SIGNATURE_HEADER,
+    TIMESTAMP_HEADER,
+    deliver_callback,
+    post_callback,
+    resume_callbacks,
+    schedule_callback,
+    sign,
+)
+from app.config import Config
+from app.models import Task
+from app.schemas import TaskStatus
+
+URL = "http://processing:8000/transcription_callback"
+
+
+@pytest.fixture
+def sessions(session_factory, monkeypatch):
+    """Session factory of the test database, also used by the deliveries."""
+    monkeypatch.setattr(callbacks, "SessionLocal", session_factory)
+    return session_factory
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    """Retry without waiting."""
+    monkeypatch.setattr(Config, "CALLBACK_ATTEMPTS", 3)
+    monkeypatch.setattr(Config, "CALLBACK_BACKOFF_SECONDS", 0)
+    monkeypatch.setattr(Config, "CALLBACK_SECRET", "secret")
+
+
+@pytest.fixture
+def add_finished(add_task):
+    """Return a function inserting a finished task and returning its identifier."""
+
+    def add(status=TaskStatus.completed, callback_url=URL, **fields) -> str:
+        return add_task(
+            status=status,
+            file_name="2025-11-21 09-54-17.mp3",
+            task_params={"callback_url": callback_url},
+            **fields,
+        ).uuid
+
+    return add
+
+
+def response(status_code):
+    """Return a response to a callback."""
+    return httpx.Response(status_code, request=httpx.Request("POST", URL))
+
+
+def test_signature_covers_timestamp_and_body():
+    """The signature is the HMAC-SHA256 of the timestamp and the body."""
+    expected = hmac.new(b"secret", b"1700000000.{}", hashlib.sha256).hexdigest()
+    assert sign(b"{}", "1700000000", "secret") == f"sha256={expected}"
+
+
+def test_server_errors_are_retried():
+    """Deliveries are retried after 5xx responses and signed on every attempt."""
+    with patch(
+        "app.callbacks.httpx.post", side_effect=[response(503), response(200)]
+    ) as post:
+        assert post_callback(URL, "task", b"{}") == (2, None)
+
+    headers = post.call_args.kwargs["headers"]
+    assert headers[SIGNATURE_HEADER] == sign(b"{}", headers[TIMESTAMP_HEADER], "secret")
+
+
+def test_client_errors_are_final():
+    """A 4xx response other than 408 and 429 is not retried."""
+    with patch("app.callbacks.httpx.post", return_value=response(400)) as post:
+        assert post_callback(URL, "task", b"{}") == (1, "HTTP 400")
+    assert post.call_count == 1
+
+
+def test_network_errors_use_up_the_attempts(monkeypatch):
+    """Unreachable receivers are tried CALLBACK_ATTEMPTS times; without a secret nothing is signed."""
+    monkeypatch.setattr(Config, "CALLBACK_SECRET", None)
+    with patch(
+        "app.callbacks.httpx.post", side_effect=httpx.ConnectError("refused")
+    ) as post:
+        attempts, error = post_callback(URL, "task", b"{}")
+
+    assert (attempts, error) == (3, "ConnectError: refused")
+    assert SIGNATURE_HEADER not in post.call_args.kwargs["headers"]
+
+
+def test_delivery_posts_the_task_and_records_the_outcome(sessions, add_finished):
+    """The body is the task as returned by /task/{identifier}; the outcome is stored on the task."""
+    identifier = add_finished(
+        result={"segments": [{"text": "Hallo", "start": 0, "end": 1}]}, language="de"
+    )
+
+    with patch("app.callbacks.httpx.post", return_value=response(204)) as post:
+        deliver_callback(identifier)
+
+    body = json.loads(post.call_args.kwargs["content"])
+    assert body["identifier"] == identifier
+    assert body["status"] == "completed"
+    assert body["result"]["segments"][0]["text"] == "Hallo"
+    assert body["metadata"]["file_name"] == "2025-11-21 09-54-17.mp3"
+    assert "callback" not in body
+    with sessions() as session:
+        task = session.query(Task).filter(Task.uuid == identifier).one()
+        assert (task.callback_status, task.callback_attempts, task.callback_error) == (
+            "delivered",
+            1,
+            None,
+        )
+
+
+def test_only_finished_tasks_with_a_url_are_scheduled(session, add_finished):
+    """Deliveries are queued for completed and failed tasks that were given a callback URL."""
+    failed = add_finished(status=TaskStatus.failed)
+    running = add_finished(status=TaskStatus.processing)
+    without_url = add_finished(callback_url=None)
+
+    with patch.object(callbacks, "callback_executor", Mock()) as executor:
+        assert schedule_callback(failed, session)
+        assert not schedule_callback(running, session)
+        assert not schedule_callback(without_url, session)
+
+        executor.submit.assert_called_once_with(deliver_callback, failed)
+        assert (
+            session.query(Task).filter(Task.uuid == failed).one().callback_status
+            == "pending"
+        )
+
+
+def test_pending_deliveries_are_resumed(session, add_finished):
+    """Deliveries still pending when the process stopped are queued again."""
+    pending = add_finished(callback_status="pending")
+    add_finished(callback_status="delivered")
+
+    with patch.object(callbacks, "callback_executor", Mock()) as executor:
+        assert resume_callbacks(session) == 1
+        executor.submit.assert_called_once_with(deliver_callback, pending)
@@ -0,0 +1,161 @@
+"""Tests for the downloads module."""
+
+import asyncio
+import os
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app import downloads
+from app.audio import decoded_audio_path
+
+CONTENT = bytes(range(256)) * 1024
+URL = "http://media.example/audio.mp3"
+
+
+class FlakyStream(httpx.AsyncByteStream):
+    """Response body that breaks the connection after ``fail_after`` bytes."""
+
+    def __init__(self, data: bytes, fail_after: int = None):
+        self.data = data
+        self.fail_after = fail_after
+
+    async def __aiter__(self):
+        end = len(self.data) if self.fail_after is None else self.fail_after
+        for start in range(0, end, 4096):
+            yield self.data[start : min(start + 4096, end)]
+        if self.fail_after is not None:
+            raise httpx.ReadError("connection reset")
+
+
+def make_client(handler):
+    """Return an AsyncClient served by ``handler``."""
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.fixture(autouse=True)
+def no_streaming_decode(monkeypatch):
+    """Skip the ffmpeg decoder, so the tests do not need ffmpeg."""
+
+    class NoStreamingDecoder(downloads.StreamingDecoder):
+        async def start(self):
+            self._failed = True
+
+    monkeypatch.setattr(downloads, "StreamingDecoder", NoStreamingDecoder)
+
+
+def read(path):
+    """Return the content of a downloaded file."""
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def download(handler, **kwargs):
+    """Run download_audio against ``handler`` and return its result."""
+
+    async def run():
+        async with make_client(handler) as client:
+            return await downloads.download_audio(URL, client=client, **kwargs)
+
+    return asyncio.run(run())
+
+
+def test_download_resumes_with_range_request():
+    """An interrupted transfer continues at the received offset."""
+    ranges = []
+
+    def handler(request):
+        ranges.append(request.headers.get("Range"))
+        if len(ranges) == 1:
+            return httpx.Response(200, stream=FlakyStream(CONTENT, fail_after=100_000))
+        offset = int(request.headers["Range"].removeprefix("bytes=").rstrip("-"))
+        return httpx.Response(206, stream=FlakyStream(CONTENT[offset:]))
+
+    path, filename = download(handler)
+    try:
+        assert ranges == [None, "bytes=100000-"]
+        assert filename == "audio.mp3"
+        assert read(path) == CONTENT
+    finally:
+        os.remove(path)
+
+
+def test_download_skips_resent_bytes_when_range_is_ignored():
+    """A server answering a Range request with the full file is handled."""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        fail_after = 50_000 if len(calls) == 1 else None
+        return httpx.Response(200, stream=FlakyStream(CONTENT, fail_after=fail_after))
+
+    path, _ = download(handler)
+    try:
+        assert read(path) == CONTENT
+    finally:
+        os.remove(path)
+
+
+def test_download_uses_content_disposition_filename():
+    """The file name and extension come from the Content-Disposition header."""
+
+    def handler(request):
+        return httpx.Response(
+            200,
+            headers={"Content-Disposition": 'attachment; filename="meeting.wav"'},
+            content=CONTENT,
+        )
+
+    path, filename = download(handler)
+    try:
+        assert filename == "meeting.wav"
+        assert path.endswith(".wav")
+    finally:
+        os.remove(path)
+
+
+def test_download_rejects_oversized_file():
+    """Files above the size limit are rejected."""
+
+    def handler(request):
+        return httpx.Response(200, content=CONTENT)
+
+    with pytest.raises(HTTPException) as error:
+        download(handler, max_bytes=1024)
+    assert error.value.status_code == 413
+
+
+def test_download_reports_http_errors():
+    """Error responses of the remote host result in a 400 error."""
+
+    def handler(request):
+        return httpx.Response(404)
+
+    with pytest.raises(HTTPException) as error:
+        download(handler)
+    assert error.value.status_code == 400
+
+
+def test_download_gives_up_after_retries():
+    """A connection that keeps failing is reported after the configured retries."""
+
+    def handler(request):
+        return httpx.Response(200, stream=FlakyStream(CONTENT, fail_after=0))
+
+    with pytest.raises(HTTPException) as error:
+        download(handler, retries=2)
+    assert error.value.status_code == 400
+
+
+def test_failed_decode_leaves_no_sidecar_file():
+    """Without a decoded sidecar file the worker falls back to decoding the download."""
+
+    def handler(request):
+        return httpx.Response(200, content=CONTENT)
+
+    path, _ = download(handler)
+    try:
+        assert not os.path.exists(decoded_audio_path(path))
+    finally:
+        os.remove(path)
@@ -0,0 +1,110 @@
+"""Tests for the job_queue module."""
+
+from datetime import datetime, timedelta
+
+from app.job_queue import claim_next_task, release_lease, requeue_expired_tasks
+from app.models import Task
+from app.schemas import TaskStatus
+from app.tasks import add_batch_to_db, get_batch_status_from_db
+
+
+def get_task(session, identifier):
+    """Reload a task from the database."""
+    session.expire_all()
+    return session.query(Task).filter(Task.uuid == identifier).first()
+
+
+def test_claim_takes_oldest_task_once(session, add_task):
+    """Tasks are claimed in creation order and never handed out twice."""
+    now = datetime.utcnow()
+    add_task(uuid="second", created_at=now)
+    add_task(uuid="first", created_at=now - timedelta(seconds=5))
+
+    assert claim_next_task(session, "worker-a") == "first"
+    assert claim_next_task(session, "worker-b") == "second"
+    assert claim_next_task(session, "worker-a") is None
+
+    task = get_task(session, "first")
+    assert task.status == TaskStatus.running
+    assert task.worker_id == "worker-a"
+    assert task.attempts == 1
+    assert task.lease_expires_at > datetime.utcnow()
+
+
+def test_expired_lease_is_requeued(session, add_task):
+    """A task left running by a dead worker goes back to the queue."""
+    add_task(
+        uuid="orphan",
+        status=TaskStatus.running,
+        attempts=1,
+        worker_id="dead-worker",
+        lease_expires_at=datetime.utcnow() - timedelta(seconds=1),
+    )
+
+    assert requeue_expired_tasks(session, max_attempts=3) == 1
+    task = get_task(session, "orphan")
+    assert task.status == TaskStatus.queued
+    assert task.worker_id is None
+    assert claim_next_task(session, "worker-a") == "orphan"
+    assert get_task(session, "orphan").attempts == 2
+
+
+def test_active_lease_is_kept(session, add_task):
+    """Tasks whose lease has not expired are left alone."""
+    add_task(
+        uuid="busy",
+        status=TaskStatus.running,
+        attempts=1,
+        worker_id="worker-a",
+        lease_expires_at=datetime.utcnow() + timedelta(minutes=5),
+    )
+
+    assert requeue_expired_tasks(session) == 0
+    assert get_task(session, "busy").status == TaskStatus.running
+
+
+def test_task_fails_after_max_attempts(session, add_task):
+    """An expired task that used up its attempts is marked as failed."""
+    add_task(
+        uuid="crashy",
+        status=TaskStatus.running,
+        attempts=3,
+        lease_expires_at=datetime.utcnow() - timedelta(seconds=1),
+    )
+
+    assert requeue_expired_tasks(session, max_attempts=3) == 0
+    task = get_task(session, "crashy")
+    assert task.status == TaskStatus.failed
+    assert "3 attempt" in task.error
+
+
+def test_release_fails_task_left_running(session, add_task):
+    """Releasing a lease of a task without result marks it as failed."""
+    add_task(uuid="lost")
+    claim_next_task(session, "worker-a")
+
+    release_lease(session, "lost", "worker-a")
+    task = get_task(session, "lost")
+    assert task.status == TaskStatus.failed
+    assert task.worker_id is None
+    assert task.lease_expires_at is None
+
+
+def test_batch_progress_follows_its_tasks(session, add_task):
+    """The progress of a batch is the finished share of its audio duration."""
+    batch_id = add_batch_to_db(session=session)
+    add_task(
+        uuid="done", status=TaskStatus.completed, batch_id=batch_id, audio_duration=30
+    )
+    add_task(
+        uuid="busy", status=TaskStatus.running, batch_id=batch_id, audio_duration=90
+    )
+    add_task(uuid="other", audio_duration=60)
+
+    batch = get_batch_status_from_db(batch_id, session=session)
+
+    assert batch.status == "running"
+    assert batch.progress == 0.25
+    assert batch.counts == {"completed": 1, "running": 1}
+    assert [task.identifier for task in batch.tasks] == ["done", "busy"]
+    assert get_batch_status_from_db("unknown", session=session) is None
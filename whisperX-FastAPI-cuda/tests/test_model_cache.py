@@ -0,0 +1,83 @@
+"""Tests for the model_cache module."""
+
+import pytest
+
+from app.model_cache import ModelRegistry, estimate_whisper_model_mb, freeze
+
+
+@pytest.fixture
+def registry():
+    """Registry with room for two 100 MB models on CPU and none on GPU."""
+    return ModelRegistry("test cache", {"cpu": 200, "cuda": 0})
+
+
+def test_cache_hit_reuses_loaded_model(registry):
+    """A second use of the same key must not call the loader again."""
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return object()
+
+    with registry.use("a", loader, size_mb=100) as first:
+        pass
+    with registry.use("a", loader, size_mb=100) as second:
+        pass
+
+    assert first is second
+    assert len(calls) == 1
+    stats = registry.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 0
+
+
+def test_least_recently_used_model_is_evicted(registry):
+    """Loading past the budget evicts the least recently used model."""
+    for key in ("a", "b"):
+        with registry.use(key, object, size_mb=100):
+            pass
+    with registry.use("a", object, size_mb=100):
+        pass
+    with registry.use("c", object, size_mb=100):
+        pass
+
+    assert registry.keys() == ["a", "c"]
+    assert registry.stats()["evictions"] == 1
+
+
+def test_zero_budget_disables_caching(registry):
+    """With a budget of zero, models are dropped right after use."""
+    with registry.use("gpu-model", object, device="cuda", size_mb=100):
+        assert registry.keys() == ["gpu-model"]
+    assert registry.keys() == []
+
+
+def test_failed_load_is_not_cached(registry):
+    """A loader error propagates and leaves no entry behind."""
+
+    def loader():
+        raise ValueError("broken model")
+
+    with pytest.raises(ValueError):
+        with registry.use("a", loader, size_mb=100):
+            pass
+    assert registry.keys() == []
+
+
+def test_freeze_makes_options_hashable():
+    """Nested option dicts are converted into hashable, order-independent keys."""
+    first = freeze({"b": [1, 2], "a": {"x": None}})
+    second = freeze({"a": {"x": None}, "b": [1, 2]})
+    assert first == second
+    assert hash(first) == hash(second)
+
+
+def test_estimate_whisper_model_mb_scales_with_compute_type():
+    """int8 models are estimated smaller than float16 ones."""
+    assert estimate_whisper_model_mb("large-v3", "int8") < estimate_whisper_model_mb(
+        "large-v3", "float16"
+    )
+    assert estimate_whisper_model_mb("tiny.en", "int8") == estimate_whisper_model_mb(
+        "tiny", "int8"
+    )
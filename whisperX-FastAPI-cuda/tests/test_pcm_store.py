@@ -0,0 +1,115 @@
+"""Tests for the pcm_store module."""
+
+import os
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from app.pcm_store import _decode_to_spill, open_audio, remove_spill, spill_path
+
+
+def fake_decode(waveform):
+    """Return a decode_audio stand-in writing ``waveform`` to the output file."""
+
+    def decode(source, output_file=None):
+        waveform.tofile(output_file)
+
+    return decode
+
+
+def test_decoded_audio_is_memory_mapped(tmp_path):
+    """Audio decoded during the download is mapped without decoding it again."""
+    media = str(tmp_path / "meeting.mp4")
+    waveform = np.linspace(-1, 1, 1_000_000, dtype=np.float32)
+    with patch("app.pcm_store.decode_audio", side_effect=fake_decode(waveform)):
+        _decode_to_spill(media, spill_path(media))
+
+    with patch("app.pcm_store.decode_audio") as decode:
+        audio = open_audio(media)
+
+    decode.assert_not_called()
+    assert isinstance(audio, np.memmap)
+    assert audio.dtype == np.float32
+    assert np.array_equal(audio, waveform)
+
+
+def test_audio_is_decoded_only_once(tmp_path):
+    """ffmpeg writes the spill file once, later stages map it."""
+    media = str(tmp_path / "meeting.mp3")
+    waveform = np.linspace(-1, 1, 32000, dtype=np.float32)
+
+    with patch(
+        "app.pcm_store.decode_audio", side_effect=fake_decode(waveform)
+    ) as decode:
+        first = open_audio(media)
+        second = open_audio(media)
+
+    decode.assert_called_once()
+    assert np.array_equal(first, waveform)
+    assert np.array_equal(second, waveform)
+
+
+def test_failed_decode_leaves_no_spill(tmp_path):
+    """A decode error propagates and leaves no partial file behind."""
+    media = str(tmp_path / "broken.mp3")
+
+    def decode(source, output_file=None):
+        with open(output_file, "wb") as output:
+            output.write(b"\0" * 16)
+        raise RuntimeError("Failed to load audio")
+
+    with patch("app.pcm_store.decode_audio", side_effect=decode):
+        with pytest.raises(RuntimeError):
+            open_audio(media)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_mapping_is_copy_on_write(tmp_path):
+    """Writing to a mapped view does not change the spill file."""
+    media = str(tmp_path / "meeting.mp3")
+    with patch(
+        "app.pcm_store.decode_audio", side_effect=fake_decode(np.zeros(100, np.float32))
+    ):
+        audio = open_audio(media)
+    audio[:10] = 1.0
+
+    assert not np.fromfile(spill_path(media), np.float32)[:10].any()
+
+
+def test_tasks_on_one_shared_file_use_own_spills(tmp_path, monkeypatch):
+    """Two tasks on the same shared file decode it separately and remove only their own spill."""
+    monkeypatch.setattr("app.config.Config.SHARED_INPUT_ROOTS", [str(tmp_path)])
+    media = str(tmp_path / "meeting.mp3")
+    waveform = np.linspace(-1, 1, 16000, dtype=np.float32)
+
+    with patch(
+        "app.pcm_store.decode_audio", side_effect=fake_decode(waveform)
+    ) as decode:
+        first = open_audio(media, identifier="first")
+        second = open_audio(media, identifier="second")
+
+    assert decode.call_count == 2
+    assert spill_path(media, "first") != spill_path(media, "second")
+    remove_spill(media, "first")
+    assert not os.path.exists(spill_path(media, "first"))
+    assert np.array_equal(second, waveform)
+    assert os.path.exists(spill_path(media, "second"))
+    del first, second
+    remove_spill(media, "second")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_remove_spill(tmp_path):
+    """The spill file is deleted, and a missing file is ignored."""
+    media = str(tmp_path / "meeting.mp3")
+    with patch(
+        "app.pcm_store.decode_audio", side_effect=fake_decode(np.zeros(10, np.float32))
+    ):
+        open_audio(media)
+    assert os.path.exists(spill_path(media))
+
+    remove_spill(media)
+    remove_spill(media)
+    assert not os.path.exists(spill_path(media))
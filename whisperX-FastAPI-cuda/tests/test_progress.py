@@ -0,0 +1,253 @@
+"""Tests for the progress module."""
+
+import asyncio
+import json
+import threading
+
+import pytest
+
+from app import progress as progress_module
+from app.metrics import TaskMetrics
+from app.models import TaskSegment
+from app.progress import (
+    TaskProgress,
+    current_task_progress,
+    reporting,
+    running_task_progress,
+    stream_task_events,
+    task_events,
+)
+from app.tasks import (
+    get_task_progress_from_db,
+    get_task_status_from_db,
+    update_task_status_in_db,
+)
+
+
+def segment(start, end, text="text"):
+    """Return an ASR segment."""
+    return {"start": start, "end": end, "text": text}
+
+
+async def collect(stream) -> list:
+    """Return the events of a stream as (event, data) tuples, comments as (None, comment)."""
+    events = []
+    async for message in stream:
+        if message.startswith(":"):
+            events.append((None, message.strip()))
+            continue
+        lines = dict(line.split(": ", 1) for line in message.strip().splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+async def connected():
+    """A client that never disconnects."""
+    return False
+
+
+def test_segments_advance_the_percent_and_writes_are_throttled():
+    """Segments set the share of the audio transcribed; their writes are at most one per interval."""
+    writes = []
+    progress = TaskProgress("task", persist=writes.append, audio_seconds=20)
+
+    progress.add_segments([segment(0, 5)])
+    progress.add_segments([segment(5, 10, "more")])
+
+    assert progress.percent == 50.0
+    assert len(writes) == 1
+    assert writes[0]["partial_segments"] == [{"index": 0, **segment(0, 5)}]
+
+    progress.complete_segments(
+        [segment(0, 5), segment(5, 10, "more"), segment(10, 18, "last")]
+    )
+
+    assert progress.percent == 100.0
+    # Only the segments not written before
+    assert len(writes) == 2
+    assert writes[-1]["partial_segments"] == [
+        {"index": 1, **segment(5, 10, "more")},
+        {"index": 2, **segment(10, 18, "last")},
+    ]
+    assert writes[-1]["progress"]["percent"] == 100.0
+
+    progress.finish_stage("transcription")
+    assert "partial_segments" not in writes[-1]
+
+
+def test_segments_are_appended_to_the_database(session, add_task):
+    """Each write adds the new segments only; the result removes them."""
+    add_task(uuid="task", status="processing")
+    progress = TaskProgress(
+        "task",
+        persist=lambda update_data: update_task_status_in_db(
+            "task", update_data, session=session
+        ),
+    )
+
+    progress.add_segments([segment(0, 5), segment(5, 10, "more")])
+    progress.complete_segments(
+        [segment(0, 5), segment(5, 10, "more"), segment(10, 18, "last")]
+    )
+
+    status = get_task_status_from_db("task", session=session)
+    assert status["result_stage"] == "partial"
+    assert [item["text"] for item in status["partial_result"]["segments"]] == [
+        "text",
+        "more",
+        "last",
+    ]
+    assert get_task_progress_from_db("task", session=session)["segments"] == [
+        segment(0, 5),
+        segment(5, 10, "more"),
+        segment(10, 18, "last"),
+    ]
+    assert session.query(TaskSegment).count() == 3
+
+    # A new attempt of the task replaces the segments of the earlier one
+    TaskProgress(
+        "task",
+        persist=lambda update_data: update_task_status_in_db(
+            "task", update_data, session=session
+        ),
+    ).add_segments([segment(0, 4, "again")])
+    assert session.query(TaskSegment.text).order_by(TaskSegment.position).all() == [
+        ("again",)
+    ]
+
+    update_task_status_in_db(
+        "task",
+        {"status": "completed", "result": {"segments": []}, "partial_segments": None},
+        session=session,
+    )
+    status = get_task_status_from_db("task", session=session)
+    assert (status["result_stage"], status["partial_result"]) == ("final", None)
+    assert session.query(TaskSegment).count() == 0
+
+
+def test_stage_is_the_last_running_one():
+    """Nested and parallel stages leave the stage started last that still runs as current stage."""
+    progress = TaskProgress("task")
+    progress.start_stage("diarization")
+    progress.start_stage("transcription")
+    progress.start_stage("vad")
+    progress.finish_stage("vad", 1.0)
+
+    assert progress.stage == "transcription"
+
+    progress.finish_stage("transcription", 2.0)
+    progress.finish_stage("diarization", 3.0, failed=True)
+
+    assert progress.stage == "diarization"
+    assert progress.as_dict()["stages"] == {
+        "diarization": "failed",
+        "transcription": "completed",
+        "vad": "completed",
+    }
+
+
+def test_only_the_owning_thread_writes():
+    """Stages reported by other threads are written with the next change on the owning thread."""
+    writes = []
+    progress = TaskProgress("task", persist=writes.append)
+
+    worker = threading.Thread(target=progress.start_stage, args=("diarization",))
+    worker.start()
+    worker.join()
+    assert writes == []
+
+    progress.start_stage("transcription")
+    assert writes[-1]["progress"]["stages"] == {
+        "diarization": "started",
+        "transcription": "started",
+    }
+
+
+def test_metrics_stages_report_to_the_progress():
+    """Stages measured by the task metrics report their start and end."""
+    progress = TaskProgress("task")
+    metrics = TaskMetrics(progress=progress)
+
+    metrics.measure("alignment", lambda: None)
+    with pytest.raises(ValueError):
+        metrics.measure("speaker_assignment", lambda: int("x"))
+
+    assert progress.stages == {"alignment": "completed", "speaker_assignment": "failed"}
+
+
+def test_reporting_registers_the_running_task():
+    """The progress reported to on a thread is found by identifier while it runs."""
+    progress = TaskProgress("running")
+    with reporting(progress):
+        assert current_task_progress() is progress
+        assert running_task_progress("running") is progress
+        with reporting(None):
+            assert current_task_progress() is None
+        assert current_task_progress() is progress
+
+    assert current_task_progress() is None
+    assert running_task_progress("running") is None
+
+
+def test_events_of_other_threads_reach_the_subscriber():
+    """Events published by a worker thread arrive on the event loop of the subscriber."""
+
+    async def follow():
+        queue = task_events.subscribe("task")
+        progress = TaskProgress("task", audio_seconds=10)
+        worker = threading.Thread(target=progress.add_segments, args=([segment(0, 2)],))
+        worker.start()
+        worker.join()
+        event = await asyncio.wait_for(queue.get(), 1)
+        task_events.unsubscribe("task", queue)
+        return event
+
+    event, data = asyncio.run(follow())
+
+    assert event == "segment"
+    assert data == {"index": 0, **segment(0, 2), "percent": 20.0}
+
+
+def test_stream_ends_with_the_final_status():
+    """The stream sends the snapshot and the events, and ends once the task completed."""
+
+    async def follow():
+        queue = task_events.subscribe("task")
+        task_events.publish(
+            "task", "stage", {"stage": "transcription", "state": "started"}
+        )
+        task_events.publish("task", "status", {"status": "completed", "error": None})
+        task_events.publish("task", "stage", {"stage": "late", "state": "started"})
+        snapshot = {"status": "processing", "progress": None, "segments": []}
+        events = await collect(
+            stream_task_events("task", queue, snapshot, connected, lambda: "processing")
+        )
+        return events, "task" in task_events._subscribers
+
+    events, subscribed = asyncio.run(follow())
+
+    assert [event for event, _ in events] == ["snapshot", "stage", "status"]
+    assert not subscribed
+
+
+def test_idle_stream_polls_the_status(monkeypatch):
+    """Without events, the status is read from the database, e.g. of tasks run by another process."""
+    monkeypatch.setattr(progress_module, "KEEPALIVE_SECONDS", 0.01)
+    statuses = iter(["processing", "failed"])
+
+    async def follow():
+        queue = task_events.subscribe("task")
+        snapshot = {"status": "queued", "progress": None, "segments": []}
+        return await collect(
+            stream_task_events(
+                "task", queue, snapshot, connected, lambda: next(statuses)
+            )
+        )
+
+    events = asyncio.run(follow())
+
+    assert events == [
+        ("snapshot", {"status": "queued", "progress": None, "segments": []}),
+        (None, ": keep-alive"),
+        ("status", {"status": "failed"}),
+    ]
@@ -0,0 +1,214 @@
+"""Tests for the result_store module."""
+
+import json
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import text
+
+from app.models import TaskResult
+from app import result_store
+from app.result_store import (
+    clear_result_cache,
+    decode_result,
+    encode_result,
+    migrate_results,
+    pack_result,
+    unpack_result,
+)
+from app.tasks import (
+    delete_task_from_db,
+    get_task_status_from_db,
+    update_task_status_in_db,
+)
+
+
+def speaker_transcript(count=200):
+    """Return a transcript as stored by the full speech-to-text pipeline, with speakers and without words."""
+    return {
+        "segments": [
+            {
+                "start": index * 2.0,
+                "end": index * 2.0 + 1.5,
+                "text": f" Satz {index}.",
+                "speaker": f"SPEAKER_0{index % 3}",
+            }
+            for index in range(count)
+        ]
+    }
+
+
+def transcript(count=200):
+    """Return an aligned and diarized transcript as whisperX returns it."""
+    segments = []
+    for index in range(count):
+        speaker = f"SPEAKER_0{index % 3}"
+        words = [
+            {
+                "word": "Guten",
+                "start": index + 0.1,
+                "end": index + 0.4,
+                "score": 0.91,
+                "speaker": speaker,
+            },
+            {
+                "word": f"Tag{index}",
+                "start": index + 0.5,
+                "end": index + 0.9,
+                "score": 0.87,
+                "speaker": speaker,
+            },
+            # Numbers are not aligned
+            {"word": "42"},
+        ]
+        segments.append(
+            {
+                "start": index,
+                "end": index + 1.0,
+                "text": f" Guten Tag{index} 42",
+                "words": words,
+                "speaker": speaker,
+            }
+        )
+    return {
+        "segments": segments,
+        "word_segments": [word for segment in segments for word in segment["words"]],
+    }
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    """Start every test without cached results."""
+    clear_result_cache()
+    yield
+    clear_result_cache()
+
+
+@pytest.mark.parametrize(
+    "result",
+    [
+        transcript(),
+        speaker_transcript(),
+        # Segments without speakers, e.g. of an unaligned transcript
+        {
+            "segments": [
+                {"start": 0.0, "end": 2.5, "text": " Hallo"},
+                {"start": 2.5, "end": 3.0, "text": ""},
+            ],
+            "language": "de",
+        },
+        # Speaker turns of a diarization
+        [{"label": "A", "speaker": "SPEAKER_00", "start": 0.5, "end": 4.0}],
+        {"segments": [], "word_segments": [], "language": None},
+        {"segments": [{"text": "a", "words": []}], "word_segments": [{"word": "b"}]},
+        {
+            "word_segments": [{"word": "a"}],
+            "segments": [{"text": "a", "words": [{"word": "a"}]}],
+        },
+        [],
+        "text",
+        None,
+    ],
+)
+def test_results_are_rebuilt_unchanged(result):
+    """Packing and rebuilding returns the original result, including missing keys."""
+    rebuilt = unpack_result(json.loads(json.dumps(pack_result(result))))
+
+    assert rebuilt == result
+    assert json.dumps(rebuilt) == json.dumps(result)
+
+
+def test_word_segments_reference_the_segments():
+    """Word segments repeating the words of the segments are not stored twice."""
+    packed = dict(pack_result(transcript())["fields"])
+
+    assert packed["word_segments"] == {"segment_words": True}
+    speaker = dict(packed["segments"]["records"]["columns"])["speaker"]
+    assert speaker["strings"] == ["SPEAKER_00", "SPEAKER_01", "SPEAKER_02"]
+
+
+def test_compact_result_is_much_smaller():
+    """The stored result takes a fraction of the JSON of the result."""
+    result = transcript(2000)
+    data, _, _ = encode_result(result)
+
+    assert len(data) * 10 < len(json.dumps(result))
+
+
+def test_repeated_polls_use_the_cached_result(session, add_task):
+    """A finished result is decoded once; a replaced result is decoded again."""
+    add_task(uuid="task", status="processing")
+    update_task_status_in_db(
+        "task",
+        {"status": "completed", "result": speaker_transcript(3)},
+        session=session,
+    )
+    session.expire_all()
+
+    with patch.object(
+        result_store, "decode_result", side_effect=decode_result
+    ) as decode:
+        for _ in range(3):
+            assert get_task_status_from_db("task", session=session)[
+                "result"
+            ] == speaker_transcript(3)
+        update_task_status_in_db(
+            "task", {"result": speaker_transcript(4)}, session=session
+        )
+        assert get_task_status_from_db("task", session=session)[
+            "result"
+        ] == speaker_transcript(4)
+
+    assert decode.call_count == 2
+
+
+def test_cache_is_limited(monkeypatch):
+    """Least recently used results are evicted beyond RESULT_CACHE_MB."""
+    data, size, checksum = encode_result(speaker_transcript())
+    monkeypatch.setattr(
+        result_store.Config, "RESULT_CACHE_MB", 2.5 * size / 1024 / 1024
+    )
+    for task_id in range(3):
+        result_store._cache_result(task_id, checksum, size, speaker_transcript())
+
+    assert list(result_store._cache) == [1, 2]
+    assert result_store._cached_result(0, checksum) is None
+    assert result_store._cached_result(1, checksum + 1) is None
+    assert result_store._cached_result(2, checksum) == speaker_transcript()
+
+
+def test_results_are_stored_in_the_result_table(session, add_task):
+    """Results written with the task status are stored compactly and returned in their JSON shape."""
+    add_task(uuid="task", status="processing")
+
+    update_task_status_in_db(
+        "task", {"status": "completed", "result": transcript(3)}, session=session
+    )
+
+    assert session.execute(text("SELECT result FROM tasks")).scalar() is None
+    assert session.query(TaskResult).count() == 1
+    status = get_task_status_from_db("task", session=session)
+    assert status["result"] == transcript(3)
+    assert status["result_stage"] == "final"
+
+    assert delete_task_from_db("task", session=session)
+    assert session.query(TaskResult).count() == 0
+
+
+def test_json_results_are_migrated(session, add_task):
+    """Results stored as JSON in the task row by older versions are moved to the result table."""
+    add_task(uuid="old", status="completed", result=transcript(2))
+    add_task(uuid="running", status="processing")
+    assert get_task_status_from_db("old", session=session)["result"] == transcript(2)
+
+    assert migrate_results(session) == 1
+    assert migrate_results(session) == 0
+
+    assert (
+        session.execute(
+            text("SELECT COUNT(*) FROM tasks WHERE result IS NOT NULL")
+        ).scalar()
+        == 0
+    )
+    assert get_task_status_from_db("old", session=session)["result"] == transcript(2)
+    assert get_task_status_from_db("running", session=session)["result"] is None
@@ -0,0 +1,156 @@
+"""Tests for the safe_globals module."""
+
+import json
+import os
+import pickle
+import shutil
+from collections import OrderedDict, deque
+from unittest.mock import patch
+
+import pytest
+import torch
+
+from app import safe_globals
+from app.config import Config
+
+
+class Point:
+    """Class pickled into the test checkpoints."""
+
+    def __init__(self, x):
+        self.x = x
+
+
+class Evaluates:
+    """Object unpickled by calling ``eval``."""
+
+    def __reduce__(self):
+        return (eval, ("6*7",))
+
+
+class Which:
+    """Object unpickled by calling ``shutil.which``."""
+
+    def __reduce__(self):
+        return (shutil.which, ("sh",))
+
+
+@pytest.fixture
+def checkpoint(tmp_path, monkeypatch):
+    """A checkpoint referencing ``collections.deque``, with fresh module state and cache file."""
+    monkeypatch.setattr(Config, "SAFE_GLOBALS_CACHE", str(tmp_path / "globals.json"))
+    monkeypatch.setattr(safe_globals, "_known", None)
+    monkeypatch.setattr(safe_globals, "_allowed", set())
+    monkeypatch.setattr(safe_globals, "_enabled", False)
+    monkeypatch.setattr(torch, "load", torch.load)
+    path = tmp_path / "model.pt"
+    torch.save({"queue": deque([3])}, path)
+    return path
+
+
+def test_resolve_global():
+    """Names are resolved through the longest importable module."""
+    assert safe_globals.resolve_global("collections.OrderedDict") is OrderedDict
+    assert safe_globals.resolve_global(f"{__name__}.Point") is Point
+    assert safe_globals.resolve_global("no_such_module.Thing") is None
+    assert safe_globals.resolve_global("collections.NoSuchThing") is None
+
+
+def test_checkpoint_is_scanned_once(checkpoint, monkeypatch):
+    """The globals of a checkpoint are cached on disk and reused after a restart."""
+    assert safe_globals.checkpoint_globals(checkpoint) == ["collections.deque"]
+    with open(Config.SAFE_GLOBALS_CACHE) as file:
+        assert list(json.load(file)) == [str(checkpoint.resolve())]
+
+    # A restart reads the cache file instead of scanning again
+    monkeypatch.setattr(safe_globals, "_known", None)
+    with patch.object(safe_globals, "_scan") as scan:
+        assert safe_globals.checkpoint_globals(checkpoint) == ["collections.deque"]
+    scan.assert_not_called()
+
+
+def test_changed_checkpoint_is_scanned_again(checkpoint):
+    """A checkpoint rewritten with other content is scanned again."""
+    safe_globals.checkpoint_globals(checkpoint)
+    torch.save({"plain": [1, 2]}, checkpoint)
+
+    assert safe_globals.checkpoint_globals(checkpoint) == []
+
+
+def test_torch_load_allows_only_the_checkpoint_globals(
+    checkpoint, tmp_path, monkeypatch
+):
+    """After enabling, weights-only loads accept the classes found in the checkpoint."""
+    monkeypatch.setattr(
+        safe_globals, "ALLOWED_MODULES", (*safe_globals.ALLOWED_MODULES, __name__)
+    )
+    path = tmp_path / "point.pt"
+    torch.save({"point": Point(3)}, path)
+    with pytest.raises(pickle.UnpicklingError):
+        torch.load(path, weights_only=True)
+
+    safe_globals.enable_checkpoint_safe_globals()
+    safe_globals.enable_checkpoint_safe_globals()
+
+    with open(path, "rb") as file:
+        file.seek(0)
+        assert torch.load(file, weights_only=True)["point"].x == 3
+    assert safe_globals._allowed == {f"{__name__}.Point"}
+
+
+def test_only_classes_of_the_allowed_modules_are_allowed():
+    """Functions and classes of other modules are not allowed, even if importable."""
+    assert safe_globals.allowed_global("collections.deque") is deque
+    assert safe_globals.allowed_global("builtins.dict") is dict
+    assert safe_globals.allowed_global("builtins.eval") is None
+    assert safe_globals.allowed_global("shutil.which") is None
+    assert safe_globals.allowed_global(f"{__name__}.Point") is None
+    # Reached through an attribute of an allowed module
+    assert safe_globals.allowed_global("torch.os.system") is None
+    assert safe_globals.allowed_global("collections.namedtuple") is None
+
+
+def test_checkpoint_with_builtin_types_loads(checkpoint, tmp_path):
+    """Builtin types referenced by the pyannote checkpoints, e.g. the whisperx VAD, are allowed."""
+    path = tmp_path / "builtins.pt"
+    torch.save({"types": [list, dict, int], "weights": torch.zeros(2)}, path)
+    with pytest.raises(pickle.UnpicklingError):
+        torch.load(path, weights_only=True)
+
+    safe_globals.enable_checkpoint_safe_globals()
+
+    assert torch.load(path, weights_only=True)["types"] == [list, dict, int]
+    assert {"builtins.list", "builtins.dict", "builtins.int"} <= safe_globals._allowed
+
+
+def test_checkpoint_calling_functions_is_rejected(checkpoint, tmp_path):
+    """A checkpoint whose unpickling calls functions still fails to load."""
+    path = tmp_path / "tampered.pt"
+    torch.save({"a": Evaluates(), "b": Which()}, path)
+    safe_globals.enable_checkpoint_safe_globals()
+
+    with pytest.raises(pickle.UnpicklingError):
+        torch.load(path, weights_only=True)
+    assert safe_globals._allowed == set()
+
+
+def test_cached_names_are_checked(checkpoint, tmp_path):
+    """Names read from SAFE_GLOBALS_CACHE are checked like scanned ones."""
+    path = tmp_path / "tampered.pt"
+    torch.save({"a": Evaluates()}, path)
+    stat = os.stat(path)
+    with open(Config.SAFE_GLOBALS_CACHE, "w") as file:
+        json.dump(
+            {
+                str(path.resolve()): {
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "globals": ["builtins.eval"],
+                }
+            },
+            file,
+        )
+
+    safe_globals.allow_checkpoint_globals(path)
+
+    assert safe_globals._allowed == set()
@@ -0,0 +1,111 @@
+"""Tests for the scheduler module."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import Config
+from app.models import Task
+from app.scheduler import (
+    estimate_task_memory_mb,
+    estimate_task_seconds,
+    queue_position,
+    select_next_task,
+)
+from app.schemas import TaskStatus
+
+PARAMS = {"model": "small", "device": "cpu", "compute_type": "int8"}
+
+
+@pytest.fixture
+def add_queued(add_task):
+    """Return a function inserting a full_process task queued ``age_seconds`` ago."""
+
+    def add(uuid, audio_duration, age_seconds=0, **fields) -> Task:
+        return add_task(
+            uuid=uuid,
+            audio_duration=audio_duration,
+            created_at=datetime.utcnow() - timedelta(seconds=age_seconds),
+            **{"task_params": PARAMS, **fields},
+        )
+
+    return add
+
+
+def test_estimates_grow_with_duration_and_model(add_queued):
+    """Longer audio and larger models are estimated to take longer and use more memory."""
+    short = add_queued("short", 300)
+    long = add_queued("long", 3 * 3600)
+    large = add_queued("large", 300, task_params={**PARAMS, "model": "large-v3"})
+
+    assert estimate_task_seconds(short) < estimate_task_seconds(long)
+    assert estimate_task_seconds(short) < estimate_task_seconds(large)
+    assert estimate_task_memory_mb(short) < estimate_task_memory_mb(long)
+    assert estimate_task_memory_mb(short) < estimate_task_memory_mb(large)
+
+
+def test_draft_pass_adds_to_the_estimates(add_queued):
+    """A task with a draft pass loads and runs a second model."""
+    final = add_queued("final", 300)
+    drafted = add_queued("drafted", 300, task_params={**PARAMS, "draft_model": "tiny"})
+
+    assert estimate_task_seconds(final) < estimate_task_seconds(drafted)
+    assert estimate_task_memory_mb(final) < estimate_task_memory_mb(drafted)
+
+
+def test_shorter_job_runs_first(session, add_queued):
+    """A short task queued after a long one is selected first."""
+    add_queued("long", 3 * 3600, age_seconds=10)
+    add_queued("short", 300, age_seconds=5)
+
+    assert select_next_task(session).uuid == "short"
+    assert queue_position(session, "short") == 1
+    assert queue_position(session, "long") == 2
+
+
+def test_long_job_is_aged_to_the_front(session, add_queued):
+    """A long task that waited long enough overtakes newly queued short tasks."""
+    add_queued("long", 3 * 3600, age_seconds=24 * 3600)
+    add_queued("short", 300)
+
+    assert select_next_task(session).uuid == "long"
+
+
+def test_task_exceeding_budget_waits_for_running_tasks(
+    session, add_queued, monkeypatch
+):
+    """A task is held back while its memory does not fit next to running tasks."""
+    add_queued("running", 300, status=TaskStatus.running)
+    add_queued("queued", 300)
+    running = session.query(Task).filter(Task.uuid == "running").one()
+    monkeypatch.setattr(
+        Config, "SCHEDULER_CPU_MB", estimate_task_memory_mb(running) * 1.5
+    )
+
+    assert select_next_task(session) is None
+
+    running.status = TaskStatus.completed
+    session.commit()
+    assert select_next_task(session).uuid == "queued"
+
+
+def test_oversized_task_runs_when_pool_is_idle(session, add_queued, monkeypatch):
+    """A task larger than the whole budget still runs when nothing else does."""
+    monkeypatch.setattr(Config, "SCHEDULER_CPU_MB", 1)
+    add_queued("huge", 3 * 3600)
+
+    assert select_next_task(session).uuid == "huge"
+
+
+def test_tasks_of_a_batch_are_scheduled_together(session, add_queued):
+    """A batch runs back to back at the priority of its shortest task."""
+    add_queued("single", 600)
+    add_queued("batch-long", 3600, batch_id="batch")
+    add_queued("batch-short", 60, batch_id="batch")
+
+    order = [
+        queue_position(session, uuid)
+        for uuid in ("batch-short", "batch-long", "single")
+    ]
+
+    assert order == [1, 2, 3]
@@ -0,0 +1,126 @@
+"""Tests for the upload helpers in the files module."""
+
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from app.files import (
+    CHUNK_SIZE,
+    iter_json_array,
+    load_json_object,
+    resolve_shared_path,
+    save_temporary_file,
+)
+
+
+class Upload:
+    """Minimal stand-in for UploadFile exposing ``file`` and ``filename``."""
+
+    def __init__(self, content: bytes, filename: str = "upload.json"):
+        self.file = io.BytesIO(content)
+        self.filename = filename
+
+
+def test_save_temporary_file_streams_and_hashes():
+    """Content spanning several chunks is written unchanged and hashed."""
+    content = os.urandom(CHUNK_SIZE * 2 + 123)
+
+    path, digest = save_temporary_file(io.BytesIO(content), "audio.mp3", sha256=True)
+    try:
+        assert path.endswith(".mp3")
+        with open(path, "rb") as saved:
+            assert saved.read() == content
+        assert digest == hashlib.sha256(content).hexdigest()
+    finally:
+        os.remove(path)
+
+
+def test_save_temporary_file_rejects_oversized_upload(tmp_path, monkeypatch):
+    """Uploads above the size limit are rejected and leave no file behind."""
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+
+    with pytest.raises(HTTPException) as error:
+        save_temporary_file(
+            io.BytesIO(b"x" * (CHUNK_SIZE + 1)), "audio.mp3", max_bytes=CHUNK_SIZE
+        )
+
+    assert error.value.status_code == 413
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_load_json_object():
+    """A JSON object is parsed with plain floats."""
+    upload = Upload(b'{"language": "en", "segments": [{"start": 0.5, "end": 1.25}]}')
+
+    assert load_json_object(upload) == {
+        "language": "en",
+        "segments": [{"start": 0.5, "end": 1.25}],
+    }
+
+
+def test_iter_json_array_yields_items():
+    """Items of a JSON array are yielded one by one."""
+    upload = Upload(b'[{"speaker": "A", "start": 0.0}, {"speaker": "B", "start": 2.5}]')
+
+    assert list(iter_json_array(upload)) == [
+        {"speaker": "A", "start": 0.0},
+        {"speaker": "B", "start": 2.5},
+    ]
+
+
+def test_invalid_json_raises_bad_request():
+    """Malformed JSON results in a 400 error."""
+    with pytest.raises(HTTPException) as error:
+        load_json_object(Upload(b'{"language": '))
+    assert error.value.status_code == 400
+
+
+@pytest.fixture
+def shared_root(tmp_path, monkeypatch):
+    """A shared input root holding one audio file."""
+    root = tmp_path / "shared"
+    root.mkdir()
+    (root / "meeting.mp3").write_bytes(b"audio")
+    monkeypatch.setattr("app.config.Config.SHARED_INPUT_ROOTS", [str(root)])
+    return root
+
+
+def test_resolve_shared_path_accepts_files_inside_the_root(shared_root):
+    """Files inside a shared root are accepted and returned resolved."""
+    path = str(shared_root / "sub" / ".." / "meeting.mp3")
+
+    assert resolve_shared_path(path) == os.path.realpath(shared_root / "meeting.mp3")
+
+
+@pytest.mark.parametrize(
+    "path, status_code",
+    [
+        ("{root}/../outside.mp3", 403),
+        ("{root}/link.mp3", 403),
+        ("meeting.mp3", 403),
+        ("{root}/missing.mp3", 404),
+        ("{root}/notes.txt", 400),
+    ],
+)
+def test_resolve_shared_path_rejects_invalid_paths(shared_root, path, status_code):
+    """Paths escaping the root, also through links, missing files and bad extensions are rejected."""
+    (shared_root.parent / "outside.mp3").write_bytes(b"audio")
+    (shared_root / "link.mp3").symlink_to(shared_root.parent / "outside.mp3")
+    (shared_root / "notes.txt").write_bytes(b"text")
+
+    with pytest.raises(HTTPException) as error:
+        resolve_shared_path(path.format(root=shared_root))
+    assert error.value.status_code == status_code
+
+
+def test_resolve_shared_path_disabled_without_roots(tmp_path, monkeypatch):
+    """Path submission is refused when no shared root is configured."""
+    monkeypatch.setattr("app.config.Config.SHARED_INPUT_ROOTS", [])
+    (tmp_path / "meeting.mp3").write_bytes(b"audio")
+
+    with pytest.raises(HTTPException) as error:
+        resolve_shared_path(str(tmp_path / "meeting.mp3"))
+    assert error.value.status_code == 403
@@ -0,0 +1,91 @@
+"""Tests for the warmup module."""
+
+from unittest.mock import patch
+
+import pytest
+
+from app import warmup
+from app.config import Config
+from app.warmup import ModelWarmUp
+
+
+@pytest.fixture
+def all_models(monkeypatch):
+    """Configure the warm-up of every model."""
+    monkeypatch.setattr(Config, "ASR_WARMUP", True)
+    monkeypatch.setattr(Config, "ASR_WARMUP_LANGUAGE", "de")
+    monkeypatch.setattr(Config, "ALIGN_WARMUP_LANGUAGES", ["de", "xx"])
+    monkeypatch.setattr(Config, "DIARIZATION_WARMUP", True)
+
+
+def test_ready_without_warm_up(monkeypatch):
+    """Without models to warm up, the service is ready right away."""
+    monkeypatch.setattr(Config, "CALIBRATE", False)
+    monkeypatch.setattr(Config, "ASR_WARMUP", False)
+    monkeypatch.setattr(Config, "ALIGN_WARMUP_LANGUAGES", [])
+    monkeypatch.setattr(Config, "DIARIZATION_WARMUP", False)
+    model_warmup = ModelWarmUp()
+
+    assert model_warmup.ready
+    assert model_warmup.status()["state"] == "disabled"
+
+
+def test_not_ready_until_warm_up_completes(all_models):
+    """The configured models are run on the same clip before the service is ready."""
+    model_warmup = ModelWarmUp()
+    assert not model_warmup.ready
+
+    with (
+        patch.object(warmup, "warm_up_whisper") as whisper,
+        patch.object(warmup, "warm_up_align_models", return_value=["xx"]) as align,
+        patch.object(warmup, "warm_up_diarization") as diarization,
+    ):
+        model_warmup.run()
+
+    whisper.assert_called_once_with("de")
+    assert align.call_args.args == (["de", "xx"],)
+    assert align.call_args.kwargs["audio"] is diarization.call_args.kwargs["audio"]
+    assert model_warmup.ready
+    status = model_warmup.status()
+    assert status["state"] == "completed"
+    assert status["errors"] == {"alignment": "No alignment model for xx"}
+
+
+def test_failed_model_does_not_block_readiness(all_models):
+    """A model failing to warm up is reported, the others are still warmed up."""
+    model_warmup = ModelWarmUp()
+
+    with (
+        patch.object(
+            warmup, "warm_up_whisper", side_effect=RuntimeError("out of memory")
+        ),
+        patch.object(warmup, "warm_up_align_models", return_value=[]),
+        patch.object(warmup, "warm_up_diarization") as diarization,
+    ):
+        model_warmup.run()
+
+    diarization.assert_called_once()
+    assert model_warmup.ready
+    assert model_warmup.status()["errors"] == {"asr": "out of memory"}
+
+
+def test_calibration_runs_before_asr_warm_up(monkeypatch):
+    """Without a profile for the host, the ASR is calibrated before it is warmed up."""
+    monkeypatch.setattr(Config, "CALIBRATE", True)
+    monkeypatch.setattr(Config, "ASR_WARMUP", True)
+    monkeypatch.setattr(Config, "ALIGN_WARMUP_LANGUAGES", [])
+    monkeypatch.setattr(Config, "DIARIZATION_WARMUP", False)
+    order = []
+
+    with (
+        patch.object(warmup, "load_profile", return_value=None),
+        patch.object(
+            warmup, "calibrate", side_effect=lambda: order.append("calibration")
+        ),
+        patch.object(
+            warmup, "warm_up_whisper", side_effect=lambda language: order.append("asr")
+        ),
+    ):
+        ModelWarmUp().run()
+
+    assert order == ["calibration", "asr"]
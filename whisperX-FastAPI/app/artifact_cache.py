@@ -0,0 +1,294 @@
+"""This module provides a content-addressed disk cache for the outputs of the processing stages."""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+from collections import OrderedDict
+from tempfile import NamedTemporaryFile
+
+from .config import Config
+from .logger import logger
+from .model_cache import freeze
+
+# Stages whose outputs are cached, in pipeline order
+STAGES = ("pcm", "transcription", "alignment", "diarization")
+
+PCM_SUFFIX = ".f32"
+PICKLE_SUFFIX = ".pkl"
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Return the SHA-256 hex digest of a file.
+
+    Args:
+        path (str): The path to the file.
+        chunk_size (int, optional): Size of the blocks read at once.
+
+    Returns:
+        str: The hex digest.
+    """
+    hasher = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def stage_key(audio_hash: str, stage: str, **params) -> str:
+    """
+    Return the cache key of a stage output.
+
+    Only parameters that change the output of the stage should be passed, so
+    that e.g. a different ``batch_size`` or device still hits the cache.
+
+    Args:
+        audio_hash (str): SHA-256 of the audio file.
+        stage (str): Name of the stage.
+        **params: Parameters affecting the output of the stage.
+
+    Returns:
+        str: The key.
+    """
+    description = json.dumps([audio_hash, stage, freeze(params)], default=str)
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+def _link_or_copy(source: str, target: str):
+    """Hard link ``source`` to ``target``, copying it across file systems."""
+    partial = target + ".partial"
+    try:
+        os.link(source, partial)
+    except OSError:
+        shutil.copyfile(source, partial)
+    os.replace(partial, target)
+
+
+class ArtifactCache:
+    """
+    LRU cache of stage outputs on disk, bounded by its total size.
+
+    Entries are stored as ``<directory>/<stage>/<key><suffix>``. Decoded audio is
+    kept as raw float32 samples and hard linked to and from the spill files, all
+    other outputs are pickled. The index of entries is built from the directory
+    on first use, so entries survive restarts.
+    """
+
+    def __init__(self, directory: str, max_mb: float):
+        """
+        Initialize the cache.
+
+        Args:
+            directory (str): Directory holding the entries.
+            max_mb (float): Size limit in MB, 0 disables the cache.
+        """
+        self.directory = directory
+        self.max_bytes = max_mb * 1024 * 1024
+        self._entries = None
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = dict.fromkeys(STAGES, 0)
+        self.misses = dict.fromkeys(STAGES, 0)
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Return whether stage outputs are cached."""
+        return self.max_bytes > 0
+
+    def _path(self, stage: str, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, stage, key + suffix)
+
+    def _index(self) -> OrderedDict:
+        """Return the entries by path, least recently used first (lock held)."""
+        if self._entries is None:
+            found = []
+            for stage in STAGES:
+                stage_dir = os.path.join(self.directory, stage)
+                os.makedirs(stage_dir, exist_ok=True)
+                for entry in os.scandir(stage_dir):
+                    if entry.is_file() and not entry.name.endswith(".partial"):
+                        stat = entry.stat()
+                        found.append((stat.st_mtime, entry.path, stat.st_size))
+            self._entries = OrderedDict((path, size) for _, path, size in sorted(found))
+            self._size = sum(self._entries.values())
+        return self._entries
+
+    def _lookup(self, stage: str, path: str) -> bool:
+        """Record a hit or miss for ``path`` and mark it as recently used."""
+        with self._lock:
+            entries = self._index()
+            if path not in entries or not os.path.exists(path):
+                entries.pop(path, None)
+                self.misses[stage] += 1
+                return False
+            entries.move_to_end(path)
+            self.hits[stage] += 1
+        try:
+            # The modification time orders the entries after a restart
+            os.utime(path)
+        except OSError:
+            pass
+        return True
+
+    def _added(self, path: str):
+        """Account for a new entry and evict old ones beyond the size limit."""
+        size = os.path.getsize(path)
+        with self._lock:
+            entries = self._index()
+            self._size += size - entries.pop(path, 0)
+            entries[path] = size
+            while self._size > self.max_bytes and len(entries) > 1:
+                old_path, old_size = entries.popitem(last=False)
+                self._size -= old_size
+                self.evictions += 1
+                try:
+                    os.remove(old_path)
+                except FileNotFoundError:
+                    pass
+                logger.debug("Artifact cache evicted %s", old_path)
+
+    def _discard(self, path: str):
+        """Remove an unreadable entry."""
+        with self._lock:
+            self._size -= self._index().pop(path, 0)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def get(self, stage: str, key: str):
+        """
+        Return the cached output of a stage.
+
+        Args:
+            stage (str): Name of the stage.
+            key (str): Key from ``stage_key``.
+
+        Returns:
+            The cached output, or None on a miss.
+        """
+        if not self.enabled:
+            return None
+        path = self._path(stage, key, PICKLE_SUFFIX)
+        if not self._lookup(stage, path):
+            return None
+        try:
+            with open(path, "rb") as file:
+                return pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError) as exc:
+            logger.warning("Dropping unreadable artifact %s: %s", path, exc)
+            self._discard(path)
+            return None
+
+    def put(self, stage: str, key: str, value):
+        """
+        Store the output of a stage.
+
+        Args:
+            stage (str): Name of the stage.
+            key (str): Key from ``stage_key``.
+            value: The output, must be picklable.
+        """
+        if not self.enabled:
+            return
+        path = self._path(stage, key, PICKLE_SUFFIX)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with NamedTemporaryFile(
+                dir=os.path.dirname(path), suffix=".partial", delete=False
+            ) as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(file.name, path)
+        except OSError as exc:
+            logger.warning("Could not cache %s output: %s", stage, exc)
+            return
+        self._added(path)
+
+    def restore_pcm(self, audio_hash: str, target: str) -> bool:
+        """
+        Provide the cached decoded audio of a file at ``target``.
+
+        Args:
+            audio_hash (str): SHA-256 of the audio file.
+            target (str): Path of the spill file to create.
+
+        Returns:
+            bool: True if the decoded audio was cached.
+        """
+        if not self.enabled:
+            return False
+        path = self._path("pcm", stage_key(audio_hash, "pcm"), PCM_SUFFIX)
+        if not self._lookup("pcm", path):
+            return False
+        try:
+            _link_or_copy(path, target)
+        except OSError as exc:
+            logger.warning("Could not restore decoded audio from %s: %s", path, exc)
+            return False
+        return True
+
+    def store_pcm(self, audio_hash: str, source: str):
+        """
+        Keep the decoded audio of a file, given as a spill file, in the cache.
+
+        Args:
+            audio_hash (str): SHA-256 of the audio file.
+            source (str): Path of the spill file.
+        """
+        if not self.enabled:
+            return
+        path = self._path("pcm", stage_key(audio_hash, "pcm"), PCM_SUFFIX)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            _link_or_copy(source, path)
+        except OSError as exc:
+            logger.warning("Could not cache decoded audio of %s: %s", source, exc)
+            return
+        self._added(path)
+
+    def clear(self):
+        """Remove all entries and reset the counters."""
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self._entries = None
+            self._size = 0
+            self.hits = dict.fromkeys(STAGES, 0)
+            self.misses = dict.fromkeys(STAGES, 0)
+            self.evictions = 0
+
+    def stats(self) -> dict:
+        """
+        Return hit rates per stage, the number of entries and the used size.
+
+        Returns:
+            dict: Cache statistics.
+        """
+        with self._lock:
+            entries = len(self._index()) if self.enabled else 0
+            return {
+                "entries": entries,
+                "size_mb": self._size / 1024 / 1024,
+                "max_mb": self.max_bytes / 1024 / 1024,
+                "evictions": self.evictions,
+                "stages": {
+                    stage: {
+                        "hits": self.hits[stage],
+                        "misses": self.misses[stage],
+                        "hit_rate": (
+                            self.hits[stage] / (self.hits[stage] + self.misses[stage])
+                            if self.hits[stage] + self.misses[stage]
+                            else None
+                        ),
+                    }
+                    for stage in STAGES
+                },
+            }
+
+
+artifact_cache = ArtifactCache(Config.ARTIFACT_CACHE_DIR, Config.ARTIFACT_CACHE_MB)
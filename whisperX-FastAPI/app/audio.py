@@ -1,56 +1,129 @@
 """This module provides functions for processing audio files."""
 
+import hashlib
+import os
 import subprocess
-from tempfile import NamedTemporaryFile
+import tempfile
+import threading
 
-from whisperx import load_audio
-from whisperx.audio import SAMPLE_RATE
+import numpy as np
 
-from .files import VIDEO_EXTENSIONS, check_file_extension
+from .files import CHUNK_SIZE, shared_input_root
+from .logger import logger
 
+# Sample rate and window length of Whisper models (``whisperx.audio``), kept here so
+# that the API does not import whisperx and torch
+SAMPLE_RATE = 16000
+CHUNK_LENGTH = 30
+N_SAMPLES = CHUNK_LENGTH * SAMPLE_RATE
 
-def convert_video_to_audio(file):
+
+def ffmpeg_decode_command(source="pipe:0", output="-"):
     """
-    Convert a video file to an audio file.
+    Return the ffmpeg command that decodes media to mono 16 kHz float32 PCM.
 
     Args:
-        file (str): The path to the video file.
+        source (str): Input path, or ``pipe:0`` to read from stdin.
+        output (str): Output path, or ``-`` to write to stdout.
+    Returns:
+        list: The command line.
+    """
+    return [
+        "ffmpeg",
+        "-threads",
+        "0",
+        "-i",
+        source,
+        "-vn",
+        "-f",
+        "f32le",
+        "-ac",
+        "1",
+        "-acodec",
+        "pcm_f32le",
+        "-ar",
+        str(SAMPLE_RATE),
+        "-y",
+        output,
+    ]
+
+
+def _copy_to_stdin(source, stdin):
+    """Feed a file object to ffmpeg in chunks."""
+    try:
+        while chunk := source.read(CHUNK_SIZE):
+            stdin.write(chunk)
+    except BrokenPipeError:
+        # ffmpeg stopped reading, its exit status reports the reason
+        pass
+    finally:
+        try:
+            stdin.close()
+        except BrokenPipeError:
+            pass
 
+
+def decode_audio(source, output_file=None):
+    """
+    Decode audio or video to mono 16 kHz float32 samples with a single ffmpeg run.
+
+    Args:
+        source: Path of the media file, or a readable binary file object (e.g. an upload)
+            that is streamed to ffmpeg.
+        output_file (str, optional): Write the raw samples to this file instead of
+            returning them.
     Returns:
-        str: The path to the audio file.
+        np.ndarray: The decoded audio, or None if ``output_file`` is given.
+    Raises:
+        RuntimeError: If ffmpeg fails to decode the media.
     """
-    temp_filename = NamedTemporaryFile(delete=False).name
-    subprocess.call(
-        [
-            "ffmpeg",
-            "-y",  # Overwrite output file if it exists"
-            "-i",
-            file,
-            "-vn",
-            "-ac",
-            "1",  # Mono audio
-            "-ar",
-            "16000",  # Sample rate of 16kHz
-            "-f",
-            "wav",  # Output format WAV
-            temp_filename,
-        ]
+    from_path = isinstance(source, (str, os.PathLike))
+    command = ffmpeg_decode_command(
+        os.fspath(source) if from_path else "pipe:0", output_file or "-"
+    )
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.DEVNULL if from_path else subprocess.PIPE,
+        stdout=subprocess.DEVNULL if output_file else subprocess.PIPE,
+        stderr=subprocess.PIPE,
     )
-    return temp_filename
+    feeder = None
+    if not from_path:
+        feeder = threading.Thread(target=_copy_to_stdin, args=(source, process.stdin))
+        feeder.start()
+    stdout, stderr = _communicate(process)
+    if feeder is not None:
+        feeder.join()
+    if process.returncode != 0:
+        raise RuntimeError(f"Failed to load audio: {stderr.decode(errors='replace')}")
+    if output_file:
+        return None
+    return np.frombuffer(stdout, np.float32)
+
+
+def _communicate(process):
+    """Drain stdout and stderr together, so neither pipe can fill up and block ffmpeg."""
+    stderr_chunks = []
+    reader = threading.Thread(
+        target=lambda: stderr_chunks.append(process.stderr.read())
+    )
+    reader.start()
+    stdout = process.stdout.read() if process.stdout else None
+    reader.join()
+    process.wait()
+    return stdout, b"".join(stderr_chunks)
 
 
 def process_audio_file(audio_file):
     """
-    Check file if it is audio file, if it is video file, convert it to audio file.
+    Decode an audio or video file to a waveform in a single ffmpeg pass.
 
     Args:
         audio_file (str): The path to the audio file.
     Returns:
         Audio: The processed audio.
     """
-    if check_file_extension(audio_file) in VIDEO_EXTENSIONS:
-        audio_file = convert_video_to_audio(audio_file)
-    return load_audio(audio_file)
+    return decode_audio(audio_file)
 
 
 def get_audio_duration(audio):
@@ -63,3 +136,83 @@ def get_audio_duration(audio):
         float: The duration of the audio file.
     """
     return len(audio) / SAMPLE_RATE
+
+
+def probe_audio_duration(audio_file):
+    """
+    Read the duration of a media file from its header with ffprobe, without decoding it.
+
+    If the file was already decoded to a sidecar file, the duration is taken from its size.
+
+    Args:
+        audio_file (str): The path to the media file.
+    Returns:
+        float: The duration in seconds, or None if it cannot be determined.
+    """
+    pcm_file = decoded_audio_path(audio_file)
+    if os.path.exists(pcm_file):
+        # float32 mono samples
+        return os.path.getsize(pcm_file) / 4 / SAMPLE_RATE
+    try:
+        output = subprocess.run(
+            [
+                "ffprobe",
+                "-v",
+                "error",
+                "-show_entries",
+                "format=duration",
+                "-of",
+                "default=noprint_wrappers=1:nokey=1",
+                audio_file,
+            ],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+        return float(output.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError) as e:
+        logger.warning("Could not probe duration of %s: %s", audio_file, e)
+        return None
+
+
+def decoded_audio_path(audio_file, identifier=None):
+    """
+    Return the path of the file holding the decoded 16 kHz float32 samples of a media file.
+
+    The sidecar file sits next to the media file, except for files on the shared
+    input roots: those are read in place and never written next to, so their
+    samples go to the temporary directory instead. Several tasks may process the
+    same shared file at once, so each task decodes it into a file of its own.
+
+    Args:
+        audio_file (str): The path to the media file.
+        identifier (str, optional): Identifier of the task decoding a shared file.
+    Returns:
+        str: The path of the sidecar file.
+    """
+    if shared_input_root(audio_file) is not None:
+        digest = hashlib.sha1(os.path.realpath(audio_file).encode()).hexdigest()
+        suffix = f"-{identifier}" if identifier else ""
+        return os.path.join(tempfile.gettempdir(), f"shared-{digest}{suffix}.f32")
+    return audio_file + ".f32"
+
+
+def synthetic_clip(seconds: float = 2.0) -> np.ndarray:
+    """
+    Return a short synthetic voice-like clip to run the models on during warm-up.
+
+    The clip is a harmonic tone at a typical speaking pitch, modulated at syllable
+    rate, with a little noise. It is deterministic and needs no audio file.
+
+    Args:
+        seconds (float): Length of the clip.
+    Returns:
+        np.ndarray: float32 waveform sampled at 16 kHz.
+    """
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    tone = sum(
+        np.sin(2 * np.pi * 140 * harmonic * t) / harmonic for harmonic in range(1, 6)
+    )
+    envelope = 0.5 * (1 - np.cos(2 * np.pi * 4 * t))
+    noise = np.random.default_rng(0).normal(scale=0.01, size=t.size)
+    return (0.1 * tone * envelope + noise).astype(np.float32)
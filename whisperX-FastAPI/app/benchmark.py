@@ -0,0 +1,582 @@
+r"""This module benchmarks the transcription pipeline on CPU and reports its real-time factor.
+
+Run it from the ``whisperX-FastAPI`` directory, e.g.::
+
+    python -m app.benchmark --lengths 30,120 --batch-sizes 8,16 --threads 4,8 \
+        --output reports/benchmark --compare reports/baseline.json
+
+The ASR is run for every combination of the swept parameters; alignment,
+diarization and the full pipeline are run once per audio length with the
+request defaults. Every run reports its median wall time, real-time factor and
+peak RSS, and the ASR runs the time it took to load their model. Reports record
+the commit, the host and the library versions, so runs of different commits on
+the same host can be compared with ``--compare``.
+"""
+
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from importlib import metadata
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from .audio import SAMPLE_RATE, decode_audio, synthetic_clip
+from .config import Config
+from .metrics import TaskMetrics
+from .model_cache import whisper_models
+from .models import Base, Task
+from .schemas import (
+    AlignmentParams,
+    ASROptions,
+    ComputeType,
+    DiarizationParams,
+    SpeechToTextProcessingParams,
+    VADOptions,
+    WhisperModel,
+    WhisperModelParams,
+    query_defaults,
+)
+from .whisperx_services import (
+    align_whisper_output,
+    diarize,
+    process_audio_common,
+    transcribe_with_whisper,
+)
+
+BUNDLED_AUDIO = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "tests",
+    "test_files",
+    "audio_en.mp3",
+)
+STAGES = ("transcription", "alignment", "diarization", "full")
+# Columns identifying the same run across reports
+KEY_COLUMNS = (
+    "stage",
+    "model",
+    "compute_type",
+    "threads",
+    "batch_size",
+    "chunk_size",
+    "audio_seconds",
+)
+PACKAGES = (
+    "whisperx",
+    "faster-whisper",
+    "ctranslate2",
+    "torch",
+    "pyannote.audio",
+    "numpy",
+)
+
+
+def load_source(audio: str) -> tuple:
+    """
+    Return the samples the benchmark audio is looped from.
+
+    Args:
+        audio (str): Path of a media file, or ``synthetic`` for a generated clip.
+
+    Returns:
+        tuple: The samples and their SHA-256, which identifies the audio in reports.
+    """
+    samples = synthetic_clip(10.0) if audio == "synthetic" else decode_audio(audio)
+    return samples, hashlib.sha256(samples.tobytes()).hexdigest()
+
+
+def looped(samples: np.ndarray, seconds: float) -> np.ndarray:
+    """
+    Repeat audio up to a duration.
+
+    Args:
+        samples (np.ndarray): Source samples at 16 kHz.
+        seconds (float): Duration of the result.
+
+    Returns:
+        np.ndarray: ``seconds`` of audio.
+    """
+    return np.resize(samples, int(seconds * SAMPLE_RATE)).astype(np.float32)
+
+
+def environment(args: argparse.Namespace, audio_sha256: str) -> dict:
+    """
+    Describe what the results of a benchmark depend on.
+
+    Args:
+        args (argparse.Namespace): Options of the benchmark.
+        audio_sha256 (str): Hash of the source audio.
+
+    Returns:
+        dict: Commit, host, library versions, service settings and options.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "packages": versions,
+        "settings": {
+            "ASR_BATCHING": Config.ASR_BATCHING,
+            "LONG_AUDIO_PROCESSES": Config.LONG_AUDIO_PROCESSES,
+            "LONG_AUDIO_MIN_SECONDS": Config.LONG_AUDIO_MIN_SECONDS,
+        },
+        "audio": args.audio,
+        "audio_sha256": audio_sha256,
+        "repeats": args.repeats,
+    }
+
+
+def measure(stage: str, repeats: int, func, /, *args, **kwargs) -> tuple:
+    """
+    Run a stage ``repeats`` times.
+
+    Args:
+        stage (str): Name of the stage.
+        repeats (int): Number of runs.
+        func (callable): The stage to run.
+        *args: Positional arguments of ``func``.
+        **kwargs: Keyword arguments of ``func``.
+
+    Returns:
+        tuple: Median wall time, highest peak RSS in MB and the output of the last run.
+    """
+    seconds, peaks, output = [], [], None
+    for _ in range(repeats):
+        run = TaskMetrics()
+        output = run.measure(stage, func, *args, **kwargs)
+        values = run.as_dict()["stages"][stage]
+        seconds.append(values["seconds"])
+        peaks.append(values["peak_rss_mb"] or 0.0)
+    return statistics.median(seconds), max(peaks), output
+
+
+def _row(stage: str, audio_seconds: float, seconds: float = None, **columns) -> dict:
+    row = dict.fromkeys(KEY_COLUMNS)
+    row.update(
+        stage=stage,
+        audio_seconds=audio_seconds,
+        seconds=seconds,
+        rtf=seconds / audio_seconds if seconds is not None else None,
+        peak_rss_mb=None,
+        load_seconds=None,
+        error=None,
+    )
+    row.update(columns)
+    return row
+
+
+def benchmark_transcription(args: argparse.Namespace, clips: dict) -> tuple:
+    """
+    Sweep the ASR parameters over all audio lengths.
+
+    The model cache is cleared for every model configuration, so its first run
+    measures loading the model; that run is not counted.
+
+    Args:
+        args (argparse.Namespace): Options of the benchmark.
+        clips (dict): Audio length -> samples.
+
+    Returns:
+        tuple: Result rows, and the transcripts of the first configuration per length.
+    """
+    rows, transcripts = [], {}
+    asr_options = ASROptions(**query_defaults(ASROptions))
+    vad_options = VADOptions(**query_defaults(VADOptions))
+    for compute_type, threads in itertools.product(args.compute_types, args.threads):
+        whisper_models.clear()
+        load_seconds = None
+        for batch_size, chunk_size, length in itertools.product(
+            args.batch_sizes, args.chunk_sizes, sorted(clips)
+        ):
+            columns = {
+                "model": args.model,
+                "compute_type": compute_type,
+                "threads": threads,
+                "batch_size": batch_size,
+                "chunk_size": chunk_size,
+            }
+            kwargs = dict(
+                audio=clips[length],
+                task="transcribe",
+                asr_options=asr_options,
+                vad_options=vad_options,
+                language=args.language,
+                batch_size=batch_size,
+                chunk_size=chunk_size,
+                model=WhisperModel(args.model),
+                device="cpu",
+                compute_type=compute_type,
+                threads=threads,
+            )
+            try:
+                if load_seconds is None:
+                    transcribe_with_whisper(**kwargs)
+                    models = whisper_models.stats()["models"]
+                    load_seconds = models[0]["load_seconds"] if models else 0.0
+                seconds, peak, output = measure(
+                    "transcription", args.repeats, transcribe_with_whisper, **kwargs
+                )
+            except Exception as exc:
+                rows.append(_row("transcription", length, error=str(exc), **columns))
+                continue
+            transcripts.setdefault(length, output)
+            rows.append(
+                _row(
+                    "transcription",
+                    length,
+                    seconds,
+                    peak_rss_mb=peak,
+                    load_seconds=load_seconds,
+                    **columns,
+                )
+            )
+    return rows, transcripts
+
+
+def benchmark_alignment(
+    args: argparse.Namespace, clips: dict, transcripts: dict
+) -> list:
+    """
+    Align the transcript of each audio length with the request defaults.
+
+    Args:
+        args (argparse.Namespace): Options of the benchmark.
+        clips (dict): Audio length -> samples.
+        transcripts (dict): Audio length -> output of the transcription benchmark.
+
+    Returns:
+        list: Result rows.
+    """
+    rows = []
+    for length in sorted(clips):
+        if length not in transcripts:
+            rows.append(_row("alignment", length, error="No transcript to align"))
+            continue
+        try:
+            seconds, peak, _ = measure(
+                "alignment",
+                args.repeats,
+                align_whisper_output,
+                transcript=transcripts[length]["segments"],
+                audio=clips[length],
+                language_code=transcripts[length]["language"],
+                device="cpu",
+            )
+        except Exception as exc:
+            rows.append(_row("alignment", length, error=str(exc)))
+            continue
+        rows.append(_row("alignment", length, seconds, peak_rss_mb=peak))
+    return rows
+
+
+def benchmark_diarization(args: argparse.Namespace, clips: dict) -> list:
+    """
+    Diarize each audio length.
+
+    Args:
+        args (argparse.Namespace): Options of the benchmark.
+        clips (dict): Audio length -> samples.
+
+    Returns:
+        list: Result rows.
+    """
+    rows = []
+    for length in sorted(clips):
+        try:
+            seconds, peak, _ = measure(
+                "diarization", args.repeats, diarize, clips[length], device="cpu"
+            )
+        except Exception as exc:
+            rows.append(_row("diarization", length, error=str(exc)))
+            continue
+        rows.append(_row("diarization", length, seconds, peak_rss_mb=peak))
+    return rows
+
+
+def benchmark_full(args: argparse.Namespace, clips: dict) -> list:
+    """
+    Run the full speech-to-text pipeline on each audio length, with a throwaway database.
+
+    The artifact cache is not used, so every run computes all stages.
+
+    Args:
+        args (argparse.Namespace): Options of the benchmark.
+        clips (dict): Audio length -> samples.
+
+    Returns:
+        list: Result rows, with the task metrics of the last run per length.
+    """
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    whisper_params = {
+        **query_defaults(WhisperModelParams),
+        "language": args.language,
+        "model": args.model,
+        "device": "cpu",
+        "compute_type": args.compute_types[0],
+        "threads": args.threads[0],
+        "batch_size": args.batch_sizes[0],
+        "chunk_size": args.chunk_sizes[0],
+    }
+    columns = {
+        key: whisper_params[key]
+        for key in ("model", "compute_type", "threads", "batch_size", "chunk_size")
+    }
+    rows = []
+    for length in sorted(clips):
+        durations, peaks = [], []
+        try:
+            for _ in range(args.repeats):
+                task = Task(status="processing", task_type="full_process")
+                session.add(task)
+                session.commit()
+                process_audio_common(
+                    SpeechToTextProcessingParams(
+                        audio=clips[length],
+                        identifier=task.uuid,
+                        vad_options=VADOptions(**query_defaults(VADOptions)),
+                        asr_options=ASROptions(**query_defaults(ASROptions)),
+                        whisper_model_params=WhisperModelParams(**whisper_params),
+                        alignment_params=AlignmentParams(
+                            **query_defaults(AlignmentParams)
+                        ),
+                        diarization_params=DiarizationParams(
+                            **query_defaults(DiarizationParams)
+                        ),
+                    ),
+                    session,
+                )
+                session.refresh(task)
+                if task.status != "completed":
+                    raise RuntimeError(task.error)
+                durations.append(task.duration)
+                peaks.append(task.metrics["stages"]["total"]["peak_rss_mb"] or 0.0)
+        except Exception as exc:
+            rows.append(_row("full", length, error=str(exc), **columns))
+            continue
+        rows.append(
+            _row(
+                "full",
+                length,
+                statistics.median(durations),
+                peak_rss_mb=max(peaks),
+                stages=task.metrics["stages"],
+                **columns,
+            )
+        )
+    session.close()
+    return rows
+
+
+def run_benchmark(args: argparse.Namespace) -> dict:
+    """
+    Run the selected stages and return the report.
+
+    Args:
+        args (argparse.Namespace): Options of the benchmark.
+
+    Returns:
+        dict: ``environment`` and the result ``rows``.
+    """
+    samples, audio_sha256 = load_source(args.audio)
+    clips = {float(length): looped(samples, length) for length in args.lengths}
+    rows, transcripts = [], {}
+    if "transcription" in args.stages or "alignment" in args.stages:
+        transcription_rows, transcripts = benchmark_transcription(args, clips)
+        if "transcription" in args.stages:
+            rows += transcription_rows
+    if "alignment" in args.stages:
+        rows += benchmark_alignment(args, clips, transcripts)
+    if "diarization" in args.stages:
+        rows += benchmark_diarization(args, clips)
+    if "full" in args.stages:
+        rows += benchmark_full(args, clips)
+    return {"environment": environment(args, audio_sha256), "rows": rows}
+
+
+def write_report(report: dict, output: str):
+    """
+    Write a report as ``{output}.json`` and its rows as ``{output}.csv``.
+
+    Args:
+        report (dict): Report of ``run_benchmark``.
+        output (str): Path of the report files without extension.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(f"{output}.json", "w") as file:
+        json.dump(report, file, indent=2)
+    columns = [*KEY_COLUMNS, "seconds", "rtf", "peak_rss_mb", "load_seconds", "error"]
+    with open(f"{output}.csv", "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(report["rows"])
+
+
+def compare_reports(report: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Find the runs that got slower than in a baseline report.
+
+    Args:
+        report (dict): The new report.
+        baseline (dict): Report of an earlier commit on the same host.
+        tolerance (float): Accepted relative increase of the real-time factor.
+
+    Returns:
+        list: Messages describing each regression.
+    """
+    previous = {
+        tuple(row[column] for column in KEY_COLUMNS): row
+        for row in baseline["rows"]
+        if row["rtf"] is not None
+    }
+    regressions = []
+    for row in report["rows"]:
+        key = tuple(row[column] for column in KEY_COLUMNS)
+        old = previous.get(key)
+        if old is None:
+            continue
+        if row["rtf"] is None:
+            regressions.append(f"{key}: failed ({row['error']})")
+        elif row["rtf"] > old["rtf"] * (1 + tolerance):
+            regressions.append(f"{key}: RTF {old['rtf']:.3f} -> {row['rtf']:.3f}")
+    return regressions
+
+
+def _numbers(kind):
+    return lambda value: [kind(item) for item in value.split(",") if item]
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """
+    Parse the command line options of the benchmark.
+
+    Args:
+        argv (list, optional): Arguments, defaults to ``sys.argv``.
+
+    Returns:
+        argparse.Namespace: The options.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m app.benchmark",
+        description="Benchmark the transcription pipeline on CPU.",
+    )
+    parser.add_argument(
+        "--audio",
+        default=BUNDLED_AUDIO if os.path.exists(BUNDLED_AUDIO) else "synthetic",
+        help="Media file looped to the benchmark lengths, or 'synthetic' (default: bundled test audio)",
+    )
+    parser.add_argument(
+        "--lengths",
+        type=_numbers(float),
+        default=[30.0, 120.0],
+        help="Audio lengths in seconds",
+    )
+    parser.add_argument(
+        "--model",
+        default=Config.WHISPER_MODEL or WhisperModel.tiny.value,
+        choices=[model.value for model in WhisperModel],
+    )
+    parser.add_argument(
+        "--language", default="en", help="Language of the audio, empty to detect it"
+    )
+    parser.add_argument("--batch-sizes", type=_numbers(int), default=[8, 16])
+    parser.add_argument("--chunk-sizes", type=_numbers(int), default=[20])
+    parser.add_argument(
+        "--compute-types",
+        type=lambda value: [ComputeType(item).value for item in value.split(",")],
+        default=[ComputeType.int8.value],
+    )
+    parser.add_argument("--threads", type=_numbers(int), default=[os.cpu_count() or 1])
+    parser.add_argument(
+        "--stages",
+        type=lambda value: value.split(","),
+        default=list(STAGES),
+        help=f"Comma separated stages out of {', '.join(STAGES)}",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="Runs per configuration, the median is reported",
+    )
+    parser.add_argument(
+        "--output", default="benchmark", help="Report path without extension"
+    )
+    parser.add_argument(
+        "--compare", help="Baseline report (JSON) to check for regressions"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.1, help="Accepted relative RTF increase"
+    )
+    args = parser.parse_args(argv)
+    args.language = args.language or None
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None) -> int:
+    """
+    Run the benchmark from the command line.
+
+    Args:
+        argv (list, optional): Arguments, defaults to ``sys.argv``.
+
+    Returns:
+        int: Exit code, 1 if ``--compare`` found regressions.
+    """
+    args = parse_args(argv)
+    report = run_benchmark(args)
+    write_report(report, args.output)
+    for row in report["rows"]:
+        print(
+            " ".join(
+                f"{column}={row[column]}"
+                for column in KEY_COLUMNS
+                if row[column] is not None
+            ),
+            f"rtf={row['rtf']:.3f}"
+            if row["rtf"] is not None
+            else f"error={row['error']}",
+        )
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare_reports(report, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""This module POSTs finished tasks to the callback URLs they were submitted with.
+
+The body is the task as returned by ``/task/{identifier}`` plus its ``identifier``.
+With CALLBACK_SECRET set, the ``X-WhisperX-Signature`` header holds ``sha256=``
+followed by the hex HMAC-SHA256 of ``<X-WhisperX-Timestamp>.<body>``, so receivers
+can check where a result comes from and reject replayed ones.
+
+Deliveries failing with a network error, a timeout or a 408, 429 or 5xx response
+are retried with exponential backoff, other responses are final. The outcome is
+recorded on the task; deliveries still pending when the process stops are resumed
+when the task workers start again, so a receiver may get a result twice.
+"""
+
+import hashlib
+import hmac
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from sqlalchemy.orm import Session
+
+from .config import Config
+from .db import SessionLocal
+from .logger import logger
+from .models import Task
+from .progress import FINAL_STATUSES, status_value
+from .schemas import Result
+from .tasks import get_task_status_from_db, update_task_status_in_db
+
+SIGNATURE_HEADER = "X-WhisperX-Signature"
+TIMESTAMP_HEADER = "X-WhisperX-Timestamp"
+TASK_HEADER = "X-WhisperX-Task"
+# Client errors worth another attempt
+RETRY_STATUS_CODES = (408, 429)
+
+# Deliveries wait for their retries here, not in the task workers
+callback_executor = ThreadPoolExecutor(
+    max_workers=Config.CALLBACK_WORKERS, thread_name_prefix="callback"
+)
+
+
+def sign(body: bytes, timestamp: str, secret: str) -> str:
+    """
+    Return the signature of a callback body.
+
+    Args:
+        body (bytes): The request body.
+        timestamp (str): Unix time of the request, sent as ``X-WhisperX-Timestamp``.
+        secret (str): The shared secret.
+
+    Returns:
+        str: ``sha256=`` followed by the hex HMAC-SHA256 of ``<timestamp>.<body>``.
+    """
+    digest = hmac.new(secret.encode(), timestamp.encode() + b"." + body, hashlib.sha256)
+    return f"sha256={digest.hexdigest()}"
+
+
+def callback_url(task: Task):
+    """Return the callback URL a task was submitted with, None without one."""
+    return (task.task_params or {}).get("callback_url")
+
+
+def build_payload(identifier: str, session: Session):
+    """
+    Return the body of the callback of a task.
+
+    Args:
+        identifier (str): Identifier of the task.
+        session (Session): Database session.
+
+    Returns:
+        dict: The task as returned by ``/task/{identifier}`` with its ``identifier``,
+        None if the task was deleted.
+    """
+    status = get_task_status_from_db(identifier, session)
+    if status is None:
+        return None
+    return {
+        "identifier": identifier,
+        **Result(**status).model_dump(mode="json", exclude={"callback"}),
+    }
+
+
+def post_callback(url: str, identifier: str, body: bytes) -> tuple:
+    """
+    POST a callback body, retrying failed attempts with exponential backoff.
+
+    Args:
+        url (str): The callback URL.
+        identifier (str): Identifier of the task, sent as ``X-WhisperX-Task``.
+        body (bytes): The JSON body.
+
+    Returns:
+        tuple: Number of attempts and the error of the last one, None once delivered.
+    """
+    attempts = max(1, Config.CALLBACK_ATTEMPTS)
+    for attempt in range(1, attempts + 1):
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json",
+            TASK_HEADER: identifier,
+            TIMESTAMP_HEADER: timestamp,
+        }
+        if Config.CALLBACK_SECRET:
+            headers[SIGNATURE_HEADER] = sign(body, timestamp, Config.CALLBACK_SECRET)
+        retry = True
+        try:
+            response = httpx.post(
+                url,
+                content=body,
+                headers=headers,
+                timeout=Config.CALLBACK_TIMEOUT_SECONDS,
+            )
+        except httpx.HTTPError as exc:
+            error = f"{type(exc).__name__}: {exc}"
+        else:
+            if response.is_success:
+                return attempt, None
+            error = f"HTTP {response.status_code}"
+            retry = (
+                response.status_code >= 500
+                or response.status_code in RETRY_STATUS_CODES
+            )
+        logger.warning(
+            "Callback of task %s to %s failed (attempt %d/%d): %s",
+            identifier,
+            url,
+            attempt,
+            attempts,
+            error,
+        )
+        if not retry or attempt == attempts:
+            return attempt, error
+        time.sleep(Config.CALLBACK_BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+
+def deliver_callback(identifier: str):
+    """
+    POST a finished task to its callback URL and record the outcome on the task.
+
+    Args:
+        identifier (str): Identifier of the task.
+    """
+    # No transaction stays open while the delivery waits for its retries
+    session = SessionLocal()
+    try:
+        task = session.query(Task).filter(Task.uuid == identifier).first()
+        url = callback_url(task) if task is not None else None
+        payload = build_payload(identifier, session) if url else None
+    finally:
+        session.close()
+    if payload is None:
+        return
+
+    attempts, error = post_callback(url, identifier, json.dumps(payload).encode())
+    if error is None:
+        logger.info("Delivered task %s to %s", identifier, url)
+    else:
+        logger.error(
+            "Giving up on the callback of task %s to %s: %s", identifier, url, error
+        )
+
+    session = SessionLocal()
+    try:
+        update_task_status_in_db(
+            identifier=identifier,
+            update_data={
+                "callback_status": "failed" if error else "delivered",
+                "callback_attempts": attempts,
+                "callback_error": error,
+            },
+            session=session,
+        )
+    finally:
+        session.close()
+
+
+def schedule_callback(identifier: str, session: Session) -> bool:
+    """
+    Queue the delivery of a task to its callback URL, once it completed or failed.
+
+    Args:
+        identifier (str): Identifier of the task.
+        session (Session): Database session.
+
+    Returns:
+        bool: Whether a delivery was queued.
+    """
+    task = session.query(Task).filter(Task.uuid == identifier).first()
+    if (
+        task is None
+        or not callback_url(task)
+        or status_value(task.status) not in FINAL_STATUSES
+    ):
+        return False
+    update_task_status_in_db(
+        identifier=identifier,
+        update_data={
+            "callback_status": "pending",
+            "callback_attempts": 0,
+            "callback_error": None,
+        },
+        session=session,
+    )
+    callback_executor.submit(deliver_callback, identifier)
+    return True
+
+
+def resume_callbacks(session: Session) -> int:
+    """
+    Queue the deliveries that were pending when the process stopped.
+
+    Args:
+        session (Session): Database session.
+
+    Returns:
+        int: Number of queued deliveries.
+    """
+    identifiers = [
+        identifier
+        for (identifier,) in session.query(Task.uuid).filter(
+            Task.callback_status == "pending"
+        )
+    ]
+    for identifier in identifiers:
+        callback_executor.submit(deliver_callback, identifier)
+    return len(identifiers)
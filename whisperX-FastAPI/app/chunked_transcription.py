@@ -0,0 +1,252 @@
+"""This module transcribes long recordings in parallel windows across CPU worker processes."""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .audio import N_SAMPLES, SAMPLE_RATE
+from .config import Config
+from .logger import logger
+from .model_cache import device_pool
+
+# Length of the frames whose energy is compared when looking for silence
+FRAME_SAMPLES = int(0.03 * SAMPLE_RATE)
+# Split points are searched this far around the nominal window end
+SEARCH_SECONDS = 30
+MIN_WINDOW_SECONDS = 60
+
+_pool = None
+_pool_lock = threading.Lock()
+# Thread count pinned in a worker process by the pool initializer
+_worker_threads = 0
+
+
+def long_audio_enabled(audio_seconds, device) -> bool:
+    """
+    Return whether a recording is transcribed in parallel windows.
+
+    Args:
+        audio_seconds (float): Duration of the recording.
+        device: Device the model runs on; only CPU transcription is split.
+
+    Returns:
+        bool: True if the long-audio mode applies.
+    """
+    return (
+        Config.LONG_AUDIO_PROCESSES > 1
+        and device_pool(device) == "cpu"
+        and audio_seconds is not None
+        and audio_seconds >= Config.LONG_AUDIO_MIN_SECONDS
+    )
+
+
+def worker_threads() -> int:
+    """Return the number of threads each worker process is pinned to."""
+    if Config.LONG_AUDIO_THREADS > 0:
+        return Config.LONG_AUDIO_THREADS
+    return max(1, (os.cpu_count() or 1) // max(Config.LONG_AUDIO_PROCESSES, 1))
+
+
+def _init_worker(threads: int):
+    """Pin the thread pools of a fresh worker process."""
+    global _worker_threads
+    _worker_threads = threads
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    import torch
+
+    torch.set_num_threads(threads)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Return the shared pool of transcription worker processes, starting it if needed."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            threads = worker_threads()
+            logger.info(
+                "Starting %d transcription worker processes with %d threads each",
+                Config.LONG_AUDIO_PROCESSES,
+                threads,
+            )
+            _pool = ProcessPoolExecutor(
+                max_workers=Config.LONG_AUDIO_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(threads,),
+            )
+        return _pool
+
+
+def shutdown_pool():
+    """Stop the transcription worker processes, if they were started."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def find_split_points(audio, window_samples: int, search_samples: int) -> list:
+    """
+    Find split points roughly every ``window_samples`` at the quietest moment nearby.
+
+    The frame with the lowest energy within ``search_samples`` of each nominal window
+    end is chosen, so windows end in pauses between utterances instead of mid-word.
+
+    Args:
+        audio (np.ndarray): The waveform.
+        window_samples (int): Nominal window length in samples.
+        search_samples (int): Distance from the nominal end searched for silence.
+
+    Returns:
+        list: Sample offsets of the split points, in ascending order.
+    """
+    points = []
+    last = 0
+    while len(audio) - last > window_samples + window_samples // 2:
+        target = last + window_samples
+        low = max(last + FRAME_SAMPLES, target - search_samples)
+        high = min(len(audio), target + search_samples)
+        region = np.asarray(audio[low:high])
+        frames = len(region) // FRAME_SAMPLES
+        if not frames:
+            points.append(target)
+        else:
+            energy = np.square(
+                region[: frames * FRAME_SAMPLES].reshape(frames, -1)
+            ).mean(axis=1)
+            points.append(
+                low + int(np.argmin(energy)) * FRAME_SAMPLES + FRAME_SAMPLES // 2
+            )
+        last = points[-1]
+    return points
+
+
+def _audio_source(audio):
+    """
+    Describe how worker processes get the audio.
+
+    A complete memory-mapped spill file is mapped again by the workers, so only its
+    path is sent to them. Other arrays are sent (and copied) window by window.
+    """
+    filename = getattr(audio, "filename", None)
+    if (
+        isinstance(audio, np.memmap)
+        and filename
+        and audio.dtype == np.float32
+        and os.path.getsize(filename) - audio.offset == audio.nbytes
+    ):
+        return ("file", filename, audio.offset)
+    return None
+
+
+def _window(audio, source, start: int, end: int):
+    """Return the arguments addressing one window for a worker."""
+    if source is None:
+        return np.ascontiguousarray(audio[start:end])
+    return (*source, start, end)
+
+
+def _window_audio(window):
+    """Return the waveform of a window inside a worker process."""
+    if isinstance(window, tuple):
+        _, filename, offset, start, end = window
+        return np.memmap(filename, dtype=np.float32, mode="c", offset=offset)[start:end]
+    return window
+
+
+def _transcribe_window(window, options: dict):
+    """
+    Transcribe one window inside a worker process.
+
+    A worker process transcribes one window at a time, so its single pipeline is
+    loaded without a language and serves the windows of all languages.
+    """
+    from .whisperx_services import transcribe_with_whisper
+
+    return transcribe_with_whisper(
+        audio=_window_audio(window),
+        **options,
+        threads=_worker_threads,
+        allow_chunking=False,
+        model_language=False,
+    )
+
+
+def _detect_window_language(window, options: dict) -> str:
+    """Detect the language of a window inside a worker process, with the pipeline of the windows."""
+    from .whisperx_services import detect_language_with_whisper
+
+    model_options = {
+        key: value
+        for key, value in options.items()
+        if key not in ("language", "batch_size", "chunk_size")
+    }
+    return detect_language_with_whisper(
+        audio=_window_audio(window), **model_options, threads=_worker_threads
+    )
+
+
+def transcribe_long_audio(audio, report=None, **options) -> dict:
+    """
+    Transcribe a long recording in windows split at silences, in parallel processes.
+
+    The language is detected once on the beginning of the recording, so all windows
+    are transcribed in the same language. Segment timestamps are shifted by the start
+    of their window and the segments are merged in order.
+
+    Args:
+        audio (np.ndarray): The waveform.
+        report (callable, optional): Called with the segments of each window, in order, once it is transcribed.
+        **options: Keyword arguments of ``transcribe_with_whisper``.
+
+    Returns:
+        dict: Transcription result with ``segments`` and ``language``.
+    """
+    pool = get_pool()
+    source = _audio_source(audio)
+    duration = len(audio) / SAMPLE_RATE
+    window_seconds = max(
+        MIN_WINDOW_SECONDS,
+        min(Config.LONG_AUDIO_WINDOW_SECONDS, duration / Config.LONG_AUDIO_PROCESSES),
+    )
+    points = find_split_points(
+        audio, int(window_seconds * SAMPLE_RATE), SEARCH_SECONDS * SAMPLE_RATE
+    )
+    bounds = list(zip([0, *points], [*points, len(audio)]))
+    logger.info(
+        "Transcribing %.0fs of audio in %d windows across %d processes",
+        duration,
+        len(bounds),
+        Config.LONG_AUDIO_PROCESSES,
+    )
+
+    language = options.get("language")
+    if language is None:
+        probe = _window(audio, source, 0, min(N_SAMPLES, len(audio)))
+        language = pool.submit(_detect_window_language, probe, options).result()
+        logger.debug("Detected language %s for all windows", language)
+    options = {**options, "language": language}
+
+    futures = [
+        pool.submit(_transcribe_window, _window(audio, source, start, end), options)
+        for start, end in bounds
+    ]
+    segments = []
+    for (start, _), future in zip(bounds, futures):
+        offset = start / SAMPLE_RATE
+        window_segments = [
+            {
+                **segment,
+                "start": segment["start"] + offset,
+                "end": segment["end"] + offset,
+            }
+            for segment in future.result()["segments"]
+        ]
+        segments += window_segments
+        if report is not None:
+            report(window_segments)
+    return {"segments": segments, "language": language}
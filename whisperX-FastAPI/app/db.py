@@ -4,7 +4,7 @@ from functools import wraps
 
 from dotenv import load_dotenv
 from fastapi import HTTPException
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker
 
@@ -28,6 +28,34 @@ def get_db_session():
         db.close()
 
 
+def add_missing_columns(metadata, bind=engine):
+    """
+    Add columns that exist in the models but not yet in the database tables.
+
+    ``create_all`` only creates missing tables, so databases created by an older
+    version of the service would otherwise lack newly added (nullable) columns.
+
+    Args:
+        metadata: SQLAlchemy metadata holding the table definitions.
+        bind: Engine to migrate. Defaults to the application engine.
+    """
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(
+                    text(
+                        f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'
+                    )
+                )
+
+
 def handle_database_errors(func):
     """Handle database errors and raise HTTP exceptions."""
 
@@ -1,9 +1,11 @@
 """This module provides utility functions for file handling."""
 
+import hashlib
 import logging
 import os
 from tempfile import NamedTemporaryFile
 
+import ijson
 from fastapi import HTTPException
 
 from .config import Config
@@ -15,6 +17,10 @@ logger = logging.getLogger(__name__)
 AUDIO_EXTENSIONS = Config.AUDIO_EXTENSIONS
 VIDEO_EXTENSIONS = Config.VIDEO_EXTENSIONS
 ALLOWED_EXTENSIONS = Config.ALLOWED_EXTENSIONS
+MAX_UPLOAD_BYTES = Config.MAX_UPLOAD_MB * 1024 * 1024
+
+# Size of the blocks uploads are copied and hashed in
+CHUNK_SIZE = 1024 * 1024
 
 
 def validate_extension(filename, allowed_extensions: dict):
@@ -45,11 +51,102 @@ def check_file_extension(file):
     validate_extension(file, ALLOWED_EXTENSIONS)
 
 
-def save_temporary_file(temporary_file, original_filename):
+def shared_input_root(path: str):
+    """
+    Return the allow-listed shared root containing a path.
+
+    Symbolic links are resolved first, so a link inside a root cannot point outside of it.
+
+    Args:
+        path (str): The path to check.
+
+    Returns:
+        str: The resolved root, or None if the path is outside all roots.
+    """
+    resolved = os.path.realpath(path)
+    for root in Config.SHARED_INPUT_ROOTS:
+        root = os.path.realpath(root)
+        if os.path.commonpath([root, resolved]) == root:
+            return root
+    return None
+
+
+def resolve_shared_path(path: str) -> str:
+    """
+    Validate a path submitted for in-place processing and return it resolved.
+
+    Args:
+        path (str): Path of a media file inside one of the SHARED_INPUT_ROOTS.
+
+    Returns:
+        str: The resolved path.
+
+    Raises:
+        HTTPException: If path submission is disabled, the path is outside the
+            shared roots, it is not a file or its extension is not allowed.
+    """
+    if not Config.SHARED_INPUT_ROOTS:
+        raise HTTPException(status_code=403, detail="Path submission is disabled")
+    if not os.path.isabs(path) or shared_input_root(path) is None:
+        raise HTTPException(
+            status_code=403, detail=f"Path {path} is outside the shared input roots"
+        )
+    resolved = os.path.realpath(path)
+    if not os.path.isfile(resolved):
+        raise HTTPException(status_code=404, detail=f"File {path} not found")
+    validate_extension(resolved, ALLOWED_EXTENSIONS)
+    return resolved
+
+
+def copy_stream(source, dest, max_bytes=MAX_UPLOAD_BYTES, hasher=None) -> int:
     """
-    Save the contents of a SpooledTemporaryFile to a named temporary file.
+    Copy a file-like object to another one in fixed-size chunks.
+
+    Args:
+        source: Readable binary file-like object.
+        dest: Writable binary file-like object.
+        max_bytes (int, optional): Largest accepted size, 0 or None for no limit.
+        hasher (optional): hashlib object updated with every chunk.
+
+    Returns:
+        int: Number of bytes copied.
+
+    Raises:
+        HTTPException: If the source is larger than ``max_bytes``.
+    """
+    size = 0
+    while chunk := source.read(CHUNK_SIZE):
+        size += len(chunk)
+        if max_bytes and size > max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File exceeds the maximum upload size of {max_bytes // (1024 * 1024)} MB",
+            )
+        if hasher is not None:
+            hasher.update(chunk)
+        dest.write(chunk)
+    return size
+
+
+def save_temporary_file(
+    temporary_file, original_filename, max_bytes=MAX_UPLOAD_BYTES, sha256=False
+):
+    """
+    Stream the contents of a SpooledTemporaryFile to a named temporary file.
 
     Return the file path while preserving the original file extension.
+
+    Args:
+        temporary_file: Uploaded file object.
+        original_filename (str): Name of the uploaded file.
+        max_bytes (int, optional): Largest accepted size, 0 or None for no limit.
+        sha256 (bool, optional): Also return the SHA-256 hex digest of the contents.
+
+    Returns:
+        str: Path of the temporary file, or a tuple of path and digest if ``sha256`` is set.
+
+    Raises:
+        HTTPException: If the file is larger than ``max_bytes``.
     """
     # Extract the original file extension
     _, original_extension = os.path.splitext(original_filename)
@@ -57,8 +154,59 @@ def save_temporary_file(temporary_file, original_filename):
     # Create a temporary file with the original extension
     temp_filename = NamedTemporaryFile(suffix=original_extension, delete=False).name
 
-    # Write the contents of the SpooledTemporaryFile to the temporary file
-    with open(temp_filename, "wb") as dest:
-        dest.write(temporary_file.read())
+    hasher = hashlib.sha256() if sha256 else None
+    try:
+        with open(temp_filename, "wb") as dest:
+            copy_stream(temporary_file, dest, max_bytes, hasher)
+    except BaseException:
+        os.remove(temp_filename)
+        raise
 
+    if sha256:
+        return temp_filename, hasher.hexdigest()
     return temp_filename
+
+
+def _invalid_json(filename, error):
+    logger.error("Invalid JSON content in %s: %s", filename, error)
+    return HTTPException(status_code=400, detail=f"Invalid JSON content. {error}")
+
+
+def load_json_object(upload) -> dict:
+    """
+    Parse an uploaded JSON object incrementally, without reading the raw file into memory.
+
+    Args:
+        upload (UploadFile): Uploaded JSON file.
+
+    Returns:
+        dict: The parsed object.
+
+    Raises:
+        HTTPException: If the file is not a valid JSON object.
+    """
+    upload.file.seek(0)
+    try:
+        return dict(ijson.kvitems(upload.file, "", use_float=True))
+    except ijson.JSONError as e:
+        raise _invalid_json(upload.filename, e)
+
+
+def iter_json_array(upload):
+    """
+    Yield the items of an uploaded JSON array one at a time.
+
+    Args:
+        upload (UploadFile): Uploaded JSON file.
+
+    Yields:
+        The parsed items of the array.
+
+    Raises:
+        HTTPException: If the file is not a valid JSON array.
+    """
+    upload.file.seek(0)
+    try:
+        yield from ijson.items(upload.file, "item", use_float=True)
+    except ijson.JSONError as e:
+        raise _invalid_json(upload.filename, e)
@@ -0,0 +1,308 @@
+"""This module provides a process-wide registry that keeps loaded models resident between tasks."""
+
+import gc
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from pydantic import BaseModel
+
+from .config import Config
+from .logger import logger
+
+# Approximate parameter count (in millions) of the Whisper checkpoints.
+WHISPER_MODEL_PARAMS_M = {
+    "tiny": 39,
+    "base": 74,
+    "small": 244,
+    "medium": 769,
+    "large": 1550,
+    "large-v1": 1550,
+    "large-v2": 1550,
+    "large-v3": 1550,
+    "large-v3-turbo": 809,
+    "distil-large-v2": 756,
+    "distil-large-v3": 756,
+    "distil-medium": 394,
+    "distil-small": 166,
+    "nyrahealth/faster_CrisperWhisper": 1550,
+}
+
+BYTES_PER_PARAM = {"float32": 4, "float16": 2, "int8": 1}
+
+# pyannote speaker-diarization-3.1 segmentation and embedding models
+DIARIZATION_PIPELINE_MB = 300
+
+# Languages whose default alignment model is a small torchaudio wav2vec2 base bundle.
+TORCHAUDIO_ALIGN_LANGUAGES = {"en", "fr", "de", "es", "it"}
+
+
+def _value(obj):
+    """Return the plain value of an enum member, or the object itself."""
+    return getattr(obj, "value", obj)
+
+
+def freeze(value):
+    """
+    Convert a nested structure of dicts, lists and pydantic models into a hashable tuple.
+
+    Args:
+        value: The value to convert.
+
+    Returns:
+        A hashable representation of the value.
+    """
+    if isinstance(value, BaseModel):
+        value = value.model_dump()
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(freeze(item) for item in value)
+    return _value(value)
+
+
+def device_pool(device) -> str:
+    """Return the memory pool ("cpu" or "cuda") a device string belongs to."""
+    return "cuda" if str(_value(device)).startswith("cuda") else "cpu"
+
+
+def estimate_whisper_model_mb(model, compute_type) -> float:
+    """
+    Estimate the resident memory of a Whisper pipeline including its VAD model.
+
+    Args:
+        model: Name (or WhisperModel member) of the Whisper checkpoint.
+        compute_type: Compute type (or ComputeType member) the model is loaded with.
+
+    Returns:
+        float: Estimated memory in MB.
+    """
+    name = str(_value(model)).removesuffix(".en")
+    params_m = WHISPER_MODEL_PARAMS_M.get(name, WHISPER_MODEL_PARAMS_M["large"])
+    bytes_per_param = BYTES_PER_PARAM.get(str(_value(compute_type)), 2)
+    # Weights plus runtime buffers, and roughly 100 MB for the pyannote VAD model.
+    return params_m * bytes_per_param * 1.25 + 100
+
+
+def estimate_align_model_mb(language_code, model_name=None) -> float:
+    """
+    Estimate the resident memory of a wav2vec2 alignment model.
+
+    Args:
+        language_code (str): Language the alignment model is used for.
+        model_name (str, optional): Explicit alignment model, None for the Whisper-X default.
+
+    Returns:
+        float: Estimated memory in MB.
+    """
+    if model_name is None and language_code in TORCHAUDIO_ALIGN_LANGUAGES:
+        return 400
+    if model_name and "1b" in model_name.lower():
+        return 4000
+    # wav2vec2 large / XLS-R 300M checkpoints in float32
+    return 1300
+
+
+class _Entry:
+    """A single resident model together with its bookkeeping data."""
+
+    def __init__(self, key, pool: str, size_mb: float):
+        self.key = key
+        self.pool = pool
+        self.size_mb = size_mb
+        self.model = None
+        self.load_seconds = 0.0
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    LRU registry of loaded models bounded by a memory budget per device pool.
+
+    Models are handed out through :meth:`use`, which holds a per-model lock for the
+    duration of the ``with`` block. Whisper-X pipelines mutate their tokenizer and
+    options while transcribing, so a resident model must never be used by two
+    threads at the same time. Models that are in use are never evicted.
+    """
+
+    def __init__(self, name: str, budgets_mb: dict):
+        """
+        Initialize the registry.
+
+        Args:
+            name (str): Name used in log messages.
+            budgets_mb (dict): Memory budget in MB per device pool ("cpu", "cuda").
+        """
+        self.name = name
+        self.budgets_mb = dict(budgets_mb)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @contextmanager
+    def use(self, key, loader, device="cpu", size_mb: float = 0.0):
+        """
+        Provide the model stored under ``key``, loading it with ``loader`` on a miss.
+
+        Args:
+            key: Hashable cache key describing the model configuration.
+            loader (callable): Function without arguments that loads the model.
+            device: Device the model is loaded on, selects the memory budget.
+            size_mb (float): Estimated memory used by the model.
+
+        Yields:
+            The loaded model.
+        """
+        entry = self._acquire(key, loader, device_pool(device), size_mb)
+        try:
+            yield entry.model
+        finally:
+            entry.lock.release()
+            self._enforce_budget(entry.pool)
+
+    def _acquire(self, key, loader, pool: str, size_mb: float) -> _Entry:
+        """Return the entry for ``key`` with its lock held, loading the model if needed."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            else:
+                entry = _Entry(key, pool, size_mb)
+                self._entries[key] = entry
+
+        entry.lock.acquire()
+        if entry.model is not None:
+            with self._lock:
+                self.hits += 1
+            logger.debug("%s cache hit for %s", self.name, key)
+            return entry
+
+        with self._lock:
+            self.misses += 1
+            # A failed load by another thread may have removed the entry meanwhile.
+            self._entries.setdefault(key, entry)
+
+        logger.debug("%s cache miss for %s, loading model", self.name, key)
+        start = time.perf_counter()
+        try:
+            entry.model = loader()
+        except BaseException:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            entry.lock.release()
+            raise
+        entry.load_seconds = time.perf_counter() - start
+        logger.info(
+            "%s loaded %s in %.2fs (estimated %.0f MB)",
+            self.name,
+            key,
+            entry.load_seconds,
+            entry.size_mb,
+        )
+        return entry
+
+    def _enforce_budget(self, pool: str):
+        """Evict least recently used, idle models until the pool fits its budget."""
+        budget = self.budgets_mb.get(pool, 0)
+        evicted = []
+        with self._lock:
+            used = sum(e.size_mb for e in self._entries.values() if e.pool == pool)
+            for key, entry in list(self._entries.items()):
+                if used <= budget:
+                    break
+                if entry.pool != pool or not entry.lock.acquire(blocking=False):
+                    continue
+                del self._entries[key]
+                used -= entry.size_mb
+                evicted.append(entry)
+                self.evictions += 1
+
+        for entry in evicted:
+            logger.info(
+                "%s evicted %s (%s budget %.0f MB)", self.name, entry.key, pool, budget
+            )
+            entry.model = None
+            entry.lock.release()
+        if evicted:
+            self._release_memory(pool)
+
+    @staticmethod
+    def _release_memory(pool: str):
+        """Return freed memory to the system after models were dropped."""
+        gc.collect()
+        if pool == "cuda":
+            import torch
+
+            torch.cuda.empty_cache()
+
+    def load_seconds(self, key) -> float:
+        """Return how long loading the model stored under ``key`` took, 0 if it is not loaded."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return (
+                entry.load_seconds
+                if entry is not None and entry.model is not None
+                else 0.0
+            )
+
+    def keys(self) -> list:
+        """Return the keys of all resident models, least recently used first."""
+        with self._lock:
+            return [
+                key for key, entry in self._entries.items() if entry.model is not None
+            ]
+
+    def clear(self):
+        """Drop all idle models and reset the counters."""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+        for entry in entries:
+            entry.model = None
+        self._release_memory(
+            "cuda" if any(e.pool == "cuda" for e in entries) else "cpu"
+        )
+
+    def stats(self) -> dict:
+        """
+        Return hit/miss/eviction counters and the resident models.
+
+        Returns:
+            dict: Cache statistics.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "budgets_mb": dict(self.budgets_mb),
+                "models": [
+                    {
+                        "key": repr(entry.key),
+                        "pool": entry.pool,
+                        "size_mb": entry.size_mb,
+                        "load_seconds": entry.load_seconds,
+                    }
+                    for entry in self._entries.values()
+                    if entry.model is not None
+                ],
+            }
+
+
+whisper_models = ModelRegistry(
+    "ASR model cache",
+    {"cpu": Config.MODEL_CACHE_CPU_MB, "cuda": Config.MODEL_CACHE_GPU_MB},
+)
+align_models = ModelRegistry(
+    "Alignment model cache",
+    {"cpu": Config.ALIGN_MODEL_CACHE_CPU_MB, "cuda": Config.ALIGN_MODEL_CACHE_GPU_MB},
+)
+# One long-lived diarization pipeline per device, never evicted
+diarization_pipelines = ModelRegistry(
+    "Diarization pipeline cache", {"cpu": float("inf"), "cuda": float("inf")}
+)
@@ -0,0 +1,362 @@
+"""This module stores task results in a compact columnar, compressed form.
+
+A result holds thousands of segment and word dicts for long recordings, which
+repeat their keys and speakers in every record. Lists of records are therefore
+stored as tables of parallel columns: texts are concatenated with their lengths,
+recurring strings such as speakers are stored once with an index per record, and
+records nested in records (the words of the segments) become a table of their
+own with a count per parent record. A ``word_segments`` list that only repeats
+the words of the segments, as whisperX returns it, is stored as a reference.
+The packed form is serialised to JSON and compressed with zlib.
+
+Results live in the ``task_results`` table, one row per task, so reading a
+task without its result does not load them. ``unpack_result`` rebuilds the
+original JSON shape on demand. Rebuilding a transcript without words takes
+somewhat longer than parsing its JSON would, so rebuilt results are kept in a
+small cache, checked against the checksum of the stored result, and repeated
+polls of a finished task neither load nor decode it again.
+"""
+
+import json
+import threading
+import zlib
+from collections import OrderedDict
+from itertools import accumulate
+
+from sqlalchemy import null
+from sqlalchemy.orm import Session
+
+from .config import Config
+from .logger import logger
+from .models import Task, TaskResult
+
+FORMAT_VERSION = 1
+ENCODING = "zlib"
+COMPRESSION_LEVEL = 6
+# Strings with fewer distinct values than this share of the records are stored once
+DICTIONARY_RATIO = 0.5
+# Tasks whose JSON result is moved to the result table per transaction
+MIGRATION_BATCH = 50
+
+# Task id -> checksum, packed size and rebuilt result, least recently used first
+_cache = OrderedDict()
+_cache_size = 0
+_cache_lock = threading.Lock()
+
+
+def _is_records(value) -> bool:
+    """Return whether a value is a non-empty list of dicts."""
+    return (
+        isinstance(value, list)
+        and bool(value)
+        and all(isinstance(item, dict) for item in value)
+    )
+
+
+def _is_nested_records(values: list) -> bool:
+    """Return whether the values of a column are all lists of dicts, some of them empty."""
+    return any(values) and all(
+        isinstance(value, list) and all(isinstance(item, dict) for item in value)
+        for value in values
+    )
+
+
+def _pack_column(values: list) -> dict:
+    """Return the packed form of the values of one key, in record order."""
+    if values and all(isinstance(value, str) for value in values):
+        distinct = list(dict.fromkeys(values))
+        if len(distinct) <= DICTIONARY_RATIO * len(values):
+            index = {value: position for position, value in enumerate(distinct)}
+            return {"strings": distinct, "index": [index[value] for value in values]}
+        return {"text": "".join(values), "lengths": [len(value) for value in values]}
+    if _is_nested_records(values):
+        return {
+            "counts": [len(value) for value in values],
+            "table": pack_records([item for value in values for item in value]),
+        }
+    return {"values": values}
+
+
+def _unpack_column(column: dict) -> list:
+    """Return the values of a packed column, the inverse of ``_pack_column``."""
+    if "strings" in column:
+        return list(map(column["strings"].__getitem__, column["index"]))
+    if "text" in column:
+        return _split(column["text"], column["lengths"])
+    if "counts" in column:
+        return _split(unpack_records(column["table"]), column["counts"])
+    return column["values"]
+
+
+def _split(sequence, lengths: list) -> list:
+    """Split a string or list into consecutive parts of the given lengths."""
+    ends = list(accumulate(lengths))
+    return [sequence[start:end] for start, end in zip([0, *ends], ends)]
+
+
+def pack_records(records: list) -> dict:
+    """
+    Return a list of dicts as a table of parallel columns.
+
+    Args:
+        records (list): The dicts, e.g. the segments of a transcript.
+
+    Returns:
+        dict: Number of records ``n`` and a list of ``[key, column]`` pairs in the
+        order the keys first appear. A column lists the ``missing`` records that
+        lack its key, if any, and the values of the others.
+    """
+    keys = list(dict.fromkeys(key for record in records for key in record))
+    columns = []
+    for key in keys:
+        missing = [
+            position for position, record in enumerate(records) if key not in record
+        ]
+        column = _pack_column([record[key] for record in records if key in record])
+        if missing:
+            column["missing"] = missing
+        columns.append([key, column])
+    return {"n": len(records), "columns": columns}
+
+
+def unpack_records(table: dict) -> list:
+    """
+    Rebuild the list of dicts of a table returned by ``pack_records``.
+
+    Args:
+        table (dict): The packed table.
+
+    Returns:
+        list: The dicts.
+    """
+    keys = [key for key, _ in table["columns"]]
+    columns = [column for _, column in table["columns"]]
+    if not any("missing" in column for column in columns):
+        # Every record has every key: build them row by row from the columns
+        return [dict(zip(keys, row)) for row in zip(*map(_unpack_column, columns))] or [
+            {} for _ in range(table["n"])
+        ]
+    records = [{} for _ in range(table["n"])]
+    for key, column in zip(keys, columns):
+        missing = set(column.get("missing", ()))
+        present = [
+            record for position, record in enumerate(records) if position not in missing
+        ]
+        for record, value in zip(present, _unpack_column(column)):
+            record[key] = value
+    return records
+
+
+def _segment_words(result: dict) -> list:
+    """Return the words of the segments of a transcript in order, None if it has none."""
+    segments = result.get("segments")
+    if not isinstance(segments, list) or not all(
+        isinstance(segment, dict) for segment in segments
+    ):
+        return None
+    return [word for segment in segments for word in segment.get("words", [])]
+
+
+def pack_result(result) -> dict:
+    """
+    Return the columnar form of a task result.
+
+    Args:
+        result: The result as returned by ``/task/{identifier}``, e.g. a transcript
+            with ``segments`` or the list of speaker turns of a diarization.
+
+    Returns:
+        dict: The packed result, serialisable to JSON.
+    """
+    if _is_records(result):
+        return {"version": FORMAT_VERSION, "records": pack_records(result)}
+    if not isinstance(result, dict):
+        return {"version": FORMAT_VERSION, "value": result}
+    fields, seen = [], set()
+    for key, value in result.items():
+        seen.add(key)
+        # Rebuilt from the segments, so only once they precede it
+        if (
+            key == "word_segments"
+            and value
+            and "segments" in seen
+            and value == _segment_words(result)
+        ):
+            fields.append([key, {"segment_words": True}])
+        elif _is_records(value):
+            fields.append([key, {"records": pack_records(value)}])
+        else:
+            fields.append([key, {"value": value}])
+    return {"version": FORMAT_VERSION, "fields": fields}
+
+
+def unpack_result(packed: dict):
+    """
+    Rebuild a task result from its columnar form.
+
+    Args:
+        packed (dict): The result returned by ``pack_result``.
+
+    Returns:
+        The result in its original JSON shape.
+    """
+    if "records" in packed:
+        return unpack_records(packed["records"])
+    if "value" in packed:
+        return packed["value"]
+    result = {}
+    for key, field in packed["fields"]:
+        if "records" in field:
+            result[key] = unpack_records(field["records"])
+        elif "segment_words" in field:
+            result[key] = [dict(word) for word in _segment_words(result)]
+        else:
+            result[key] = field["value"]
+    return result
+
+
+def encode_result(result) -> tuple:
+    """
+    Return a task result packed and compressed.
+
+    Args:
+        result: The result.
+
+    Returns:
+        tuple: The compressed bytes, the size of the packed JSON before compression
+        and its CRC-32.
+    """
+    packed = json.dumps(
+        pack_result(result), separators=(",", ":"), ensure_ascii=False
+    ).encode()
+    return zlib.compress(packed, COMPRESSION_LEVEL), len(packed), zlib.crc32(packed)
+
+
+def decode_result(data: bytes, encoding: str = ENCODING):
+    """
+    Rebuild a task result from the bytes returned by ``encode_result``.
+
+    Args:
+        data (bytes): The compressed result.
+        encoding (str): Compression of the bytes.
+
+    Returns:
+        The result in its original JSON shape.
+
+    Raises:
+        ValueError: If the encoding is unknown.
+    """
+    if encoding != ENCODING:
+        raise ValueError(f"Unknown result encoding: {encoding}")
+    return unpack_result(json.loads(zlib.decompress(data)))
+
+
+def store_result(task: Task, result):
+    """
+    Store the result of a task in the result table, replacing an earlier one.
+
+    Args:
+        task (Task): The task, attached to a session that is committed by the caller.
+        result: The result, None to remove it.
+    """
+    # A result written by an older version is replaced as well; SQL NULL, not JSON null
+    task.result = null()
+    if result is None:
+        task.stored_result = None
+        return
+    data, size, checksum = encode_result(result)
+    if task.stored_result is None:
+        task.stored_result = TaskResult()
+    task.stored_result.encoding = ENCODING
+    task.stored_result.format_version = FORMAT_VERSION
+    task.stored_result.data = data
+    task.stored_result.size = size
+    task.stored_result.checksum = checksum
+
+
+def load_result(task: Task):
+    """
+    Return the result of a task, loading it from the result table.
+
+    The result may be shared with other callers through the result cache, so it
+    must not be modified.
+
+    Args:
+        task (Task): The task, attached to a session.
+
+    Returns:
+        The result, or None if the task has none yet.
+    """
+    stored = task.stored_result
+    if stored is not None:
+        result = _cached_result(task.id, stored.checksum)
+        if result is None:
+            result = decode_result(stored.data, stored.encoding)
+            _cache_result(task.id, stored.checksum, stored.size, result)
+        return result
+    # Tasks written by an older version that were not migrated yet
+    return task.result
+
+
+def _cached_result(task_id: int, checksum: int):
+    """Return the rebuilt result of a task if it is cached for the stored checksum, else None."""
+    with _cache_lock:
+        entry = _cache.get(task_id)
+        if entry is None or checksum is None or entry[0] != checksum:
+            return None
+        _cache.move_to_end(task_id)
+        return entry[2]
+
+
+def _cache_result(task_id: int, checksum: int, size: int, result):
+    """Keep a rebuilt result, evicting the least recently used ones beyond RESULT_CACHE_MB."""
+    global _cache_size
+    limit = Config.RESULT_CACHE_MB * 1024 * 1024
+    if checksum is None or not size or size > limit:
+        return
+    with _cache_lock:
+        previous = _cache.pop(task_id, None)
+        if previous is not None:
+            _cache_size -= previous[1]
+        _cache[task_id] = (checksum, size, result)
+        _cache_size += size
+        while _cache_size > limit:
+            _, (_, evicted_size, _) = _cache.popitem(last=False)
+            _cache_size -= evicted_size
+
+
+def clear_result_cache():
+    """Drop all cached results."""
+    global _cache_size
+    with _cache_lock:
+        _cache.clear()
+        _cache_size = 0
+
+
+def migrate_results(session: Session) -> int:
+    """
+    Move the results stored as JSON in the task table into the result table.
+
+    Args:
+        session (Session): Database session.
+
+    Returns:
+        int: Number of migrated results.
+    """
+    migrated = 0
+    while True:
+        tasks = (
+            session.query(Task)
+            .filter(Task.result.isnot(None))
+            .limit(MIGRATION_BATCH)
+            .all()
+        )
+        if not tasks:
+            break
+        for task in tasks:
+            store_result(task, task.result)
+        session.commit()
+        migrated += len(tasks)
+    if migrated:
+        logger.info("Moved %d task result(s) to the compact result table", migrated)
+    return migrated
@@ -1,33 +1,42 @@
 """
 This module contains the FastAPI routes for speech-to-text processing.
 
-It includes endpoints for processing uploaded audio files and audio files from URLs.
+It includes endpoints for processing uploaded audio files, audio files from URLs and
+audio files on a shared volume.
 """
 
 import logging
-import os
 from datetime import datetime
-from tempfile import NamedTemporaryFile
+import os
+from typing import List, Optional
 
-import requests
-from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, UploadFile
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
-from ..audio import get_audio_duration, process_audio_file
+from ..audio import probe_audio_duration
 from ..db import get_db_session
-from ..files import ALLOWED_EXTENSIONS, save_temporary_file, validate_extension
+from ..downloads import download_audio
+from ..files import (
+    ALLOWED_EXTENSIONS,
+    resolve_shared_path,
+    save_temporary_file,
+    validate_extension,
+)
+from ..job_queue import enqueue_task
 from ..logger import logger  # Import the logger from the new module
 from ..schemas import (
     AlignmentParams,
     ASROptions,
+    BatchResponse,
+    CallbackParams,
     DiarizationParams,
+    DraftParams,
     Response,
-    SpeechToTextProcessingParams,
     VADOptions,
     WhisperModelParams,
 )
-from ..tasks import add_task_to_db
-from ..whisperx_services import process_audio_common
+from ..tasks import add_batch_to_db
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -36,11 +45,12 @@ stt_router = APIRouter()
 
 
 @stt_router.post("/speech-to-text", tags=["Speech-2-Text"])
-async def speech_to_text(
-    background_tasks: BackgroundTasks,
+def speech_to_text(
     model_params: WhisperModelParams = Depends(),
     align_params: AlignmentParams = Depends(),
     diarize_params: DiarizationParams = Depends(),
+    draft_params: DraftParams = Depends(),
+    callback_params: CallbackParams = Depends(),
     asr_options_params: ASROptions = Depends(),
     vad_options_params: VADOptions = Depends(),
     file: UploadFile = File(...),
@@ -50,10 +60,11 @@ async def speech_to_text(
     Process an uploaded audio file for speech-to-text conversion.
 
     Args:
-        background_tasks (BackgroundTasks): Background tasks dependency.
         model_params (WhisperModelParams): Whisper model parameters.
         align_params (AlignmentParams): Alignment parameters.
         diarize_params (DiarizationParams): Diarization parameters.
+        draft_params (DraftParams): Parameters of the draft pass.
+        callback_params (CallbackParams): URL the result is delivered to.
         asr_options_params (ASROptions): ASR options parameters.
         vad_options_params (VADOptions): VAD options parameters.
         file (UploadFile): Uploaded audio file.
@@ -66,17 +77,17 @@ async def speech_to_text(
 
     validate_extension(file.filename, ALLOWED_EXTENSIONS)
 
-    temp_file = save_temporary_file(file.file, file.filename)
+    temp_file, audio_hash = save_temporary_file(file.file, file.filename, sha256=True)
     logger.info("%s saved as temporary file: %s", file.filename, temp_file)
 
-    audio = process_audio_file(temp_file)
-    audio_duration = get_audio_duration(audio)
+    audio_duration = probe_audio_duration(temp_file)
     logger.info("Audio file %s length: %s seconds", file.filename, audio_duration)
 
-    identifier = add_task_to_db(
-        status="processing",
+    identifier = enqueue_task(
         file_name=file.filename,
-        audio_duration=get_audio_duration(audio),
+        audio_path=temp_file,
+        audio_hash=audio_hash,
+        audio_duration=audio_duration,
         language=model_params.language,
         task_type="full_process",
         task_params={
@@ -85,34 +96,191 @@ async def speech_to_text(
             "asr_options": asr_options_params.model_dump(),
             "vad_options": vad_options_params.model_dump(),
             **diarize_params.model_dump(),
+            **draft_params.model_dump(),
+            **callback_params.model_dump(),
         },
         start_time=datetime.utcnow(),
         session=session,
     )
-    logger.info("Task added to database: ID %s", identifier)
-
-    audio_params = SpeechToTextProcessingParams(
-        audio=audio,
-        identifier=identifier,
-        vad_options=vad_options_params,
-        asr_options=asr_options_params,
-        whisper_model_params=model_params,
-        alignment_params=align_params,
-        diarization_params=diarize_params,
+    logger.info("Task queued for processing: ID %s", identifier)
+
+    return Response(identifier=identifier, message="Task queued")
+
+
+@stt_router.post("/speech-to-text-batch", tags=["Speech-2-Text"])
+def speech_to_text_batch(
+    model_params: WhisperModelParams = Depends(),
+    align_params: AlignmentParams = Depends(),
+    diarize_params: DiarizationParams = Depends(),
+    draft_params: DraftParams = Depends(),
+    callback_params: CallbackParams = Depends(),
+    asr_options_params: ASROptions = Depends(),
+    vad_options_params: VADOptions = Depends(),
+    files: Optional[List[UploadFile]] = File(None),
+    paths: Optional[List[str]] = Form(None),
+    session: Session = Depends(get_db_session),
+) -> BatchResponse:
+    """
+    Process several audio files with shared parameters as one batch.
+
+    Files can be uploaded, or given as paths inside the shared input roots, which
+    are processed in place as with ``/speech-to-text-path``. Every file becomes a
+    task of the batch. The tasks are scheduled next to each other, so they share the
+    loaded models and their speech segments can be batched together. The progress
+    of all files is available at ``/batch/{identifier}``.
+
+    Args:
+        model_params (WhisperModelParams): Whisper model parameters.
+        align_params (AlignmentParams): Alignment parameters.
+        diarize_params (DiarizationParams): Diarization parameters.
+        draft_params (DraftParams): Parameters of the draft pass.
+        callback_params (CallbackParams): URL the result is delivered to.
+        asr_options_params (ASROptions): ASR options parameters.
+        vad_options_params (VADOptions): VAD options parameters.
+        files (List[UploadFile], optional): Uploaded audio files.
+        paths (List[str], optional): Paths of audio files on the shared volume.
+        session (Session): Database session dependency.
+
+    Returns:
+        BatchResponse: Identifier of the batch and of its tasks.
+    """
+    files = files or []
+    paths = paths or []
+    logger.info(
+        "Received batch request with %d files and %d paths", len(files), len(paths)
     )
+    if not files and not paths:
+        raise HTTPException(status_code=400, detail="No files or paths given")
+
+    for file in files:
+        validate_extension(file.filename, ALLOWED_EXTENSIONS)
+    shared_files = [resolve_shared_path(path) for path in paths]
+
+    # Every file is saved and probed before the batch is created, so a rejected
+    # upload leaves neither a batch nor some of its tasks behind
+    uploads = []
+    try:
+        for file in files:
+            temp_file, audio_hash = save_temporary_file(
+                file.file, file.filename, sha256=True
+            )
+            uploads.append(
+                {
+                    "file_name": file.filename,
+                    "audio_path": temp_file,
+                    "audio_hash": audio_hash,
+                }
+            )
+            uploads[-1]["audio_duration"] = probe_audio_duration(temp_file)
+    except BaseException:
+        for upload in uploads:
+            os.remove(upload["audio_path"])
+        raise
+    inputs = uploads + [
+        {
+            "file_name": os.path.basename(shared_file),
+            "audio_path": shared_file,
+            "audio_duration": probe_audio_duration(shared_file),
+        }
+        for shared_file in shared_files
+    ]
+
+    batch_id = add_batch_to_db(session=session)
+    task_params = {
+        **model_params.model_dump(),
+        **align_params.model_dump(),
+        "asr_options": asr_options_params.model_dump(),
+        "vad_options": vad_options_params.model_dump(),
+        **diarize_params.model_dump(),
+        **draft_params.model_dump(),
+        **callback_params.model_dump(),
+    }
+    identifiers = [
+        enqueue_task(
+            **audio,
+            language=model_params.language,
+            task_type="full_process",
+            task_params=task_params,
+            batch_id=batch_id,
+            start_time=datetime.utcnow(),
+            session=session,
+        )
+        for audio in inputs
+    ]
+    logger.info("Batch %s queued with %d tasks", batch_id, len(identifiers))
+
+    return BatchResponse(identifier=batch_id, message="Batch queued", tasks=identifiers)
+
+
+@stt_router.post("/speech-to-text-path", tags=["Speech-2-Text"])
+def speech_to_text_path(
+    model_params: WhisperModelParams = Depends(),
+    align_params: AlignmentParams = Depends(),
+    diarize_params: DiarizationParams = Depends(),
+    draft_params: DraftParams = Depends(),
+    callback_params: CallbackParams = Depends(),
+    asr_options_params: ASROptions = Depends(),
+    vad_options_params: VADOptions = Depends(),
+    path: str = Form(...),
+    session: Session = Depends(get_db_session),
+) -> Response:
+    """
+    Process an audio file that is already on a volume shared with the service.
 
-    background_tasks.add_task(process_audio_common, audio_params, session)
-    logger.info("Background task scheduled for processing: ID %s", identifier)
+    The file must be inside one of the SHARED_INPUT_ROOTS. It is neither uploaded
+    nor copied: the task decodes it in place, and the file is never modified or
+    deleted.
+
+    Args:
+        model_params (WhisperModelParams): Whisper model parameters.
+        align_params (AlignmentParams): Alignment parameters.
+        diarize_params (DiarizationParams): Diarization parameters.
+        draft_params (DraftParams): Parameters of the draft pass.
+        callback_params (CallbackParams): URL the result is delivered to.
+        asr_options_params (ASROptions): ASR options parameters.
+        vad_options_params (VADOptions): VAD options parameters.
+        path (str): Absolute path of the audio file.
+        session (Session): Database session dependency.
+
+    Returns:
+        Response: Confirmation message of task queuing.
+    """
+    logger.info("Received path for processing: %s", path)
+
+    audio_file = resolve_shared_path(path)
+    audio_duration = probe_audio_duration(audio_file)
+    logger.info("Audio file %s length: %s seconds", audio_file, audio_duration)
+
+    identifier = enqueue_task(
+        file_name=os.path.basename(audio_file),
+        audio_path=audio_file,
+        audio_duration=audio_duration,
+        language=model_params.language,
+        task_type="full_process",
+        task_params={
+            **model_params.model_dump(),
+            **align_params.model_dump(),
+            "asr_options": asr_options_params.model_dump(),
+            "vad_options": vad_options_params.model_dump(),
+            **diarize_params.model_dump(),
+            **draft_params.model_dump(),
+            **callback_params.model_dump(),
+        },
+        start_time=datetime.utcnow(),
+        session=session,
+    )
+    logger.info("Task queued for processing: ID %s", identifier)
 
     return Response(identifier=identifier, message="Task queued")
 
 
 @stt_router.post("/speech-to-text-url", tags=["Speech-2-Text"])
 async def speech_to_text_url(
-    background_tasks: BackgroundTasks,
     model_params: WhisperModelParams = Depends(),
     align_params: AlignmentParams = Depends(),
     diarize_params: DiarizationParams = Depends(),
+    draft_params: DraftParams = Depends(),
+    callback_params: CallbackParams = Depends(),
     asr_options_params: ASROptions = Depends(),
     vad_options_params: VADOptions = Depends(),
     url: str = Form(...),
@@ -121,11 +289,15 @@ async def speech_to_text_url(
     """
     Process an audio file from a URL for speech-to-text conversion.
 
+    The download runs on the event loop; probing the file and queuing the task
+    block, so they run in the thread pool.
+
     Args:
-        background_tasks (BackgroundTasks): Background tasks dependency.
         model_params (WhisperModelParams): Whisper model parameters.
         align_params (AlignmentParams): Alignment parameters.
         diarize_params (DiarizationParams): Diarization parameters.
+        draft_params (DraftParams): Parameters of the draft pass.
+        callback_params (CallbackParams): URL the result is delivered to.
         asr_options_params (ASROptions): ASR options parameters.
         vad_options_params (VADOptions): VAD options parameters.
         url (str): URL of the audio file.
@@ -136,36 +308,16 @@ async def speech_to_text_url(
     """
     logger.info("Received URL for processing: %s", url)
 
-    # Extract filename from HTTP response headers or URL
-    with requests.get(url, stream=True) as response:
-        response.raise_for_status()
-
-        # Check for filename in Content-Disposition header
-        content_disposition = response.headers.get("Content-Disposition")
-        if content_disposition and "filename=" in content_disposition:
-            filename = content_disposition.split("filename=")[1].strip('"')
-        else:
-            # Fall back to extracting from the URL path
-            filename = os.path.basename(url)
-
-        # Get the file extension
-        _, original_extension = os.path.splitext(filename)
-
-        # Save the file to a temporary location
-        temp_audio_file = NamedTemporaryFile(suffix=original_extension, delete=False)
-        for chunk in response.iter_content(chunk_size=8192):
-            temp_audio_file.write(chunk)
+    temp_audio_file, _ = await download_audio(url)
+    logger.info("File downloaded and saved temporarily: %s", temp_audio_file)
+    audio_duration = await run_in_threadpool(probe_audio_duration, temp_audio_file)
+    logger.info("Audio file length: %s seconds", audio_duration)
 
-    logger.info("File downloaded and saved temporarily: %s", temp_audio_file.name)
-    validate_extension(temp_audio_file.name, ALLOWED_EXTENSIONS)
-
-    audio = process_audio_file(temp_audio_file.name)
-    logger.info("Audio file processed: duration %s seconds", get_audio_duration(audio))
-
-    identifier = add_task_to_db(
-        status="processing",
-        file_name=temp_audio_file.name,
-        audio_duration=get_audio_duration(audio),
+    identifier = await run_in_threadpool(
+        enqueue_task,
+        file_name=temp_audio_file,
+        audio_path=temp_audio_file,
+        audio_duration=audio_duration,
         language=model_params.language,
         task_type="full_process",
         task_params={
@@ -174,24 +326,13 @@ async def speech_to_text_url(
             "asr_options": asr_options_params.model_dump(),
             "vad_options": vad_options_params.model_dump(),
             **diarize_params.model_dump(),
+            **draft_params.model_dump(),
+            **callback_params.model_dump(),
         },
         url=url,
         start_time=datetime.utcnow(),
         session=session,
     )
-    logger.info("Task added to database: ID %s", identifier)
-
-    audio_params = SpeechToTextProcessingParams(
-        audio=audio,
-        identifier=identifier,
-        vad_options=vad_options_params,
-        asr_options=asr_options_params,
-        whisper_model_params=model_params,
-        alignment_params=align_params,
-        diarization_params=diarize_params,
-    )
-
-    background_tasks.add_task(process_audio_common, audio_params, session)
-    logger.info("Background task scheduled for processing: ID %s", identifier)
+    logger.info("Task queued for processing: ID %s", identifier)
 
     return Response(identifier=identifier, message="Task queued")
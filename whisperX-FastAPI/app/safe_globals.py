@@ -0,0 +1,257 @@
+"""This module allows the classes pickled in model checkpoints for ``torch.load(weights_only=True)``.
+
+Only classes defined in the modules of ``ALLOWED_MODULES`` are allowed, so a
+tampered checkpoint cannot get ``weights_only`` loads to call arbitrary
+functions; any other global is logged and left to ``torch.load`` to reject.
+"""
+
+import functools
+import importlib
+import json
+import os
+import threading
+from tempfile import NamedTemporaryFile
+
+from .config import Config
+from .logger import logger
+
+# Modules whose classes checkpoints may reference; the pyannote models, e.g. the
+# VAD bundled with whisperx, need builtin types such as dict, list and int and
+# omegaconf, typing and collections classes besides torch and pyannote ones
+ALLOWED_MODULES = (
+    "builtins",
+    "torch",
+    "pyannote",
+    "omegaconf",
+    "typing",
+    "collections",
+)
+
+_lock = threading.Lock()
+_enabled = False
+# Resolved checkpoint path -> size, modification time and the globals it references
+_known = None
+# Names already passed to torch.serialization.add_safe_globals
+_allowed = set()
+
+
+def resolve_global(name: str):
+    """
+    Import the object a checkpoint refers to by its full name.
+
+    Args:
+        name (str): ``{module}.{qualname}``, e.g. ``omegaconf.listconfig.ListConfig``.
+
+    Returns:
+        The object, or None if it cannot be imported.
+    """
+    parts = name.split(".")
+    for split in range(len(parts) - 1, 0, -1):
+        try:
+            obj = importlib.import_module(".".join(parts[:split]))
+        except ImportError:
+            continue
+        try:
+            for attribute in parts[split:]:
+                obj = getattr(obj, attribute)
+        except AttributeError:
+            return None
+        return obj
+    return None
+
+
+def _in_allowed_module(module: str) -> bool:
+    """Return whether a module is one of ``ALLOWED_MODULES`` or below one."""
+    return any(
+        module == allowed or module.startswith(allowed + ".")
+        for allowed in ALLOWED_MODULES
+    )
+
+
+def allowed_global(name: str):
+    """
+    Return the class a checkpoint refers to, if it may be unpickled.
+
+    Args:
+        name (str): ``{module}.{qualname}`` as listed in the checkpoint.
+
+    Returns:
+        type: The class, or None if the name is outside ``ALLOWED_MODULES``, cannot
+        be imported or is not a class, e.g. a function.
+    """
+    if not _in_allowed_module(name):
+        return None
+    obj = resolve_global(name)
+    # Names can reach other modules through attributes, e.g. torch.os.system
+    if not isinstance(obj, type) or not _in_allowed_module(
+        getattr(obj, "__module__", "")
+    ):
+        return None
+    return obj
+
+
+def _checkpoint_path(checkpoint):
+    """Return the file behind a checkpoint given as path or open file, or None."""
+    if isinstance(checkpoint, (str, os.PathLike)):
+        path = os.fspath(checkpoint)
+    else:
+        path = getattr(checkpoint, "path", None) or getattr(checkpoint, "name", None)
+    if isinstance(path, str) and os.path.isfile(path):
+        return os.path.realpath(path)
+    return None
+
+
+def _scan(checkpoint) -> list:
+    """List the globals a checkpoint references, keeping the position of open files."""
+    from torch.serialization import get_unsafe_globals_in_checkpoint
+
+    if isinstance(checkpoint, (str, os.PathLike)):
+        return get_unsafe_globals_in_checkpoint(checkpoint)
+    position = checkpoint.tell()
+    try:
+        return get_unsafe_globals_in_checkpoint(checkpoint)
+    finally:
+        checkpoint.seek(position)
+
+
+def _load_known() -> dict:
+    """Return the scanned checkpoints, read from SAFE_GLOBALS_CACHE on first use (lock held)."""
+    global _known
+    if _known is None:
+        try:
+            with open(Config.SAFE_GLOBALS_CACHE) as file:
+                _known = json.load(file)
+        except (OSError, ValueError):
+            _known = {}
+    return _known
+
+
+def _save_known():
+    """Write the scanned checkpoints to SAFE_GLOBALS_CACHE (lock held)."""
+    directory = os.path.dirname(Config.SAFE_GLOBALS_CACHE) or "."
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with NamedTemporaryFile(
+            "w", dir=directory, suffix=".partial", delete=False
+        ) as file:
+            json.dump(_known, file)
+        os.replace(file.name, Config.SAFE_GLOBALS_CACHE)
+    except OSError as exc:
+        logger.warning("Could not save the checkpoint globals: %s", exc)
+
+
+def _valid_entry(entry) -> bool:
+    """Return whether a cached scan has the expected shape; others are scanned again."""
+    return (
+        isinstance(entry, dict)
+        and isinstance(entry.get("globals"), list)
+        and all(isinstance(name, str) for name in entry["globals"])
+        and "size" in entry
+        and "mtime_ns" in entry
+    )
+
+
+def checkpoint_globals(checkpoint) -> list:
+    """
+    Return the full names of the globals pickled in a checkpoint.
+
+    Checkpoints on disk are scanned once; the names are kept in SAFE_GLOBALS_CACHE
+    with the size and modification time of the file, so restarts skip the scan.
+    The cache only saves the scan: ``allow_checkpoint_globals`` checks every name
+    it returns, wherever it comes from.
+
+    Args:
+        checkpoint: Path or open binary file of a checkpoint in the zip format.
+
+    Returns:
+        list: Names such as ``omegaconf.listconfig.ListConfig``.
+    """
+    path = _checkpoint_path(checkpoint)
+    if path is None:
+        return _scan(checkpoint)
+    stat = os.stat(path)
+    with _lock:
+        known = _load_known()
+        entry = known.get(path)
+        if not _valid_entry(entry) or [entry["size"], entry["mtime_ns"]] != [
+            stat.st_size,
+            stat.st_mtime_ns,
+        ]:
+            entry = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "globals": _scan(path),
+            }
+            known[path] = entry
+            _save_known()
+            logger.debug("Scanned checkpoint %s: %s", path, entry["globals"])
+        return entry["globals"]
+
+
+def allow_checkpoint_globals(checkpoint):
+    """
+    Mark the classes pickled in a checkpoint as safe to unpickle.
+
+    Globals outside ``ALLOWED_MODULES`` and globals that are not classes are
+    logged and skipped, so ``torch.load`` rejects the checkpoint.
+
+    Args:
+        checkpoint: Path or open binary file of a checkpoint in the zip format.
+    """
+    from torch.serialization import add_safe_globals
+
+    names = checkpoint_globals(checkpoint)
+    with _lock:
+        safe = []
+        for name in names:
+            if name in _allowed:
+                continue
+            obj = allowed_global(name)
+            if obj is None:
+                logger.warning(
+                    "Not allowing global %s of checkpoint %s: not an importable class of %s",
+                    name,
+                    checkpoint,
+                    ", ".join(ALLOWED_MODULES),
+                )
+                continue
+            safe.append((obj, name))
+            _allowed.add(name)
+    if safe:
+        add_safe_globals(safe)
+
+
+def _allowing_checkpoint_globals(load):
+    """Wrap ``torch.load`` to allow the globals of every checkpoint loaded with ``weights_only``."""
+
+    @functools.wraps(load)
+    def wrapper(f, *args, **kwargs):
+        if kwargs.get("weights_only") is not False:
+            try:
+                allow_checkpoint_globals(f)
+            except Exception as exc:
+                # Legacy (non-zip) checkpoints cannot be scanned, torch.load reports them
+                logger.debug("Could not list the globals of checkpoint %s: %s", f, exc)
+        return load(f, *args, **kwargs)
+
+    return wrapper
+
+
+def enable_checkpoint_safe_globals():
+    """
+    Let ``torch.load`` accept the classes pickled in the checkpoints it loads.
+
+    Since PyTorch 2.6, ``torch.load`` defaults to ``weights_only=True`` and rejects
+    the builtin, omegaconf, typing and pyannote classes in the pyannote checkpoints. Rather
+    than allowing every class of these packages when the service starts, ``torch.load``
+    is wrapped right before the first model is loaded and allows exactly the classes
+    of ``ALLOWED_MODULES`` found in each checkpoint. Safe to call more than once.
+    """
+    global _enabled
+    with _lock:
+        if _enabled:
+            return
+        import torch
+
+        torch.load = _allowing_checkpoint_globals(torch.load)
+        _enabled = True
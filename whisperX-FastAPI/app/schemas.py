@@ -7,10 +7,13 @@ from typing import Any, List, Optional
 
 import numpy as np
 from fastapi import Query
-from pydantic import BaseModel, Field, field_validator, ConfigDict
-from whisperx import utils
+from pydantic import BaseModel, Field, field_validator, model_validator, ConfigDict
+from pydantic.fields import FieldInfo
+
+from .calibration import TUNED_FIELDS, host_defaults
 
 WHISPER_MODEL = os.getenv("WHISPER_MODEL")
+DRAFT_MODEL = os.getenv("DRAFT_MODEL") or None
 LANG = os.getenv("DEFAULT_LANG", "en")  # bleibt vorhanden, wird aber nicht mehr als Default genutzt
 
 
@@ -33,6 +36,7 @@ class Metadata(BaseModel):
     audio_duration: Optional[float] = None
     start_time: Optional[datetime] = None
     end_time: Optional[datetime] = None
+    metrics: Optional[dict] = None
 
 
 class TaskSimple(BaseModel):
@@ -49,6 +53,34 @@ class ResultTasks(BaseModel):
     tasks: List[TaskSimple]
 
 
+class BatchResponse(BaseModel):
+    """Response model for a batch submission."""
+
+    identifier: str
+    message: str
+    tasks: List[str]
+
+
+class BatchTask(BaseModel):
+    """Model for a task of a batch."""
+
+    identifier: str
+    file_name: Optional[str]
+    status: str
+    error: Optional[str] = None
+
+
+class BatchResult(BaseModel):
+    """Model for the aggregate progress of a batch."""
+
+    identifier: str
+    status: str
+    progress: float
+    total: int
+    counts: dict
+    tasks: List[BatchTask]
+
+
 class TranscriptionSegment(BaseModel):
     """Model for a segment of transcription."""
 
@@ -120,12 +152,19 @@ class TranscriptInput(BaseModel):
 
 
 class Result(BaseModel):
-    """Model for a result with status, result data, metadata, and optional error."""
+    """Model for a result with status, result data, metadata, optional error and queue position."""
 
     status: str
     result: Any
     metadata: Metadata
     error: Optional[str]
+    queue_position: Optional[int] = None
+    draft_result: Any = None
+    progress: Optional[dict] = None
+    partial_result: Any = None
+    # "draft", then "partial" while the ASR runs, until the final result replaces them
+    result_stage: Optional[str] = None
+    callback: Optional[dict] = None
 
 
 class ComputeType(str, Enum):
@@ -306,25 +345,45 @@ class WhisperModelParams(BaseModel):
     device_index: int = Field(
         Query(0, description="Device index to use for FasterWhisper inference")
     )
-    threads: int = Field(
+    threads: Optional[int] = Field(
         Query(
-            0,
-            description="Number of threads used by torch for CPU inference; supersedes MKL_NUM_THREADS/OMP_NUM_THREADS",
+            None,
+            description="Number of threads used by torch for CPU inference; supersedes MKL_NUM_THREADS/OMP_NUM_THREADS. "
+            "Leave empty for the calibrated value of the host.",
         )
     )
-    batch_size: int = Field(
-        Query(8, description="The preferred batch size for inference")
+    batch_size: Optional[int] = Field(
+        Query(
+            None,
+            description="The preferred batch size for inference. Leave empty for the calibrated value of the host.",
+        )
     )
-    chunk_size: int = Field(
+    chunk_size: Optional[int] = Field(
         Query(
-            20,
-            description="Chunk size for merging VAD segments. Default is 20, reduce this if the chunk is too long.",
+            None,
+            description="Chunk size for merging VAD segments, reduce this if the chunk is too long. "
+            "Leave empty for the calibrated value of the host.",
         )
     )
-    compute_type: ComputeType = Field(
-        Query("float16", description="Type of computation")
+    compute_type: Optional[ComputeType] = Field(
+        Query(
+            None,
+            description="Type of computation. Leave empty for the calibrated value of the host.",
+        )
     )
 
+    @model_validator(mode="after")
+    def use_host_defaults(self):
+        """Fill the tuning fields a request left empty with the defaults of the host (see ``calibration``)."""
+        unset = [name for name in TUNED_FIELDS if getattr(self, name, None) is None]
+        if unset:
+            defaults = host_defaults(self.device)
+            for name in unset:
+                setattr(self, name, defaults[name])
+            if "compute_type" in unset:
+                self.compute_type = ComputeType(self.compute_type)
+        return self
+
 
 class AlignmentParams(BaseModel):
     """Model for alignment parameters."""
@@ -357,6 +416,53 @@ class DiarizationParams(BaseModel):
     )
 
 
+class DraftParams(BaseModel):
+    """Model for the parameters of the draft pass."""
+
+    draft_model: Optional[WhisperModel] = Field(
+        Query(
+            DRAFT_MODEL,
+            description="Small Whisper model (e.g. 'tiny' or 'base') transcribing the file first, without "
+            "alignment and diarization. Its result is available as draft_result of the task until the "
+            "final result replaces it. Leave empty to skip the draft pass.",
+        )
+    )
+
+
+class CallbackParams(BaseModel):
+    """Model for the URL the result of a task is delivered to."""
+
+    callback_url: Optional[str] = Field(
+        Query(
+            None,
+            pattern=r"^https?://\S+$",
+            description="URL the task (as returned by /task/{identifier}) is POSTed to once it completed or "
+            "failed, signed with CALLBACK_SECRET in the X-WhisperX-Signature header. Failed deliveries are "
+            "retried.",
+        )
+    )
+
+
+def query_defaults(model_class) -> dict:
+    """
+    Return the default values of a parameter model whose fields wrap ``Query``.
+
+    Instantiating such a model without arguments keeps the ``Query`` objects as
+    values, so code building parameters outside of a request starts from these.
+
+    Args:
+        model_class (type[BaseModel]): The parameter model.
+
+    Returns:
+        dict: Field name -> default value.
+    """
+    defaults = {}
+    for name, field in model_class.model_fields.items():
+        default = field.default
+        defaults[name] = default.default if isinstance(default, FieldInfo) else default
+    return defaults
+
+
 class TaskType(str, Enum):
     """Enum for task types."""
 
@@ -370,7 +476,9 @@ class TaskType(str, Enum):
 class TaskStatus(str, Enum):
     """Enum for task status."""
 
-    processing = "processing"
+    queued = "queued"
+    running = "running"
+    processing = "processing"  # legacy status of tasks run as FastAPI background tasks
     completed = "completed"
     failed = "failed"
 
@@ -380,10 +488,13 @@ class SpeechToTextProcessingParams(BaseModel):
 
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
-    audio: np.ndarray  # NumPy array containing the audio waveform, float32 dtype
+    audio: np.ndarray  # float32 audio waveform, memory-mapped by the task workers
     identifier: str
     vad_options: VADOptions
     asr_options: ASROptions
     whisper_model_params: WhisperModelParams
     alignment_params: AlignmentParams
     diarization_params: DiarizationParams
+    # Key of the cached stage outputs, None disables them
+    audio_hash: Optional[str] = None
+    draft_params: Optional[DraftParams] = None
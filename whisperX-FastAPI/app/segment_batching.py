@@ -0,0 +1,402 @@
+"""This module batches the speech segments of concurrent tasks into shared forwards of one resident Whisper model."""
+
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import replace
+from importlib import metadata
+
+import numpy as np
+import torch
+from faster_whisper.tokenizer import Tokenizer
+from whisperx.asr import find_numeral_symbol_tokens
+from whisperx.audio import N_SAMPLES, SAMPLE_RATE, log_mel_spectrogram
+from whisperx.vads import Pyannote, Vad
+
+from .config import Config
+from .logger import logger
+from .model_cache import whisper_models
+
+# Releases of whisperx whose FasterWhisperPipeline internals (the VAD parameters,
+# preset language, decoding options and tokenizer of the model) this module reuses
+SUPPORTED_WHISPERX = ("3.4.",)
+WHISPERX_VERSION = metadata.version("whisperx")
+PIPELINE_INTERNALS_SUPPORTED = WHISPERX_VERSION.startswith(SUPPORTED_WHISPERX)
+if not PIPELINE_INTERNALS_SUPPORTED:
+    logger.warning(
+        "whisperx %s is not supported for ASR_BATCHING and reporting segments per "
+        "forward; transcribing with FasterWhisperPipeline.transcribe instead",
+        WHISPERX_VERSION,
+    )
+
+
+def detect_speech(whisper_model, audio, chunk_size: int) -> list:
+    """
+    Cut the audio into speech segments with the VAD model of a Whisper-X pipeline.
+
+    This is the first half of ``FasterWhisperPipeline.transcribe``.
+
+    Args:
+        whisper_model: The Whisper-X pipeline.
+        audio (np.ndarray): The waveform.
+        chunk_size (int): Longest segment in seconds.
+
+    Returns:
+        list: Segments with ``start`` and ``end`` in seconds.
+    """
+    if isinstance(whisper_model.vad_model, Vad):
+        waveform = whisper_model.vad_model.preprocess_audio(audio)
+        merge_chunks = whisper_model.vad_model.merge_chunks
+    else:
+        waveform = Pyannote.preprocess_audio(audio)
+        merge_chunks = Pyannote.merge_chunks
+    vad_segments = whisper_model.vad_model(
+        {"waveform": waveform, "sample_rate": SAMPLE_RATE}
+    )
+    return merge_chunks(
+        vad_segments,
+        chunk_size,
+        onset=whisper_model._vad_params["vad_onset"],
+        offset=whisper_model._vad_params["vad_offset"],
+    )
+
+
+def decoding_options(whisper_model, language: str, task: str):
+    """
+    Return the tokenizer and decoding options of a Whisper-X pipeline for a language and task.
+
+    Args:
+        whisper_model: The Whisper-X pipeline.
+        language (str): Language of the audio.
+        task (str): "transcribe" or "translate".
+
+    Returns:
+        tuple: The tokenizer and the decoding options.
+    """
+    tokenizer = Tokenizer(
+        whisper_model.model.hf_tokenizer,
+        whisper_model.model.model.is_multilingual,
+        task=task,
+        language=language,
+    )
+    options = whisper_model.options
+    if whisper_model.suppress_numerals:
+        suppressed = find_numeral_symbol_tokens(tokenizer) + options.suppress_tokens
+        options = replace(options, suppress_tokens=list(set(suppressed)))
+    return tokenizer, options
+
+
+def log_mel_features(whisper_model, audios: list):
+    """
+    Return the padded log-Mel spectrograms of speech segments as one batch.
+
+    Args:
+        whisper_model: The Whisper-X pipeline.
+        audios (list): Waveforms of the segments, at most 30 seconds each.
+
+    Returns:
+        torch.Tensor: The stacked spectrograms.
+    """
+    n_mels = whisper_model.model.feat_kwargs.get("feature_size") or 80
+    return torch.stack(
+        [
+            log_mel_spectrogram(
+                np.asarray(audio), n_mels=n_mels, padding=N_SAMPLES - len(audio)
+            )
+            for audio in audios
+        ]
+    )
+
+
+def _cut(audio, segment: dict):
+    """Return the samples of a speech segment."""
+    return audio[
+        int(segment["start"] * SAMPLE_RATE) : int(segment["end"] * SAMPLE_RATE)
+    ]
+
+
+def transcribe_segments(
+    whisper_model,
+    audio,
+    language,
+    task: str,
+    batch_size: int,
+    chunk_size: int,
+    report=None,
+) -> dict:
+    """
+    Transcribe audio with a Whisper-X pipeline, handing each batch of segments to ``report`` once decoded.
+
+    This is ``FasterWhisperPipeline.transcribe``, which only returns once all
+    segments are decoded, with the decoding of the batcher.
+
+    Args:
+        whisper_model: The Whisper-X pipeline.
+        audio (np.ndarray): The waveform.
+        language (str): Language of the audio, None to detect it.
+        task (str): "transcribe" or "translate".
+        batch_size (int): Largest number of segments per forward.
+        chunk_size (int): Longest segment in seconds.
+        report (callable, optional): Called with the list of segments of every forward.
+
+    Returns:
+        dict: Transcription result with ``segments`` and ``language``.
+    """
+    vad_segments = detect_speech(whisper_model, audio, chunk_size)
+    language = language or whisper_model.preset_language
+    if language is None:
+        language = whisper_model.detect_language(audio)
+    tokenizer, options = decoding_options(whisper_model, language, task or "transcribe")
+    batch_size = max(batch_size or 1, 1)
+    segments = []
+    for first in range(0, len(vad_segments), batch_size):
+        batch = vad_segments[first : first + batch_size]
+        features = log_mel_features(
+            whisper_model, [_cut(audio, segment) for segment in batch]
+        )
+        texts = whisper_model.model.generate_segment_batched(
+            features, tokenizer, options
+        )
+        decoded = [
+            {
+                "text": text,
+                "start": round(segment["start"], 3),
+                "end": round(segment["end"], 3),
+            }
+            for text, segment in zip(texts, batch)
+        ]
+        segments += decoded
+        if report is not None:
+            report(decoded)
+    return {"segments": segments, "language": language}
+
+
+class _Segment:
+    """A speech segment of a task waiting for a forward."""
+
+    def __init__(self, audio, group, batch_size: int):
+        self.audio = audio
+        self.group = group
+        self.batch_size = batch_size
+        self.queued_at = time.monotonic()
+        self.future = Future()
+
+
+class SegmentBatcher:
+    """
+    Collects speech segments of concurrent tasks into full batches for one model.
+
+    Tasks hand their segments to :meth:`transcribe` and wait for the texts. A
+    single thread forms batches of segments that share language and task (they
+    need the same tokenizer prompt), runs them through the model and routes each
+    text back to its owning task. A batch is started as soon as it is full, or
+    once its oldest segment waited ``max_delay`` seconds.
+    """
+
+    def __init__(self, cache_key, loader, device, size_mb: float, max_delay: float):
+        """
+        Initialize the batcher.
+
+        Args:
+            cache_key: Key of the model in the ``whisper_models`` registry.
+            loader (callable): Loads the model if it is not resident.
+            device: Device the model runs on.
+            size_mb (float): Estimated memory of the model.
+            max_delay (float): Longest time in seconds a segment waits for a fuller batch.
+        """
+        self.cache_key = cache_key
+        self.loader = loader
+        self.device = device
+        self.size_mb = size_mb
+        self.max_delay = max_delay
+        self._pending = []
+        self._condition = threading.Condition()
+        self._tokenizers = {}
+        self.batches = 0
+        self.segments = 0
+        self._thread = threading.Thread(
+            target=self._run, name="asr-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def transcribe(
+        self,
+        audio,
+        vad_segments: list,
+        language: str,
+        task: str,
+        batch_size: int,
+        report=None,
+    ) -> list:
+        """
+        Transcribe the speech segments of one task.
+
+        Args:
+            audio (np.ndarray): The waveform of the task.
+            vad_segments (list): Segments from ``detect_speech``.
+            language (str): Language of the audio.
+            task (str): "transcribe" or "translate".
+            batch_size (int): Largest number of segments per forward.
+            report (callable, optional): Called with each segment, in order, once its text is decoded.
+
+        Returns:
+            list: Segments with ``text``, ``start`` and ``end``.
+        """
+        items = [
+            _Segment(_cut(audio, segment), (language, task), max(batch_size or 1, 1))
+            for segment in vad_segments
+        ]
+        with self._condition:
+            self._pending.extend(items)
+            self._condition.notify()
+        segments = []
+        for item, segment in zip(items, vad_segments):
+            segments.append(
+                {
+                    "text": item.future.result(),
+                    "start": round(segment["start"], 3),
+                    "end": round(segment["end"], 3),
+                }
+            )
+            if report is not None:
+                report(segments[-1:])
+        return segments
+
+    def _next_batch(self) -> list:
+        """Wait until a batch is full or its oldest segment waited long enough."""
+        with self._condition:
+            while True:
+                while not self._pending:
+                    self._condition.wait()
+                oldest = self._pending[0]
+                group = [item for item in self._pending if item.group == oldest.group]
+                remaining = oldest.queued_at + self.max_delay - time.monotonic()
+                if len(group) >= oldest.batch_size or remaining <= 0:
+                    batch = group[: oldest.batch_size]
+                    taken = set(map(id, batch))
+                    self._pending = [
+                        item for item in self._pending if id(item) not in taken
+                    ]
+                    return batch
+                self._condition.wait(remaining)
+
+    def _run(self):
+        """Run batches until the process exits."""
+        while True:
+            batch = self._next_batch()
+            try:
+                texts = self._forward(batch)
+            except BaseException as exc:
+                for item in batch:
+                    item.future.set_exception(exc)
+                continue
+            for item, text in zip(batch, texts):
+                item.future.set_result(text)
+
+    def _forward(self, batch: list) -> list:
+        """Transcribe a batch of segments that share language and task."""
+        language, task = batch[0].group
+        with whisper_models.use(
+            self.cache_key, self.loader, device=self.device, size_mb=self.size_mb
+        ) as whisper_model:
+            tokenizer, options = self._tokenizer(whisper_model, language, task)
+            features = log_mel_features(whisper_model, [item.audio for item in batch])
+            texts = whisper_model.model.generate_segment_batched(
+                features, tokenizer, options
+            )
+        self.batches += 1
+        self.segments += len(batch)
+        logger.debug("ASR batch of %d segments (%s, %s)", len(batch), language, task)
+        return texts
+
+    def _tokenizer(self, whisper_model, language: str, task: str):
+        """Return the tokenizer and decoding options for a language and task."""
+        key = (language, task)
+        if key not in self._tokenizers:
+            self._tokenizers[key] = decoding_options(whisper_model, language, task)
+        return self._tokenizers[key]
+
+    def stats(self) -> dict:
+        """
+        Return the number of forwards and the mean number of segments per forward.
+
+        Returns:
+            dict: Batching statistics.
+        """
+        return {
+            "batches": self.batches,
+            "segments": self.segments,
+            "mean_batch_size": self.segments / self.batches if self.batches else None,
+        }
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(cache_key, loader, device, size_mb: float) -> SegmentBatcher:
+    """
+    Return the batcher shared by all tasks using the model stored under ``cache_key``.
+
+    Args:
+        cache_key: Key of the model in the ``whisper_models`` registry.
+        loader (callable): Loads the model if it is not resident.
+        device: Device the model runs on.
+        size_mb (float): Estimated memory of the model.
+
+    Returns:
+        SegmentBatcher: The batcher of the model.
+    """
+    with _batchers_lock:
+        if cache_key not in _batchers:
+            _batchers[cache_key] = SegmentBatcher(
+                cache_key, loader, device, size_mb, Config.ASR_BATCH_MAX_DELAY_MS / 1000
+            )
+        return _batchers[cache_key]
+
+
+def transcribe_batched(
+    audio,
+    cache_key,
+    loader,
+    device,
+    size_mb: float,
+    language,
+    task,
+    batch_size: int,
+    chunk_size: int,
+    report=None,
+) -> dict:
+    """
+    Transcribe audio with segments batched together with those of concurrent tasks.
+
+    VAD and language detection run on the task's thread, the speech segments are
+    transcribed by the batcher of the model.
+
+    Args:
+        audio (np.ndarray): The waveform.
+        cache_key: Key of the model in the ``whisper_models`` registry.
+        loader (callable): Loads the model if it is not resident.
+        device: Device the model runs on.
+        size_mb (float): Estimated memory of the model.
+        language (str): Language of the audio, None to detect it.
+        task (str): "transcribe" or "translate".
+        batch_size (int): Largest number of segments per forward.
+        chunk_size (int): Longest segment in seconds.
+        report (callable, optional): Called with each segment, in order, once its text is decoded.
+
+    Returns:
+        dict: Transcription result with ``segments`` and ``language``.
+    """
+    with whisper_models.use(
+        cache_key, loader, device=device, size_mb=size_mb
+    ) as whisper_model:
+        vad_segments = detect_speech(whisper_model, audio, chunk_size)
+        language = language or whisper_model.preset_language
+        if language is None:
+            language = whisper_model.detect_language(audio)
+    batcher = get_batcher(cache_key, loader, device, size_mb)
+    segments = batcher.transcribe(
+        audio, vad_segments, language, task or "transcribe", batch_size, report=report
+    )
+    return {"segments": segments, "language": language}
@@ -2,11 +2,11 @@
 
 from datetime import datetime
 
-import whisperx
 from fastapi import Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from .db import get_db_session
+from .languages import LANGUAGES
 from .logger import logger  # Import the logger from the new module
 from .schemas import (
     AlignmentParams,
@@ -16,7 +16,12 @@ from .schemas import (
     WhisperModelParams,
 )
 from .tasks import update_task_status_in_db
-from .whisperx_services import align_whisper_output, diarize, transcribe_with_whisper
+from .whisperx_services import (
+    align_whisper_output,
+    assign_word_speakers,
+    diarize,
+    transcribe_with_whisper,
+)
 
 
 def validate_language_code(language_code):
@@ -29,7 +34,7 @@ def validate_language_code(language_code):
     Returns:
         str: The validated language code.
     """
-    if language_code not in whisperx.utils.LANGUAGES:
+    if language_code not in LANGUAGES:
         raise HTTPException(
             status_code=400, detail=f"Invalid language code: {language_code}"
         )
@@ -217,7 +222,7 @@ def process_speaker_assignment(
         session (Session): The database session.
     """
     process_audio_task(
-        whisperx.assign_word_speakers,
+        assign_word_speakers,
         identifier,
         "combine_transcript&diarization",
         session,
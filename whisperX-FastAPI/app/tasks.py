@@ -6,8 +6,11 @@ from fastapi import Depends
 from sqlalchemy.orm import Session
 
 from .db import get_db_session, handle_database_errors
-from .models import Task
-from .schemas import ResultTasks, TaskSimple
+from .models import Batch, Task, TaskSegment
+from .progress import running_task_progress, status_value, task_events
+from .result_store import load_result, store_result
+from .scheduler import DEFAULT_AUDIO_SECONDS, queue_position
+from .schemas import BatchResult, BatchTask, ResultTasks, TaskSimple, TaskStatus
 
 
 # Add tasks to the database
@@ -22,6 +25,10 @@ def add_task_to_db(
     audio_duration=None,
     start_time=None,
     end_time=None,
+    audio_path=None,
+    audio_hash=None,
+    payload=None,
+    batch_id=None,
     session: Session = Depends(get_db_session),
 ):
     """
@@ -37,6 +44,10 @@ def add_task_to_db(
         audio_duration (float, optional): Duration of the audio file. Defaults to None.
         start_time (datetime, optional): Start time of the task. Defaults to None.
         end_time (datetime, optional): End time of the task. Defaults to None.
+        audio_path (str, optional): Path of the stored audio file to process. Defaults to None.
+        audio_hash (str, optional): SHA-256 of the stored audio file. Defaults to None.
+        payload (dict, optional): Additional input data of the task. Defaults to None.
+        batch_id (str, optional): Identifier of the batch of the task. Defaults to None.
         session (Session, optional): Database session. Defaults to Depends(get_db_session).
 
     Returns:
@@ -52,12 +63,52 @@ def add_task_to_db(
         audio_duration=audio_duration,
         start_time=start_time,
         end_time=end_time,
+        audio_path=audio_path,
+        audio_hash=audio_hash,
+        payload=payload,
+        batch_id=batch_id,
     )
     session.add(task)
     session.commit()
     return task.uuid
 
 
+def _store_partial_segments(task: Task, segments, session: Session):
+    """
+    Append newly finalised ASR segments to the partial result of a task.
+
+    Segments stored before at the same or later positions, e.g. by an earlier
+    attempt of the task, are replaced.
+
+    Args:
+        task (Task): The task.
+        segments (list): Segments with ``index``, ``start``, ``end`` and ``text``, None to remove all.
+        session (Session): Database session, committed by the caller.
+    """
+    stale = session.query(TaskSegment).filter(TaskSegment.task_id == task.id)
+    if segments:
+        stale = stale.filter(TaskSegment.position >= segments[0]["index"])
+    stale.delete(synchronize_session=False)
+    session.add_all(
+        TaskSegment(
+            task_id=task.id,
+            position=segment["index"],
+            start=segment["start"],
+            end=segment["end"],
+            text=segment["text"],
+        )
+        for segment in segments or []
+    )
+
+
+def _partial_segments(task: Task) -> list:
+    """Return the ASR segments of a task finalised so far, as reported while it runs."""
+    return [
+        {"start": segment.start, "end": segment.end, "text": segment.text}
+        for segment in task.partial_segments
+    ]
+
+
 # Update task status in the database
 @handle_database_errors
 def update_task_status_in_db(
@@ -68,6 +119,9 @@ def update_task_status_in_db(
     """
     Update task status and attributes in the database.
 
+    A ``result`` is stored in the compact result table instead of the task row, and
+    ``partial_segments`` are appended to the segments table, see ``_store_partial_segments``.
+
     Args:
         identifier (str): Identifier of the task to be updated.
         update_data (Dict[str, Any]): Dictionary containing the attributes to update along with their new values.
@@ -79,8 +133,22 @@ def update_task_status_in_db(
     task = session.query(Task).filter_by(uuid=identifier).first()
     if task:
         for key, value in update_data.items():
-            setattr(task, key, value)
+            if key == "result":
+                store_result(task, value)
+            elif key == "partial_segments":
+                _store_partial_segments(task, value, session)
+            else:
+                setattr(task, key, value)
         session.commit()
+        if "status" in update_data:
+            task_events.publish(
+                identifier,
+                "status",
+                {
+                    "status": status_value(update_data["status"]),
+                    "error": update_data.get("error"),
+                },
+            )
 
 
 # Retrieve task status from the database
@@ -98,9 +166,12 @@ def get_task_status_from_db(identifier, session: Session = Depends(get_db_sessio
     """
     task = session.query(Task).filter(Task.uuid == identifier).first()
     if task:
+        result = load_result(task)
+        # The segments of the ASR are only kept until the result replaces them
+        segments = _partial_segments(task) if result is None else []
         return {
             "status": task.status,
-            "result": task.result,
+            "result": result,
             "metadata": {
                 "task_type": task.task_type,
                 "task_params": task.task_params,
@@ -111,13 +182,86 @@ def get_task_status_from_db(identifier, session: Session = Depends(get_db_sessio
                 "audio_duration": task.audio_duration,
                 "start_time": task.start_time,
                 "end_time": task.end_time,
+                "metrics": task.metrics,
             },
             "error": task.error,
+            "queue_position": (
+                queue_position(session, identifier)
+                if task.status == TaskStatus.queued
+                else None
+            ),
+            "draft_result": task.draft_result,
+            "progress": task.progress,
+            "partial_result": {"segments": segments} if segments else None,
+            "result_stage": (
+                "final"
+                if result is not None
+                else "partial"
+                if segments
+                else "draft"
+                if task.draft_result
+                else None
+            ),
+            "callback": (
+                {
+                    "status": task.callback_status,
+                    "attempts": task.callback_attempts,
+                    "error": task.callback_error,
+                }
+                if task.callback_status
+                else None
+            ),
         }
     else:
         return None
 
 
+@handle_database_errors
+def get_task_progress_from_db(identifier, session: Session = Depends(get_db_session)):
+    """
+    Retrieve the status, progress and segments finalised so far of a task.
+
+    The progress of a task running in this process is taken from memory, as it
+    may include segments not written to the database yet.
+
+    Args:
+        identifier (str): Identifier of the task.
+        session (Session, optional): Database session. Defaults to Depends(get_db_session).
+
+    Returns:
+        dict: ``status``, ``progress`` and ``segments`` if the task exists, otherwise None.
+    """
+    task = session.query(Task).filter(Task.uuid == identifier).first()
+    if task is None:
+        return None
+    running = running_task_progress(identifier)
+    if running is not None:
+        progress = running.as_dict()
+        segments = list(running.segments)
+    else:
+        progress = task.progress
+        segments = _partial_segments(task)
+    return {"status": task.status, "progress": progress, "segments": segments}
+
+
+@handle_database_errors
+def get_task_status_value_from_db(
+    identifier, session: Session = Depends(get_db_session)
+):
+    """
+    Retrieve only the status of a task.
+
+    Args:
+        identifier (str): Identifier of the task.
+        session (Session, optional): Database session. Defaults to Depends(get_db_session).
+
+    Returns:
+        str: The status, or None if the task does not exist.
+    """
+    row = session.query(Task.status).filter(Task.uuid == identifier).first()
+    return row[0] if row else None
+
+
 # Retrieve task status from the database
 @handle_database_errors
 def get_all_tasks_status_from_db(session: Session = Depends(get_db_session)):
@@ -170,3 +314,88 @@ def delete_task_from_db(identifier: str, session: Session = Depends(get_db_sessi
     else:
         # If the task does not exist, return False
         return False
+
+
+@handle_database_errors
+def add_batch_to_db(session: Session = Depends(get_db_session)) -> str:
+    """
+    Add a new batch to the database.
+
+    Args:
+        session (Session, optional): Database session. Defaults to Depends(get_db_session).
+
+    Returns:
+        str: UUID of the newly created batch.
+    """
+    batch = Batch()
+    session.add(batch)
+    session.commit()
+    return batch.uuid
+
+
+def _batch_status(counts: dict, total: int) -> str:
+    """Return the aggregate status of a batch from the status counts of its tasks."""
+    completed = counts.get(TaskStatus.completed.value, 0)
+    failed = counts.get(TaskStatus.failed.value, 0)
+    if completed + failed == total:
+        return (
+            TaskStatus.failed.value
+            if failed == total and total
+            else TaskStatus.completed.value
+        )
+    if counts.get(TaskStatus.queued.value, 0) == total:
+        return TaskStatus.queued.value
+    return TaskStatus.running.value
+
+
+@handle_database_errors
+def get_batch_status_from_db(
+    identifier: str, session: Session = Depends(get_db_session)
+):
+    """
+    Retrieve the aggregate progress of a batch and the status of its tasks.
+
+    The progress is the share of the audio duration of the batch whose tasks are
+    finished (completed or failed).
+
+    Args:
+        identifier (str): Identifier of the batch.
+        session (Session, optional): Database session. Defaults to Depends(get_db_session).
+
+    Returns:
+        BatchResult: Progress of the batch, or None if the batch does not exist.
+    """
+    if session.query(Batch).filter(Batch.uuid == identifier).first() is None:
+        return None
+    tasks = (
+        session.query(
+            Task.uuid, Task.file_name, Task.status, Task.error, Task.audio_duration
+        )
+        .filter(Task.batch_id == identifier)
+        .order_by(Task.id)
+        .all()
+    )
+    counts = {}
+    total_seconds = finished_seconds = 0.0
+    for task in tasks:
+        counts[task.status] = counts.get(task.status, 0) + 1
+        seconds = task.audio_duration or DEFAULT_AUDIO_SECONDS
+        total_seconds += seconds
+        if task.status in (TaskStatus.completed.value, TaskStatus.failed.value):
+            finished_seconds += seconds
+    return BatchResult(
+        identifier=identifier,
+        status=_batch_status(counts, len(tasks)),
+        progress=finished_seconds / total_seconds if total_seconds else 1.0,
+        total=len(tasks),
+        counts=counts,
+        tasks=[
+            BatchTask(
+                identifier=task.uuid,
+                file_name=task.file_name,
+                status=task.status,
+                error=task.error,
+            )
+            for task in tasks
+        ],
+    )
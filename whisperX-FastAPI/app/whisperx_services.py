@@ -1,23 +1,41 @@
 """This module provides services for transcribing, diarizing, and aligning audio using Whisper and other models."""
 
 import gc
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
 from datetime import datetime
 
-import torch
 from fastapi import Depends
 from sqlalchemy.orm import Session
-from whisperx.diarize import DiarizationPipeline
-from whisperx import (
-    align,
-    assign_word_speakers,
-    load_align_model,
-    load_model,
-)
 
+from .artifact_cache import artifact_cache, stage_key
+from .audio import SAMPLE_RATE, synthetic_clip
+from .chunked_transcription import long_audio_enabled, transcribe_long_audio
 from .config import Config
 from .db import get_db_session
 from .logger import logger  # Import the logger from the new module
-from .schemas import AlignedTranscription, SpeechToTextProcessingParams, TaskStatus
+from .metrics import TaskMetrics, current_task_metrics
+from .model_cache import (
+    DIARIZATION_PIPELINE_MB,
+    align_models,
+    diarization_pipelines,
+    estimate_align_model_mb,
+    estimate_whisper_model_mb,
+    freeze,
+    whisper_models,
+)
+from .progress import current_task_progress, reporting
+from .safe_globals import enable_checkpoint_safe_globals
+from .schemas import (
+    AlignedTranscription,
+    ASROptions,
+    SpeechToTextProcessingParams,
+    TaskStatus,
+    VADOptions,
+    WhisperModelParams,
+    query_defaults,
+)
 from .tasks import update_task_status_in_db
 from .transcript import filter_aligned_transcription
 
@@ -28,10 +46,179 @@ device = Config.DEVICE
 compute_type = Config.COMPUTE_TYPE
 
 
+# =============================================================================
+# Whisper-X entry points
+# =============================================================================
+# whisperx, pyannote and torch take seconds to import, so they are imported by the
+# first task that needs a model rather than when the API starts.
+
+
+def load_model(*args, **kwargs):
+    """Load a Whisper-X ASR pipeline, see ``whisperx.load_model``."""
+    enable_checkpoint_safe_globals()
+    from whisperx import load_model as whisperx_load_model
+
+    return whisperx_load_model(*args, **kwargs)
+
+
+def load_align_model(*args, **kwargs):
+    """Load an alignment model, see ``whisperx.load_align_model``."""
+    enable_checkpoint_safe_globals()
+    from whisperx import load_align_model as whisperx_load_align_model
+
+    return whisperx_load_align_model(*args, **kwargs)
+
+
+def DiarizationPipeline(*args, **kwargs):
+    """Load the pyannote diarization pipeline, see ``whisperx.diarize.DiarizationPipeline``."""
+    enable_checkpoint_safe_globals()
+    from whisperx.diarize import DiarizationPipeline as WhisperxDiarizationPipeline
+
+    return WhisperxDiarizationPipeline(*args, **kwargs)
+
+
+def align(*args, **kwargs):
+    """Align a transcript to the audio, see ``whisperx.align``."""
+    from whisperx import align as whisperx_align
+
+    return whisperx_align(*args, **kwargs)
+
+
+def assign_word_speakers(*args, **kwargs):
+    """Assign speakers to the words of a transcript, see ``whisperx.assign_word_speakers``."""
+    from whisperx import assign_word_speakers as whisperx_assign_word_speakers
+
+    return whisperx_assign_word_speakers(*args, **kwargs)
+
+
+class _MeasuredVad:
+    """Records the calls of a VAD model as the ``vad`` stage of the task running on the thread."""
+
+    def __call__(self, *args, **kwargs):
+        metrics = current_task_metrics()
+        if metrics is None:
+            return super().__call__(*args, **kwargs)
+        return metrics.measure("vad", super().__call__, *args, **kwargs)
+
+
+def measure_vad(whisper_model):
+    """
+    Make the VAD model of an ASR pipeline record its runs in the metrics of the running task.
+
+    The class of the VAD model is replaced by a subclass, so the pipeline and
+    ``segment_batching.detect_speech`` still recognize it as a whisperx ``Vad``.
+
+    Args:
+        whisper_model: Pipeline returned by ``load_model``.
+
+    Returns:
+        The same pipeline.
+    """
+    from whisperx.vads import Vad
+
+    vad_model = getattr(whisper_model, "vad_model", None)
+    if isinstance(vad_model, Vad) and not isinstance(vad_model, _MeasuredVad):
+        vad_class = type(vad_model)
+        vad_model.__class__ = type(vad_class.__name__, (_MeasuredVad, vad_class), {})
+    return whisper_model
+
+
 # =============================================================================
 # ASR – Whisper
 # =============================================================================
 
+
+def _whisper_model(
+    model,
+    device,
+    device_index,
+    compute_type,
+    language,
+    task,
+    asr_options,
+    vad_options,
+    threads,
+):
+    """Return the registry key, loader and estimated size of a Whisper-X pipeline."""
+    cache_key = (
+        model.value,
+        freeze(device),
+        device_index,
+        freeze(compute_type),
+        language,
+        task,
+        freeze(asr_options),
+        freeze(vad_options),
+        threads,
+    )
+
+    def load():
+        return measure_vad(
+            load_model(
+                model.value,
+                device,
+                device_index=device_index,
+                compute_type=compute_type,
+                asr_options=asr_options,
+                vad_options=vad_options,
+                language=language,
+                task=task,
+                threads=threads,
+            )
+        )
+
+    return cache_key, load, estimate_whisper_model_mb(model, compute_type)
+
+
+def detect_language_with_whisper(
+    audio,
+    task,
+    asr_options,
+    vad_options,
+    model: str = WHISPER_MODEL,
+    device: str = device,
+    device_index: int = 0,
+    compute_type: str = compute_type,
+    threads: int = 0,
+) -> str:
+    """
+    Detect the language of the first 30 seconds of audio.
+
+    The pipeline is the one ``transcribe_with_whisper`` uses with ``model_language=False``,
+    so detecting the language does not load a second model.
+
+    Args:
+        audio (np.ndarray): The waveform, of which the first 30 seconds are used.
+        task (str): Task of the pipeline, ``transcribe`` or ``translate``.
+        asr_options (dict): ASR options of the pipeline.
+        vad_options (dict): VAD options of the pipeline.
+        model (str): Name of the Whisper model.
+        device (str): Device the model runs on.
+        device_index (int): Index of the device.
+        compute_type (str): Computation type of the model.
+        threads (int): CPU threads of the model, 0 for the default.
+
+    Returns:
+        str: The language code.
+    """
+    faster_whisper_threads = threads if threads > 0 else 4
+    cache_key, load, size_mb = _whisper_model(
+        model,
+        device,
+        device_index,
+        compute_type,
+        None,
+        task,
+        asr_options,
+        vad_options,
+        faster_whisper_threads,
+    )
+    with whisper_models.use(
+        cache_key, load, device=device, size_mb=size_mb
+    ) as whisper_model:
+        return whisper_model.detect_language(audio)
+
+
 def transcribe_with_whisper(
     audio,
     task,
@@ -45,8 +232,23 @@ def transcribe_with_whisper(
     device_index: int = 0,
     compute_type: str = compute_type,
     threads: int = 0,
+    allow_chunking: bool = True,
+    model_language: bool = True,
 ):
-    """Transcribe an audio file using the Whisper model and Whisper‑X wrapper."""
+    """
+    Transcribe an audio file using a cached Whisper model and the Whisper‑X wrapper.
+
+    Long recordings on CPU are split into windows that are transcribed in parallel
+    worker processes (see ``chunked_transcription``) unless ``allow_chunking`` is False.
+    Segments are reported to the progress of the task running on the thread as soon
+    as their text is decoded.
+
+    With ``model_language`` False, the pipeline is loaded without a language and the
+    language is passed per call, so one pipeline serves all languages. This is only
+    safe where a pipeline is never used by two threads at once, as in the worker
+    processes of the long-audio mode.
+    """
+    import torch
 
     logger.debug(
         "Starting transcription with Whisper model: %s on device: %s",
@@ -70,8 +272,28 @@ def transcribe_with_whisper(
     if language == "auto":
         language = None
 
+    # The ASR of a task reports its segments to the progress as soon as they are final
+    progress = current_task_progress()
+    report = progress.add_segments if progress is not None else None
+
+    if allow_chunking and long_audio_enabled(len(audio) / SAMPLE_RATE, device):
+        return transcribe_long_audio(
+            audio,
+            report=report,
+            task=task,
+            asr_options=asr_options,
+            vad_options=vad_options,
+            language=language,
+            batch_size=batch_size,
+            chunk_size=chunk_size,
+            model=model,
+            device=device,
+            device_index=device_index,
+            compute_type=compute_type,
+        )
+
     logger.debug(
-        "Loading model with config - model: %s, device: %s, compute_type: %s, threads: %d, task: %s, language: %s",
+        "Using model with config - model: %s, device: %s, compute_type: %s, threads: %d, task: %s, language: %s",
         model.value,
         device,
         compute_type,
@@ -79,24 +301,60 @@ def transcribe_with_whisper(
         task,
         language,
     )
-    model = load_model(
-        model.value,
+    cache_key, load, size_mb = _whisper_model(
+        model,
         device,
-        device_index=device_index,
-        compute_type=compute_type,
-        asr_options=asr_options,
-        vad_options=vad_options,
-        language=language,
-        task=task,
-        threads=faster_whisper_threads,
-    )
-    logger.debug("Transcription model loaded successfully")
-
-    result = model.transcribe(
-        audio=audio, batch_size=batch_size, chunk_size=chunk_size, language=language
+        device_index,
+        compute_type,
+        language if model_language else None,
+        task,
+        asr_options,
+        vad_options,
+        faster_whisper_threads,
     )
-
-    # Clean up GPU/CPU RAM
+    from . import segment_batching
+
+    # Batching and reporting segments per forward reuse internals of the whisperx
+    # pipeline, which are only relied on for the releases they were written for
+    internals = segment_batching.PIPELINE_INTERNALS_SUPPORTED
+    if Config.ASR_BATCHING and internals:
+        result = segment_batching.transcribe_batched(
+            audio,
+            cache_key,
+            load,
+            device,
+            size_mb,
+            language=language,
+            task=task,
+            batch_size=batch_size,
+            chunk_size=chunk_size,
+            report=report,
+        )
+    else:
+        with whisper_models.use(
+            cache_key, load, device=device, size_mb=size_mb
+        ) as whisper_model:
+            if report is None or not internals:
+                # Segments are reported to the progress once the transcription returns
+                result = whisper_model.transcribe(
+                    audio=audio,
+                    batch_size=batch_size,
+                    chunk_size=chunk_size,
+                    language=language,
+                )
+            else:
+                # The pipeline only returns once all segments are decoded
+                result = segment_batching.transcribe_segments(
+                    whisper_model,
+                    audio,
+                    language=language,
+                    task=task,
+                    batch_size=batch_size,
+                    chunk_size=chunk_size,
+                    report=report,
+                )
+
+    # Release intermediate buffers, the model itself stays resident in the cache
     if torch.cuda.is_available():
         logger.debug(
             "GPU memory before cleanup: %.2f MB, available: %.2f MB",
@@ -106,7 +364,6 @@ def transcribe_with_whisper(
 
     gc.collect()
     torch.cuda.empty_cache()
-    del model
 
     if torch.cuda.is_available():
         logger.debug(
@@ -119,24 +376,114 @@ def transcribe_with_whisper(
     return result
 
 
+def warm_up_whisper(
+    language: str = None,
+    model: str = WHISPER_MODEL,
+    device: str = device,
+    compute_type: str = None,
+) -> float:
+    """
+    Load a Whisper model as a request with default options would, and run it on a synthetic clip.
+
+    The model is cached under the same key as for such requests, so their first task
+    finds it loaded. Without ``language``, the clip also runs through the encoder and
+    decoder for language detection.
+
+    Args:
+        language (str, optional): Language of the requests to warm up for.
+        model (str): Name of the Whisper model.
+        device (str): Device to load the model on.
+        compute_type (str, optional): Computation type of the model, defaults to the
+            calibrated one of the host.
+
+    Returns:
+        float: Seconds the warm-up took.
+    """
+    start = time.perf_counter()
+    params = WhisperModelParams(
+        **{
+            **query_defaults(WhisperModelParams),
+            "language": language,
+            "model": model,
+            "device": device,
+            "compute_type": compute_type,
+        }
+    )
+    transcribe_with_whisper(
+        synthetic_clip(),
+        task=params.task.value,
+        asr_options=ASROptions(**query_defaults(ASROptions)),
+        vad_options=VADOptions(**query_defaults(VADOptions)),
+        language=params.language,
+        batch_size=params.batch_size,
+        chunk_size=params.chunk_size,
+        model=params.model,
+        device=params.device,
+        device_index=params.device_index,
+        compute_type=params.compute_type,
+        threads=params.threads,
+        allow_chunking=False,
+    )
+    seconds = time.perf_counter() - start
+    logger.info(
+        "Whisper model %s on %s is warm (%.2fs)", params.model.value, device, seconds
+    )
+    return seconds
+
+
 # =============================================================================
 # Diarization helper
 # =============================================================================
 
+def _use_diarization_pipeline(device):
+    """Return a context manager providing the long-lived pyannote pipeline for a device."""
+    return diarization_pipelines.use(
+        freeze(device),
+        lambda: DiarizationPipeline(use_auth_token=HF_TOKEN, device=device),
+        device=device,
+        size_mb=DIARIZATION_PIPELINE_MB,
+    )
+
+
+def warm_up_diarization(device: str = device, audio=None) -> float:
+    """
+    Load the diarization pipeline for a device ahead of the first request.
+
+    Args:
+        device (str): Device to load the pipeline on.
+        audio (np.ndarray, optional): Clip the pipeline is run on once loaded.
+
+    Returns:
+        float: Seconds the initial load took (0 if the pipeline was already loaded).
+    """
+    with _use_diarization_pipeline(device) as model:
+        if audio is not None:
+            model(audio=audio)
+    load_seconds = diarization_pipelines.load_seconds(freeze(device))
+    logger.info(
+        "Diarization pipeline for %s is warm (loaded in %.2fs)", device, load_seconds
+    )
+    return load_seconds
+
+
 def diarize(audio, device: str = device, min_speakers=None, max_speakers=None):
-    """Run speaker diarization with pyannote pipeline."""
+    """Run speaker diarization with the long-lived pyannote pipeline of the device."""
+    import torch
 
     logger.debug("Starting diarization with device: %s", device)
 
     if torch.cuda.is_available():
         logger.debug(
-            "GPU memory before loading model - used: %.2f MB, available: %.2f MB",
+            "GPU memory before diarization - used: %.2f MB, available: %.2f MB",
             torch.cuda.memory_allocated() / 1024 ** 2,
             torch.cuda.get_device_properties(0).total_memory / 1024 ** 2,
         )
 
-    model = DiarizationPipeline(use_auth_token=HF_TOKEN, device=device)
-    result = model(audio=audio, min_speakers=min_speakers, max_speakers=max_speakers)
+    # pyannote pipelines are not re-entrant, the registry serialises access per device
+    with _use_diarization_pipeline(device) as model:
+        result = model(
+            audio=audio, min_speakers=min_speakers, max_speakers=max_speakers
+        )
 
     # Clean up
     if torch.cuda.is_available():
@@ -148,7 +495,6 @@ def diarize(audio, device: str = device, min_speakers=None, max_speakers=None):
 
     gc.collect()
     torch.cuda.empty_cache()
-    del model
 
     if torch.cuda.is_available():
         logger.debug(
@@ -165,6 +511,56 @@ def diarize(audio, device: str = device, min_speakers=None, max_speakers=None):
 # Alignment helper
 # =============================================================================
 
+def _use_align_model(language_code, device, align_model: str | None = None):
+    """Return a context manager providing the cached (align_model, metadata) pair."""
+
+    def load():
+        return load_align_model(
+            language_code=language_code, device=device, model_name=align_model
+        )
+
+    return align_models.use(
+        (language_code, align_model, freeze(device)),
+        load,
+        device=device,
+        size_mb=estimate_align_model_mb(language_code, align_model),
+    )
+
+
+def warm_up_align_models(languages, device: str = device, audio=None) -> list:
+    """
+    Preload the default alignment models of the given languages into the cache.
+
+    Args:
+        languages (list): Language codes.
+        device (str): Device to load the models on.
+        audio (np.ndarray, optional): Clip each model aligns a one-word transcript to.
+
+    Returns:
+        list: Language codes whose model could not be loaded.
+    """
+    failed = []
+    for language_code in languages:
+        try:
+            if audio is None:
+                with _use_align_model(language_code, device):
+                    pass
+            else:
+                align_whisper_output(
+                    [{"text": "hello", "start": 0.0, "end": len(audio) / SAMPLE_RATE}],
+                    audio,
+                    language_code,
+                    device,
+                )
+            logger.info("Alignment model for '%s' is warm", language_code)
+        except (RuntimeError, ValueError, OSError) as exc:
+            logger.error(
+                "Could not warm up alignment model for '%s': %s", language_code, exc
+            )
+            failed.append(language_code)
+    return failed
+
+
 def align_whisper_output(
     transcript,
     audio,
@@ -174,7 +570,8 @@ def align_whisper_output(
     interpolate_method: str = "nearest",
     return_char_alignments: bool = False,
 ):
-    """Align the transcript to the original audio using Whisper‑X aligner."""
+    """Align the transcript to the original audio using a cached Whisper‑X aligner."""
+    import torch
 
     logger.debug("Starting alignment for language code: %s on device: %s", language_code, device)
 
@@ -186,25 +583,26 @@ def align_whisper_output(
         )
 
     logger.debug(
-        "Loading align model with config - language_code: %s, device: %s, interpolate_method: %s, return_char_alignments: %s",
+        "Using align model with config - language_code: %s, device: %s, interpolate_method: %s, return_char_alignments: %s",
         language_code,
         device,
         interpolate_method,
         return_char_alignments,
     )
-    align_model_obj, align_metadata = load_align_model(
-        language_code=language_code, device=device, model_name=align_model
-    )
 
-    result = align(
-        transcript,
+    with _use_align_model(language_code, device, align_model) as (
         align_model_obj,
         align_metadata,
-        audio,
-        device,
-        interpolate_method=interpolate_method,
-        return_char_alignments=return_char_alignments,
-    )
+    ):
+        result = align(
+            transcript,
+            align_model_obj,
+            align_metadata,
+            audio,
+            device,
+            interpolate_method=interpolate_method,
+            return_char_alignments=return_char_alignments,
+        )
 
     if torch.cuda.is_available():
         logger.debug(
@@ -215,8 +613,6 @@ def align_whisper_output(
 
     gc.collect()
     torch.cuda.empty_cache()
-    del align_model_obj
-    del align_metadata
 
     if torch.cuda.is_available():
         logger.debug(
@@ -233,32 +629,178 @@ def align_whisper_output(
 # End‑to‑end processing
 # =============================================================================
 
-def process_audio_common(
-    params: SpeechToTextProcessingParams, session: Session = Depends(get_db_session)
-):
-    """Full pipeline: VAD → ASR → Alignment → Diarization → DB update."""
+# Diarization of full_process tasks runs here, next to ASR and alignment
+diarization_executor = ThreadPoolExecutor(
+    max_workers=Config.DIARIZATION_WORKERS, thread_name_prefix="diarization"
+)
 
-    try:
-        start_time = datetime.now()
-        logger.info("Starting speech‑to‑text processing for identifier: %s", params.identifier)
 
-        logger.debug(
-            "Transcription parameters - task: %s, language: %s, batch_size: %d, chunk_size: %d, model: %s, device: %s, device_index: %d, compute_type: %s, threads: %d",
-            params.whisper_model_params.task,
-            params.whisper_model_params.language,
-            params.whisper_model_params.batch_size,
-            params.whisper_model_params.chunk_size,
-            params.whisper_model_params.model,
-            params.whisper_model_params.device,
-            params.whisper_model_params.device_index,
-            params.whisper_model_params.compute_type,
-            params.whisper_model_params.threads,
+def cached(stage: str, key, func, /, *args, **kwargs):
+    """
+    Return the cached output of a stage, running ``func`` and caching its output on a miss.
+
+    Args:
+        stage (str): Name of the stage.
+        key (str): Artifact cache key of the output, None to always run ``func``.
+        func (callable): The stage to run.
+        *args: Positional arguments of ``func``.
+        **kwargs: Keyword arguments of ``func``.
+
+    Returns:
+        The output of the stage.
+    """
+    if key is None:
+        return func(*args, **kwargs)
+    output = artifact_cache.get(stage, key)
+    if output is not None:
+        logger.info("Reusing cached %s output", stage)
+        return output
+    output = func(*args, **kwargs)
+    artifact_cache.put(stage, key, output)
+    return output
+
+
+def stage_keys(params: SpeechToTextProcessingParams) -> dict:
+    """
+    Return the artifact cache keys of the stages of a speech-to-text run.
+
+    Each key covers the audio and only the parameters that change the output of
+    its stage. The alignment key includes the transcription key, as the aligned
+    transcript depends on the raw one.
+
+    Args:
+        params (SpeechToTextProcessingParams): Parameters of the run.
+
+    Returns:
+        dict: Keys by stage, empty if the hash of the audio is unknown.
+    """
+    if not params.audio_hash:
+        return {}
+    model_params = params.whisper_model_params
+    transcription = stage_key(
+        params.audio_hash,
+        "transcription",
+        model=model_params.model,
+        compute_type=model_params.compute_type,
+        language=model_params.language,
+        task=model_params.task,
+        chunk_size=model_params.chunk_size,
+        asr_options=params.asr_options,
+        vad_options=params.vad_options,
+    )
+    return {
+        "transcription": transcription,
+        "alignment": stage_key(
+            params.audio_hash,
+            "alignment",
+            transcription=transcription,
+            alignment=params.alignment_params,
+        ),
+        "diarization": stage_key(
+            params.audio_hash, "diarization", diarization=params.diarization_params
+        ),
+    }
+
+
+def _draft_pass(params: SpeechToTextProcessingParams, session: Session):
+    """
+    Transcribe with the small draft model and store the segments as provisional result.
+
+    The draft is neither aligned nor diarized; it only lets clients work with the text
+    while the full pass runs. A failing draft is logged and does not fail the task.
+
+    Args:
+        params (SpeechToTextProcessingParams): Parameters of the run.
+        session (Session): Database session.
+    """
+    draft_model = params.draft_params.draft_model
+    model_params = params.whisper_model_params
+    try:
+        # Stages and segments of the draft model are not those of the task
+        with TaskMetrics().recording(), reporting(None):
+            draft = transcribe_with_whisper(
+                audio=params.audio,
+                task=model_params.task.value,
+                asr_options=params.asr_options,
+                vad_options=params.vad_options,
+                language=model_params.language,
+                batch_size=model_params.batch_size,
+                chunk_size=model_params.chunk_size,
+                model=draft_model,
+                device=model_params.device,
+                device_index=model_params.device_index,
+                compute_type=model_params.compute_type,
+                threads=model_params.threads,
+            )
+    except Exception:
+        logger.warning(
+            "Draft pass failed for identifier %s", params.identifier, exc_info=True
         )
+        return
+    update_task_status_in_db(
+        identifier=params.identifier,
+        update_data={
+            "draft_result": {
+                "model": draft_model.value,
+                "language": draft.get("language"),
+                "segments": [
+                    {
+                        "start": segment["start"],
+                        "end": segment["end"],
+                        "text": segment["text"],
+                    }
+                    for segment in draft["segments"]
+                ],
+            }
+        },
+        session=session,
+    )
+    logger.info(
+        "Stored draft of identifier %s (%d segments)",
+        params.identifier,
+        len(draft["segments"]),
+    )
 
-        # ------------------------------------------------------------------
-        # 1) Whisper‑X ASR
-        # ------------------------------------------------------------------
-        segments_before_alignment = transcribe_with_whisper(
+
+def _transcribe_and_align(
+    params: SpeechToTextProcessingParams,
+    keys: dict,
+    metrics: TaskMetrics,
+    session: Session,
+):
+    """Run the draft pass and ASR (or take it from the cache) and align the result to the audio."""
+    draft_params = params.draft_params
+    if (
+        draft_params is not None
+        and draft_params.draft_model is not None
+        and draft_params.draft_model != params.whisper_model_params.model
+    ):
+        metrics.measure("draft", _draft_pass, params, session)
+
+    logger.debug(
+        "Transcription parameters - task: %s, language: %s, batch_size: %d, chunk_size: %d, model: %s, device: %s, device_index: %d, compute_type: %s, threads: %d",
+        params.whisper_model_params.task,
+        params.whisper_model_params.language,
+        params.whisper_model_params.batch_size,
+        params.whisper_model_params.chunk_size,
+        params.whisper_model_params.model,
+        params.whisper_model_params.device,
+        params.whisper_model_params.device_index,
+        params.whisper_model_params.compute_type,
+        params.whisper_model_params.threads,
+    )
+
+    # ------------------------------------------------------------------
+    # 1) Whisper‑X ASR
+    # ------------------------------------------------------------------
+    # The VAD of the pipeline records itself as a stage of its own, run on this thread
+    with metrics.recording():
+        segments_before_alignment = metrics.measure(
+            "transcription",
+            cached,
+            "transcription",
+            keys.get("transcription"),
+            transcribe_with_whisper,
             audio=params.audio,
             task=params.whisper_model_params.task.value,
             asr_options=params.asr_options,
@@ -272,38 +814,52 @@ def process_audio_common(
             compute_type=params.whisper_model_params.compute_type,
             threads=params.whisper_model_params.threads,
         )
+    if metrics.progress is not None:
+        metrics.progress.complete_segments(segments_before_alignment["segments"])
 
-        # erkannte Sprache übernehmen -------------------------------------------------
-        detected_lang: str | None = segments_before_alignment.get("language")
-        if detected_lang:
-            params.whisper_model_params.language = detected_lang  # kosmetisch
-            logger.debug("Detected language: %s", detected_lang)
-        else:
-            logger.debug("No language detected (value was %s)", detected_lang)
+    detected_lang: str | None = segments_before_alignment.get("language")
+
+    # ------------------------------------------------------------------
+    # 2) Alignment
+    # ------------------------------------------------------------------
+    logger.debug(
+        "Alignment parameters - align_model: %s, interpolate_method: %s, return_char_alignments: %s, language_code: %s",
+        params.alignment_params.align_model,
+        params.alignment_params.interpolate_method,
+        params.alignment_params.return_char_alignments,
+        detected_lang,
+    )
+    segments_transcript = metrics.measure(
+        "alignment",
+        align_whisper_output,
+        transcript=segments_before_alignment["segments"],
+        audio=params.audio,
+        language_code=detected_lang,
+        align_model=params.alignment_params.align_model,
+        interpolate_method=params.alignment_params.interpolate_method,
+        return_char_alignments=params.alignment_params.return_char_alignments,
+    )
+    return {"language": detected_lang, "transcript": segments_transcript}
 
-        # ------------------------------------------------------------------
-        # 2) Alignment
-        # ------------------------------------------------------------------
-        logger.debug(
-            "Alignment parameters - align_model: %s, interpolate_method: %s, return_char_alignments: %s, language_code: %s",
-            params.alignment_params.align_model,
-            params.alignment_params.interpolate_method,
-            params.alignment_params.return_char_alignments,
-            detected_lang,
-        )
-        segments_transcript = align_whisper_output(
-            transcript=segments_before_alignment["segments"],
-            audio=params.audio,
-            language_code=detected_lang,
-            align_model=params.alignment_params.align_model,
-            interpolate_method=params.alignment_params.interpolate_method,
-            return_char_alignments=params.alignment_params.return_char_alignments,
-        )
-        transcript = AlignedTranscription(**segments_transcript)
-        transcript = filter_aligned_transcription(transcript).model_dump()
+
+def process_audio_common(
+    params: SpeechToTextProcessingParams, session: Session = Depends(get_db_session)
+):
+    """Full pipeline: ([Draft →] VAD → ASR → Alignment ‖ Diarization) → speaker assignment → DB update."""
+
+    diarization_future = None
+    try:
+        start_time = datetime.now()
+        logger.info("Starting speech‑to‑text processing for identifier: %s", params.identifier)
+        # The job queue measures decoding the audio before the pipeline runs
+        metrics = current_task_metrics() or TaskMetrics()
+        metrics.audio_seconds = len(params.audio) / SAMPLE_RATE
+        if metrics.progress is not None:
+            metrics.progress.audio_seconds = metrics.audio_seconds
+        keys = stage_keys(params)
 
         # ------------------------------------------------------------------
-        # 3) Diarization + merge
+        # 0) Diarization only needs the audio, it runs next to ASR and alignment
         # ------------------------------------------------------------------
         logger.debug(
             "Diarization parameters - device: %s, min_speakers: %s, max_speakers: %s",
@@ -311,15 +867,54 @@ def process_audio_common(
             params.diarization_params.min_speakers,
             params.diarization_params.max_speakers,
         )
-        diarization_segments = diarize(
+        diarization_future = diarization_executor.submit(
+            metrics.measure,
+            "diarization",
+            cached,
+            "diarization",
+            keys.get("diarization"),
+            diarize,
             params.audio,
             device=params.whisper_model_params.device,
             min_speakers=params.diarization_params.min_speakers,
             max_speakers=params.diarization_params.max_speakers,
         )
 
+        # ------------------------------------------------------------------
+        # 1+2) Draft, ASR and alignment, skipped entirely if the aligned transcript is cached
+        # ------------------------------------------------------------------
+        aligned = cached(
+            "alignment",
+            keys.get("alignment"),
+            _transcribe_and_align,
+            params,
+            keys,
+            metrics,
+            session,
+        )
+
+        # erkannte Sprache übernehmen -------------------------------------------------
+        detected_lang: str | None = aligned["language"]
+        if detected_lang:
+            params.whisper_model_params.language = detected_lang  # kosmetisch
+            logger.debug("Detected language: %s", detected_lang)
+        else:
+            logger.debug("No language detected (value was %s)", detected_lang)
+
+        segments_transcript = aligned["transcript"]
+        transcript = AlignedTranscription(**segments_transcript)
+        transcript = filter_aligned_transcription(transcript).model_dump()
+
+        # ------------------------------------------------------------------
+        # 3) Join diarization + merge
+        # ------------------------------------------------------------------
+        with metrics.stage("diarization_wait"):
+            diarization_segments = diarization_future.result()
+
         logger.debug("Combining transcript with diarization results")
-        result = assign_word_speakers(diarization_segments, transcript)
+        result = metrics.measure(
+            "speaker_assignment", assign_word_speakers, diarization_segments, transcript
+        )
 
         for segment in result["segments"]:
             del segment["words"]
@@ -330,7 +925,15 @@ def process_audio_common(
         # ------------------------------------------------------------------
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
-        logger.info("Completed speech‑to‑text for identifier %s (%.2fs)", params.identifier, duration)
+        logger.info(
+            "Completed speech‑to‑text for identifier %s (%.2fs, stages: %s)",
+            params.identifier,
+            duration,
+            ", ".join(
+                f"{stage} {values['seconds']:.2f}s"
+                for stage, values in metrics.stages.items()
+            ),
+        )
 
         # Assemble task_params dict with the now‑known language
         task_params = {
@@ -344,7 +947,9 @@ def process_audio_common(
         if detected_lang:
             task_params["language"] = detected_lang
 
-        update_task_status_in_db(
+        metrics.measure(
+            "db_write",
+            update_task_status_in_db,
             identifier=params.identifier,
             update_data={
                 "status": TaskStatus.completed,
@@ -352,11 +957,20 @@ def process_audio_common(
                 "language": detected_lang,
                 "task_params": task_params,
                 "duration": duration,
+                "metrics": metrics.as_dict(duration),
+                "draft_result": None,
+                "partial_segments": None,
                 "start_time": start_time,
                 "end_time": end_time,
             },
             session=session,
         )
+        # Only a write of its own can include the time of writing the result
+        update_task_status_in_db(
+            identifier=params.identifier,
+            update_data={"metrics": metrics.export(duration)},
+            session=session,
+        )
 
     # ----------------------------------------------------------------------
     # Error handling
@@ -379,3 +993,10 @@ def process_audio_common(
             update_data={"status": "failed", "error": str(exc)},
             session=session,
         )
+    finally:
+        # If ASR or alignment failed, diarization must not keep the GPU memory and
+        # its executor slot once the task is released
+        if diarization_future is not None and not diarization_future.done():
+            diarization_future.cancel()
+            with suppress(Exception):
+                diarization_future.result()
@@ -2,14 +2,21 @@
 
 import json
 import os
+import subprocess
+import sys
 import tempfile
 import time
 
 import pytest
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
 
 from app import main
-from app.db import engine
+from app.db import SessionLocal, engine
+from app.metrics import TaskMetrics
+from app.models import Batch, Task
+from app.routers import stt
+from app.tasks import add_task_to_db
 
 client = TestClient(main.app, follow_redirects=False)
 
@@ -72,6 +79,35 @@ def test_readiness_check():
     assert data["status"] == "ok"
     assert data["database"] == "connected"
     assert data["message"] == "Application is ready to accept requests"
+    assert set(data["queue"]) == {"queued", "running", "worker_slots"}
+    assert set(data["models"]) == {"asr", "alignment", "diarization"}
+
+
+def test_readiness_check_while_warming_up(monkeypatch):
+    """Test that the readiness check fails until the model warm-up has completed."""
+    monkeypatch.setattr(main.Config, "DIARIZATION_WARMUP", True)
+    monkeypatch.setattr(main.model_warmup, "state", "running")
+
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    data = response.json()
+    assert data["status"] == "warming_up"
+    assert data["warmup"]["state"] == "running"
+    assert "queue" in data
+
+
+def test_metrics_endpoint():
+    """Test that the stage histograms are exported in the Prometheus text format."""
+    TaskMetrics(audio_seconds=10).export(total_seconds=2)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE whisperx_stage_seconds histogram" in response.text
+    assert (
+        'whisperx_stage_real_time_factor_bucket{stage="total",le="0.2"}'
+        in response.text
+    )
 
 
 def test_readiness_check_with_db_failure(monkeypatch):
@@ -356,6 +392,89 @@ def test_combine():
     ) or result["segments"][0]["text"].lower().startswith(TRANSCRIPT_RESULT_2.lower())
 
 
+def test_speech_to_text_batch():
+    """Test the batch speech-to-text service with two files."""
+    with open(AUDIO_FILE, "rb") as first, open(AUDIO_FILE, "rb") as second:
+        response = client.post(
+            f"/speech-to-text-batch?device={os.getenv('DEVICE')}&compute_type={os.getenv('COMPUTE_TYPE')}",
+            files=[
+                ("files", ("audio_en.mp3", first)),
+                ("files", ("audio_en_copy.mp3", second)),
+            ],
+        )
+    assert response.status_code == 200
+    assert "Batch queued" in response.json()["message"]
+    assert len(response.json()["tasks"]) == 2
+
+    identifier = response.json()["identifier"]
+    for task_identifier in response.json()["tasks"]:
+        assert wait_for_task_completion(task_identifier), (
+            f"Task with identifier {task_identifier} did not complete within the expected time."
+        )
+
+    batch = client.get(f"/batch/{identifier}").json()
+    assert batch["status"] == "completed"
+    assert batch["progress"] == 1.0
+    assert batch["counts"] == {"completed": 2}
+
+
+def test_api_starts_without_loading_model_libraries():
+    """Test that importing the application does not import torch, whisperx or pyannote."""
+    script = (
+        "import sys, app.main; "
+        "print(sorted({'torch', 'whisperx', 'pyannote.audio'} & set(sys.modules)))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_rejected_batch_file_leaves_no_batch(monkeypatch):
+    """Test that a batch with a rejected upload creates no batch or tasks and removes the saved files."""
+    save_temporary_file = stt.save_temporary_file
+    saved = []
+
+    def save_or_reject(file, filename, **kwargs):
+        if saved:
+            raise HTTPException(status_code=413, detail="File too large")
+        saved.append(save_temporary_file(file, filename, **kwargs))
+        return saved[-1]
+
+    monkeypatch.setattr(stt, "save_temporary_file", save_or_reject)
+    with SessionLocal() as session:
+        counts = session.query(Batch).count(), session.query(Task).count()
+
+    with open(AUDIO_FILE, "rb") as first, open(AUDIO_FILE, "rb") as second:
+        response = client.post(
+            "/speech-to-text-batch?model=tiny&device=cpu&compute_type=int8",
+            files=[
+                ("files", ("audio_en.mp3", first)),
+                ("files", ("audio_en_large.mp3", second)),
+            ],
+        )
+
+    assert response.status_code == 413
+    with SessionLocal() as session:
+        assert (session.query(Batch).count(), session.query(Task).count()) == counts
+    assert not os.path.exists(saved[0][0])
+
+
+def test_batch_not_found():
+    """Test that unknown batch identifiers are reported."""
+    response = client.get("/batch/unknown")
+    assert response.status_code == 404
+
+
+def test_speech_to_text_path_outside_shared_roots():
+    """Test that paths outside the shared input roots are refused."""
+    response = client.post(
+        f"/speech-to-text-path?device={os.getenv('DEVICE')}&compute_type={os.getenv('COMPUTE_TYPE')}",
+        data={"path": os.path.abspath(AUDIO_FILE)},
+    )
+    assert response.status_code == 403
+
+
 # @pytest.mark.skipif(os.getenv("DEVICE") == "cpu", reason="Test requires GPU")
 def test_speech_to_text_url():
     """Test the speech-to-text service with a URL input."""
@@ -384,6 +503,28 @@ def test_speech_to_text_url():
     ) or seg_0_text.lower().startswith(TRANSCRIPT_RESULT_2.lower())
 
 
+def test_task_events_not_found():
+    """Test that events of unknown tasks are refused."""
+    response = client.get("/task/unknown/events")
+    assert response.status_code == 404
+
+
+def test_task_events_of_finished_task():
+    """Test that the event stream of a finished task sends its snapshot and ends."""
+    with SessionLocal() as session:
+        identifier = add_task_to_db(
+            status="completed", task_type="full_process", session=session
+        )
+
+    with client.stream("GET", f"/task/{identifier}/events") as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = response.read().decode()
+
+    assert body.startswith("event: snapshot\ndata: ")
+    assert json.loads(body.splitlines()[1][len("data: ") :])["status"] == "completed"
+
+
 def test_get_all_tasks_status():
     """Test retrieving the status of all tasks."""
     response = client.get("/task/all")
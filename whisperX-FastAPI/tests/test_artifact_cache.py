@@ -0,0 +1,94 @@
+"""Tests for the artifact_cache module."""
+
+import os
+
+import numpy as np
+import pytest
+
+from app.artifact_cache import ArtifactCache, file_sha256, stage_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Artifact cache in a temporary directory with a 1 MB limit."""
+    return ArtifactCache(str(tmp_path / "artifacts"), max_mb=1)
+
+
+def test_outputs_are_returned_on_the_next_lookup(cache):
+    """Stored outputs are found again and counted as hits."""
+    key = stage_key("abc", "transcription", model="tiny")
+
+    assert cache.get("transcription", key) is None
+    cache.put("transcription", key, {"segments": [{"text": "hello"}]})
+
+    assert cache.get("transcription", key) == {"segments": [{"text": "hello"}]}
+    stats = cache.stats()["stages"]["transcription"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_keys_depend_on_audio_and_stage_parameters():
+    """Keys differ for other audio or parameters, not for the order of parameters."""
+    key = stage_key("abc", "diarization", min_speakers=1, max_speakers=2)
+
+    assert key == stage_key("abc", "diarization", max_speakers=2, min_speakers=1)
+    assert key != stage_key("abc", "diarization", min_speakers=2, max_speakers=2)
+    assert key != stage_key("abd", "diarization", min_speakers=1, max_speakers=2)
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    """The cache stays within its size limit by dropping the oldest entries."""
+    payload = b"x" * 400 * 1024
+    for name in ("first", "second"):
+        cache.put("diarization", name, payload)
+    cache.get("diarization", "first")
+    cache.put("diarization", "third", payload)
+
+    assert cache.get("diarization", "second") is None
+    assert cache.get("diarization", "first") == payload
+    assert cache.get("diarization", "third") == payload
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["size_mb"] <= 1
+
+
+def test_entries_survive_a_restart(cache):
+    """A new cache on the same directory finds the stored entries."""
+    cache.put("alignment", "key", [1, 2, 3])
+
+    restarted = ArtifactCache(cache.directory, max_mb=1)
+
+    assert restarted.get("alignment", "key") == [1, 2, 3]
+    assert restarted.stats()["entries"] == 1
+
+
+def test_decoded_audio_is_restored_to_a_spill_file(cache, tmp_path):
+    """Cached decoded audio is provided without decoding the file again."""
+    spill = tmp_path / "meeting.mp3.f32"
+    samples = np.arange(1000, dtype=np.float32)
+    samples.tofile(spill)
+    cache.store_pcm("abc", str(spill))
+    os.remove(spill)
+
+    assert cache.restore_pcm("abc", str(spill))
+    assert np.array_equal(np.fromfile(spill, dtype=np.float32), samples)
+    assert not cache.restore_pcm("abd", str(tmp_path / "other.f32"))
+
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    """A size limit of 0 disables the cache."""
+    cache = ArtifactCache(str(tmp_path / "artifacts"), max_mb=0)
+    cache.put("transcription", "key", {"segments": []})
+
+    assert cache.get("transcription", "key") is None
+    assert not os.path.exists(cache.directory)
+
+
+def test_file_sha256(tmp_path):
+    """Files are hashed by their content."""
+    media = tmp_path / "audio.mp3"
+    media.write_bytes(b"audio")
+
+    assert file_sha256(str(media)) == (
+        "6ed8919ce20490a5e3ad8630a4fab69475297abd07db73918dd5f36fcfaeb11b"
+    )
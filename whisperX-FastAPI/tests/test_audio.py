@@ -0,0 +1,78 @@
+"""Tests for the audio module."""
+
+import shutil
+
+import numpy as np
+import pytest
+
+from app.audio import decode_audio, decoded_audio_path, probe_audio_duration
+
+requires_ffmpeg = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None, reason="Test requires ffmpeg"
+)
+
+
+def test_decoded_sidecar_provides_duration(tmp_path):
+    """The duration of already decoded audio is taken from the size of its file."""
+    media = tmp_path / "meeting.mp4"
+    media.write_bytes(b"not decodable")
+    samples = np.zeros(32000, dtype=np.float32)
+    samples.tofile(decoded_audio_path(str(media)))
+
+    assert probe_audio_duration(str(media)) == 2.0
+
+
+def test_probe_audio_duration_of_unreadable_file(tmp_path):
+    """Files ffprobe cannot read have no duration."""
+    media = tmp_path / "broken.mp3"
+    media.write_bytes(b"not audio")
+
+    assert probe_audio_duration(str(media)) is None
+
+
+@requires_ffmpeg
+def test_video_is_decoded_in_a_single_pass(tmp_path):
+    """Video files are decoded directly to 16 kHz float32 samples."""
+    output = tmp_path / "video.f32"
+
+    assert (
+        decode_audio("tests/test_files/SampleVideo_1280x720_1mb.flv", str(output))
+        is None
+    )
+    assert output.stat().st_size > 0
+    assert list(tmp_path.iterdir()) == [output]
+
+
+@requires_ffmpeg
+def test_decode_from_stream_matches_decode_from_path():
+    """Streaming a file to ffmpeg gives the same samples as reading it by path."""
+    path = "tests/test_files/audio_en.mp3"
+    with open(path, "rb") as stream:
+        from_stream = decode_audio(stream)
+
+    assert from_stream.dtype == np.float32
+    assert np.array_equal(from_stream, decode_audio(path))
+
+
+@requires_ffmpeg
+def test_decode_failure_raises_runtime_error(tmp_path):
+    """Undecodable input is reported as RuntimeError."""
+    broken = tmp_path / "broken.mp3"
+    broken.write_bytes(b"not audio")
+
+    with pytest.raises(RuntimeError):
+        decode_audio(str(broken))
+
+
+def test_shared_input_is_decoded_outside_its_root(tmp_path, monkeypatch):
+    """Decoded samples of files on a shared root are never written next to them."""
+    monkeypatch.setattr("app.config.Config.SHARED_INPUT_ROOTS", [str(tmp_path)])
+
+    pcm_file = decoded_audio_path(str(tmp_path / "meeting.mp3"))
+
+    assert not pcm_file.startswith(str(tmp_path))
+    assert pcm_file == decoded_audio_path(str(tmp_path / "." / "meeting.mp3"))
+    # Every task decodes a shared file into its own file
+    assert decoded_audio_path(str(tmp_path / "meeting.mp3"), "a") != decoded_audio_path(
+        str(tmp_path / "meeting.mp3"), "b"
+    )
@@ -0,0 +1,125 @@
+"""Tests for the benchmark module."""
+
+import csv
+import json
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from app import benchmark
+from app.benchmark import compare_reports, main, parse_args, run_benchmark
+
+TRANSCRIPT = {
+    "segments": [{"text": " hello", "start": 0.0, "end": 1.0}],
+    "language": "en",
+}
+ALIGNED = {
+    "segments": [{"text": " hello", "start": 0.0, "end": 1.0, "words": []}],
+    "word_segments": [],
+}
+
+
+@pytest.fixture
+def fake_models():
+    """Replace the models by instant fakes, in the benchmark and in the pipeline."""
+    with (
+        patch.object(
+            benchmark, "transcribe_with_whisper", return_value=TRANSCRIPT
+        ) as transcribe,
+        patch("app.whisperx_services.transcribe_with_whisper", return_value=TRANSCRIPT),
+        patch.object(benchmark, "align_whisper_output", return_value=ALIGNED),
+        patch("app.whisperx_services.align_whisper_output", return_value=ALIGNED),
+        patch.object(
+            benchmark, "diarize", side_effect=RuntimeError("No Hugging Face token")
+        ),
+        patch("app.whisperx_services.diarize", return_value=pd.DataFrame()),
+        patch(
+            "app.whisperx_services.assign_word_speakers",
+            side_effect=lambda diarization, transcript: transcript,
+        ),
+    ):
+        yield transcribe
+
+
+def test_sweep_reports_every_configuration(fake_models):
+    """Each ASR configuration and length gets a row, failing stages report their error."""
+    args = parse_args(
+        [
+            "--audio",
+            "synthetic",
+            "--lengths",
+            "5,10",
+            "--batch-sizes",
+            "4,8",
+            "--repeats",
+            "2",
+        ]
+    )
+
+    report = run_benchmark(args)
+
+    rows = report["rows"]
+    transcription = [row for row in rows if row["stage"] == "transcription"]
+    assert [(row["batch_size"], row["audio_seconds"]) for row in transcription] == [
+        (4, 5.0),
+        (4, 10.0),
+        (8, 5.0),
+        (8, 10.0),
+    ]
+    # One load run per model configuration, then two measured runs per row
+    assert fake_models.call_count == 1 + 4 * 2
+    assert all(
+        row["rtf"] == row["seconds"] / row["audio_seconds"] for row in transcription
+    )
+    assert {row["error"] for row in rows if row["stage"] == "diarization"} == {
+        "No Hugging Face token"
+    }
+    full = [row for row in rows if row["stage"] == "full"]
+    assert [row["error"] for row in full] == [None, None]
+    assert "db_write" in full[0]["stages"]
+    assert report["environment"]["audio"] == "synthetic"
+
+
+def test_report_files_and_regressions(fake_models, tmp_path):
+    """Reports are written as JSON and CSV, and slower runs than the baseline fail."""
+    output = tmp_path / "report"
+    argv = ["--audio", "synthetic", "--lengths", "5", "--batch-sizes", "8"]
+    argv += ["--stages", "transcription"]
+
+    assert main([*argv, "--output", str(output)]) == 0
+
+    with open(f"{output}.json") as file:
+        report = json.load(file)
+    with open(f"{output}.csv") as file:
+        assert [row["stage"] for row in csv.DictReader(file)] == ["transcription"]
+
+    # A baseline far faster than any run
+    report["rows"][0]["rtf"] = 1e-12
+    with open(tmp_path / "baseline.json", "w") as file:
+        json.dump(report, file)
+    assert (
+        main(
+            [
+                *argv,
+                "--output",
+                str(output),
+                "--compare",
+                str(tmp_path / "baseline.json"),
+            ]
+        )
+        == 1
+    )
+
+
+def test_compare_reports_tolerance():
+    """Runs within the tolerance, or missing in the baseline, are no regressions."""
+    row = dict.fromkeys(benchmark.KEY_COLUMNS)
+    row.update(stage="transcription", audio_seconds=30.0, rtf=0.105, error=None)
+    baseline = {"rows": [{**row, "rtf": 0.1}]}
+
+    assert compare_reports({"rows": [row]}, baseline, 0.1) == []
+    assert len(compare_reports({"rows": [{**row, "rtf": 0.2}]}, baseline, 0.1)) == 1
+    assert (
+        compare_reports({"rows": [{**row, "audio_seconds": 60.0}]}, baseline, 0.1) == []
+    )
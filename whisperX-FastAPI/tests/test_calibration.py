@@ -0,0 +1,110 @@
+"""Tests for the calibration module."""
+
+import itertools
+import json
+from unittest.mock import patch
+
+import pytest
+
+from app import benchmark, calibration
+from app.config import Config
+from app.schemas import WhisperModelParams, query_defaults
+
+
+@pytest.fixture
+def profile_path(tmp_path, monkeypatch):
+    """An empty location for the calibration profile."""
+    path = tmp_path / "calibration.json"
+    monkeypatch.setattr(Config, "CALIBRATION_PROFILE", str(path))
+    monkeypatch.setattr(calibration, "_cached", (None, None))
+    return path
+
+
+def write_profile(path, host=None, **defaults):
+    """Write a profile with the given CPU defaults."""
+    profile = {
+        "host": host or calibration.host_fingerprint(),
+        "defaults": {"cpu": {**calibration.static_defaults("cpu"), **defaults}},
+    }
+    path.write_text(json.dumps(profile))
+
+
+def request_params(**fields) -> WhisperModelParams:
+    """Return the parameters of a request setting only ``fields``."""
+    return WhisperModelParams(
+        **{**query_defaults(WhisperModelParams), "model": "tiny", **fields}
+    )
+
+
+def test_unset_fields_use_the_profile(profile_path):
+    """CPU requests get the calibrated values, explicit fields always win."""
+    write_profile(profile_path, batch_size=16, compute_type="float32", threads=6)
+
+    params = request_params(device="cpu", batch_size=4)
+
+    assert (params.batch_size, params.compute_type.value, params.threads) == (
+        4,
+        "float32",
+        6,
+    )
+    assert params.chunk_size == 20
+    # Stored parameters of queued tasks keep their values
+    assert WhisperModelParams.model_validate(params.model_dump()) == params
+
+
+def test_static_defaults_without_profile(profile_path):
+    """Without a profile, CPU requests use int8 and the cores of one worker slot."""
+    cpu = request_params(device="cpu")
+    cuda = request_params(device="cuda")
+
+    assert (cpu.compute_type.value, cpu.threads) == ("int8", calibration.host_threads())
+    assert (cuda.compute_type.value, cuda.batch_size) == ("float16", 8)
+
+
+def test_profile_of_another_host_is_ignored(profile_path):
+    """A profile calibrated on a different machine is not used."""
+    host = {**calibration.host_fingerprint(), "cpu_count": 1024}
+    write_profile(profile_path, host=host, batch_size=32)
+
+    assert calibration.load_profile() is None
+    assert request_params(device="cpu").batch_size == 8
+
+
+def test_calibrate_keeps_the_fastest_fitting_values(profile_path, monkeypatch):
+    """Each field takes its fastest candidate whose peak memory fits the host."""
+    monkeypatch.setattr(Config, "WORKER_SLOTS", 1)
+    monkeypatch.setattr(calibration, "host_memory_mb", lambda: 10000)
+    speed = {"float32": 1.0, "int8": 2.0, 4: 1.0, 8: 2.0, 16: 3.0, 32: 4.0}
+
+    def fake_benchmark(args, clips):
+        rows = []
+        for compute_type, batch_size, chunk_size in itertools.product(
+            args.compute_types, args.batch_sizes, args.chunk_sizes
+        ):
+            rows.append(
+                {
+                    "compute_type": compute_type,
+                    "batch_size": batch_size,
+                    "chunk_size": chunk_size,
+                    "threads": args.threads[0],
+                    "rtf": 1 / (speed[compute_type] * speed[batch_size] * chunk_size),
+                    # The largest batches do not fit into memory
+                    "peak_rss_mb": 9000 if batch_size == 32 else 1000,
+                }
+            )
+        return rows, {}
+
+    with (
+        patch.object(benchmark, "benchmark_transcription", side_effect=fake_benchmark),
+        patch.object(benchmark, "BUNDLED_AUDIO", "missing.mp3"),
+    ):
+        profile = calibration.calibrate(model="tiny", seconds=2)
+
+    assert profile["defaults"]["cpu"] == {
+        "batch_size": 16,
+        "chunk_size": 30,
+        "compute_type": "int8",
+        "threads": calibration.host_threads(),
+    }
+    assert calibration.load_profile()["defaults"] == profile["defaults"]
+    assert request_params(device="cpu").batch_size == 16
@@ -0,0 +1,115 @@
+"""Tests for the chunked_transcription module."""
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from app import chunked_transcription
+from app.chunked_transcription import (
+    find_split_points,
+    long_audio_enabled,
+    transcribe_long_audio,
+)
+from app.config import Config
+
+SAMPLE_RATE = 16000
+
+
+def speech_with_pauses(seconds: int, pauses: list) -> np.ndarray:
+    """Return noise of ``seconds`` length with one second of silence at ``pauses``."""
+    rng = np.random.default_rng(0)
+    audio = rng.uniform(-0.5, 0.5, seconds * SAMPLE_RATE).astype(np.float32)
+    for pause in pauses:
+        audio[pause * SAMPLE_RATE : (pause + 1) * SAMPLE_RATE] = 0.0
+    return audio
+
+
+@pytest.fixture
+def parallel(monkeypatch):
+    """Enable the long-audio mode with a thread pool standing in for worker processes."""
+    monkeypatch.setattr(Config, "LONG_AUDIO_PROCESSES", 3)
+    monkeypatch.setattr(Config, "LONG_AUDIO_WINDOW_SECONDS", 60)
+    pool = ThreadPoolExecutor(max_workers=3)
+    monkeypatch.setattr(chunked_transcription, "get_pool", lambda: pool)
+    yield
+    pool.shutdown()
+
+
+def test_split_points_fall_into_pauses():
+    """Windows are split in the silence closest to the nominal window end."""
+    audio = speech_with_pauses(300, pauses=[95, 197])
+
+    points = find_split_points(audio, 100 * SAMPLE_RATE, 10 * SAMPLE_RATE)
+
+    assert len(points) == 2
+    assert 95 * SAMPLE_RATE <= points[0] < 96 * SAMPLE_RATE
+    assert 197 * SAMPLE_RATE <= points[1] < 198 * SAMPLE_RATE
+
+
+def test_short_audio_is_not_split():
+    """Audio shorter than one and a half windows stays in one piece."""
+    assert (
+        find_split_points(np.zeros(140 * SAMPLE_RATE, np.float32), 100 * SAMPLE_RATE, 0)
+        == []
+    )
+
+
+def test_long_audio_mode_only_for_long_cpu_recordings(monkeypatch):
+    """The mode needs several processes, a CPU device and a long recording."""
+    monkeypatch.setattr(Config, "LONG_AUDIO_PROCESSES", 4)
+    monkeypatch.setattr(Config, "LONG_AUDIO_MIN_SECONDS", 1200)
+
+    assert long_audio_enabled(3600, "cpu")
+    assert not long_audio_enabled(600, "cpu")
+    assert not long_audio_enabled(3600, "cuda")
+    monkeypatch.setattr(Config, "LONG_AUDIO_PROCESSES", 1)
+    assert not long_audio_enabled(3600, "cpu")
+
+
+def test_windows_are_merged_with_shifted_timestamps(parallel, tmp_path):
+    """Segments of every window are shifted by the window start and kept in order."""
+    audio = speech_with_pauses(200, pauses=[59, 121])
+    spill = tmp_path / "audio.f32"
+    audio.tofile(spill)
+    mapped = np.memmap(spill, dtype=np.float32, mode="c")
+    calls = []
+
+    def fake_transcribe(audio, language, **kwargs):
+        calls.append(
+            (len(audio), language, kwargs["allow_chunking"], kwargs["model_language"])
+        )
+        return {
+            "segments": [{"start": 1.0, "end": 2.0, "text": f"{len(audio)}"}],
+            "language": language,
+        }
+
+    reports = []
+    with (
+        patch(
+            "app.whisperx_services.transcribe_with_whisper", side_effect=fake_transcribe
+        ),
+        patch(
+            "app.whisperx_services.detect_language_with_whisper", return_value="de"
+        ) as detect,
+    ):
+        result = transcribe_long_audio(
+            mapped, report=reports.append, language=None, task="transcribe"
+        )
+
+    assert result["language"] == "de"
+    # the language is detected once on the first 30 s, then three windows use it
+    assert len(detect.call_args.kwargs["audio"]) == 30 * 16000
+    assert "language" not in detect.call_args.kwargs
+    assert [call[1] for call in calls] == ["de", "de", "de"]
+    # the windows share one pipeline loaded without a language
+    assert not any(allow or model_language for _, _, allow, model_language in calls)
+    starts = [segment["start"] for segment in result["segments"]]
+    assert starts == sorted(starts)
+    assert starts[0] == 1.0
+    assert 60 < starts[1] < 61
+    assert 122 < starts[2] < 123
+    assert sum(int(segment["text"]) for segment in result["segments"]) == len(audio)
+    # each window is reported once transcribed, with the shifted timestamps
+    assert [window[0]["start"] for window in reports] == starts
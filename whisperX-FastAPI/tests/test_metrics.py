@@ -0,0 +1,155 @@
+"""Tests for the metrics module."""
+
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from whisperx.vads import Vad
+
+from app import metrics
+from app.metrics import Histogram, TaskMetrics, current_task_metrics
+from app.whisperx_services import measure_vad
+
+
+class FakeCuda:
+    """CUDA allocator statistics of torch, with the allocated memory set by the test."""
+
+    def __init__(self):
+        self.allocated = 0
+        self.peak = 0
+
+    def is_initialized(self):
+        return True
+
+    def allocate(self, megabytes):
+        self.allocated += megabytes * 1024**2
+        self.peak = max(self.peak, self.allocated)
+
+    def max_memory_allocated(self):
+        return self.peak
+
+    def reset_peak_memory_stats(self):
+        self.peak = self.allocated
+
+
+class FakeVad(Vad):
+    """VAD model returning no speech."""
+
+    def __init__(self):
+        pass
+
+    def __call__(self, audio):
+        return []
+
+
+def test_stage_records_time_and_memory():
+    """Stages get their wall time, peak RSS and real-time factor."""
+    task_metrics = TaskMetrics(audio_seconds=2.0)
+
+    with task_metrics.stage("decode"):
+        time.sleep(0.1)
+    assert task_metrics.measure("alignment", sum, [1, 2]) == 3
+
+    stages = task_metrics.as_dict(total_seconds=0.5)["stages"]
+    assert stages["decode"]["seconds"] >= 0.1
+    assert stages["decode"]["rtf"] == stages["decode"]["seconds"] / 2.0
+    assert stages["decode"]["peak_rss_mb"] > 0
+    assert stages["decode"]["gpu_peak_mb"] is None
+    assert stages["total"]["rtf"] == 0.25
+    assert stages["total"]["peak_rss_mb"] == max(
+        stages["decode"]["peak_rss_mb"], stages["alignment"]["peak_rss_mb"]
+    )
+
+
+def test_repeated_stage_adds_up():
+    """A stage measured several times sums its wall time."""
+    task_metrics = TaskMetrics()
+    for _ in range(2):
+        with task_metrics.stage("vad"):
+            time.sleep(0.05)
+
+    stage = task_metrics.as_dict()["stages"]["vad"]
+    assert stage["seconds"] >= 0.1
+    assert stage["rtf"] is None
+
+
+def test_recording_is_per_thread():
+    """Only code on the recording thread sees the metrics of its task."""
+    task_metrics = TaskMetrics()
+    seen = []
+
+    with task_metrics.recording():
+        assert current_task_metrics() is task_metrics
+        thread = threading.Thread(target=lambda: seen.append(current_task_metrics()))
+        thread.start()
+        thread.join()
+    assert seen == [None]
+    assert current_task_metrics() is None
+
+
+def test_measured_vad_records_on_the_task_thread():
+    """The VAD of a loaded pipeline is recorded as a stage and still is a whisperx Vad."""
+    pipeline = type("Pipeline", (), {})()
+    pipeline.vad_model = FakeVad()
+    measure_vad(measure_vad(pipeline))
+    task_metrics = TaskMetrics()
+
+    assert isinstance(pipeline.vad_model, Vad)
+    assert pipeline.vad_model({"waveform": np.zeros(16000)}) == []
+    with task_metrics.recording():
+        pipeline.vad_model({"waveform": np.zeros(16000)})
+    assert list(task_metrics.as_dict()["stages"]) == ["vad"]
+
+
+def test_histogram_exposition():
+    """Histograms are cumulative per stage, in the Prometheus text format."""
+    histogram = Histogram("test_seconds", "Test histogram.", (1, 5))
+    for value in (0.5, 3, 10):
+        histogram.observe("asr", value)
+
+    assert histogram.render() == [
+        "# HELP test_seconds Test histogram.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{stage="asr",le="1"} 1',
+        'test_seconds_bucket{stage="asr",le="5"} 2',
+        'test_seconds_bucket{stage="asr",le="+Inf"} 3',
+        'test_seconds_sum{stage="asr"} 13.5',
+        'test_seconds_count{stage="asr"} 3',
+    ]
+
+
+def test_export_observes_every_stage(monkeypatch):
+    """Exporting the metrics of a task adds its stages to the histograms."""
+    seconds = Histogram("test_seconds", "", metrics.SECONDS_BUCKETS)
+    monkeypatch.setattr(metrics, "stage_seconds", seconds)
+    task_metrics = TaskMetrics(audio_seconds=60)
+    task_metrics.measure("decode", time.sleep, 0)
+
+    exported = task_metrics.export(total_seconds=1.0)
+
+    assert set(exported["stages"]) == {"decode", "total"}
+    assert 'test_seconds_count{stage="total"} 1' in seconds.render()
+
+
+def test_gpu_peak_is_per_stage(monkeypatch):
+    """Stages get the peak allocated by torch while they ran, nested stages keep the outer peak."""
+    cuda = FakeCuda()
+    monkeypatch.setitem(sys.modules, "torch", SimpleNamespace(cuda=cuda))
+    task_metrics = TaskMetrics()
+
+    with task_metrics.stage("load"):
+        cuda.allocate(1000)
+        cuda.allocate(-600)
+    with task_metrics.stage("asr"):
+        cuda.allocate(500)
+        cuda.allocate(-500)
+        with task_metrics.stage("vad"):
+            cuda.allocate(100)
+            cuda.allocate(-100)
+
+    stages = task_metrics.as_dict()["stages"]
+    assert stages["load"]["gpu_peak_mb"] == 1000
+    assert stages["asr"]["gpu_peak_mb"] == 900
+    assert stages["vad"]["gpu_peak_mb"] == 500
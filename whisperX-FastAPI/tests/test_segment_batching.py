@@ -0,0 +1,153 @@
+"""Tests for the segment_batching module."""
+
+import threading
+from unittest.mock import Mock, patch
+
+import numpy as np
+import pytest
+import torch
+
+from app import segment_batching
+from app.model_cache import whisper_models
+from app.segment_batching import SegmentBatcher
+
+SAMPLE_RATE = 16000
+
+
+class FakeWhisperModel:
+    """Stands in for the faster-whisper model, answering with the length of each segment."""
+
+    def __init__(self):
+        self.feat_kwargs = {"feature_size": 80}
+        self.hf_tokenizer = None
+        self.model = Mock(is_multilingual=True)
+        self.batch_sizes = []
+
+    def generate_segment_batched(self, features, tokenizer, options):
+        self.batch_sizes.append(len(features))
+        return [f"{tokenizer.language}:{int(feature[0, 0])}" for feature in features]
+
+
+@pytest.fixture
+def model():
+    """A fake pipeline resident in the model registry."""
+    pipeline = Mock(model=FakeWhisperModel(), options=Mock(), suppress_numerals=False)
+    whisper_models.clear()
+    with (
+        patch.object(
+            segment_batching,
+            "log_mel_spectrogram",
+            side_effect=lambda audio, n_mels, padding: torch.full(
+                (n_mels, 10), float(len(audio))
+            ),
+        ),
+        patch.object(
+            segment_batching,
+            "Tokenizer",
+            side_effect=lambda *args, task, language: Mock(language=language),
+        ),
+    ):
+        yield pipeline
+    whisper_models.clear()
+
+
+def segments(*lengths):
+    """Return back to back VAD segments of the given lengths in seconds."""
+    result, start = [], 0.0
+    for length in lengths:
+        result.append({"start": start, "end": start + length})
+        start += length
+    return result
+
+
+def run_tasks(batcher, tasks):
+    """Transcribe ``tasks`` (vad segments, language) concurrently and return the results."""
+    audio = np.zeros(60 * SAMPLE_RATE, dtype=np.float32)
+    results = [None] * len(tasks)
+
+    def run(index, vad_segments, language):
+        results[index] = batcher.transcribe(
+            audio, vad_segments, language, "transcribe", 4
+        )
+
+    threads = [
+        threading.Thread(target=run, args=(index, *task))
+        for index, task in enumerate(tasks)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return results
+
+
+def test_segments_of_concurrent_tasks_share_batches(model):
+    """Segments of two tasks are combined into full batches and routed back."""
+    batcher = SegmentBatcher("key", lambda: model, "cpu", 0, max_delay=1.0)
+
+    first, second = run_tasks(
+        batcher, [(segments(1, 2, 3), "en"), (segments(4, 5, 6), "en")]
+    )
+
+    assert model.model.batch_sizes == [4, 2]
+    assert [segment["text"] for segment in first] == [
+        "en:16000",
+        "en:32000",
+        "en:48000",
+    ]
+    assert [segment["text"] for segment in second] == [
+        "en:64000",
+        "en:80000",
+        "en:96000",
+    ]
+    assert second[1]["start"] == 4.0
+    assert batcher.stats()["mean_batch_size"] == 3
+
+
+def test_languages_are_not_mixed_in_a_batch(model):
+    """Segments needing different tokenizer prompts run in separate batches."""
+    batcher = SegmentBatcher("key", lambda: model, "cpu", 0, max_delay=0.2)
+
+    english, german = run_tasks(batcher, [(segments(1, 2), "en"), (segments(3), "de")])
+
+    assert sorted(model.model.batch_sizes) == [1, 2]
+    assert [segment["text"] for segment in english] == ["en:16000", "en:32000"]
+    assert [segment["text"] for segment in german] == ["de:48000"]
+
+
+def test_forward_errors_reach_the_owning_tasks(model):
+    """A failing forward raises in the tasks whose segments it held."""
+    model.model.generate_segment_batched = Mock(
+        side_effect=RuntimeError("out of memory")
+    )
+    batcher = SegmentBatcher("key", lambda: model, "cpu", 0, max_delay=0.01)
+
+    with pytest.raises(RuntimeError):
+        batcher.transcribe(
+            np.zeros(SAMPLE_RATE, np.float32), segments(1), "en", "transcribe", 4
+        )
+
+
+def test_segments_are_reported_per_forward(model):
+    """Without batching across tasks, the segments of each forward are reported once decoded."""
+    model.preset_language = "en"
+    reports = []
+    with patch.object(
+        segment_batching, "detect_speech", return_value=segments(1, 2, 3)
+    ):
+        result = segment_batching.transcribe_segments(
+            model,
+            np.zeros(6 * SAMPLE_RATE, np.float32),
+            None,
+            "transcribe",
+            2,
+            20,
+            reports.append,
+        )
+
+    assert model.model.batch_sizes == [2, 1]
+    assert [[segment["text"] for segment in report] for report in reports] == [
+        ["en:16000", "en:32000"],
+        ["en:48000"],
+    ]
+    assert result == {"segments": reports[0] + reports[1], "language": "en"}
@@ -1,5 +1,7 @@
 """Tests for the whisperx_services module."""
 
+import threading
+import time
 from unittest.mock import Mock, patch
 
 import pandas as pd
@@ -12,22 +14,42 @@ from app.schemas import (
     ComputeType,
     Device,
     DiarizationParams,
+    DraftParams,
     InterpolateMethod,
     SpeechToTextProcessingParams,
     TaskEnum,
     VADOptions,
     WhisperModel,
     WhisperModelParams,
+    query_defaults,
 )
+from app import segment_batching, whisperx_services
+from app.artifact_cache import ArtifactCache
+from app.model_cache import align_models, diarization_pipelines, whisper_models
+from app.progress import TaskProgress, reporting
 from app.whisperx_services import (
     align_whisper_output,
+    detect_language_with_whisper,
     device,
     diarize,
     process_audio_common,
     transcribe_with_whisper,
+    warm_up_align_models,
+    warm_up_diarization,
+    warm_up_whisper,
 )
 
 
+@pytest.fixture(autouse=True)
+def clear_model_caches():
+    """Make sure no mocked model stays resident between tests."""
+    for registry in (whisper_models, align_models, diarization_pipelines):
+        registry.clear()
+    yield
+    for registry in (whisper_models, align_models, diarization_pipelines):
+        registry.clear()
+
+
 @pytest.fixture
 def audio_data():
     """Mock audio data for testing."""
@@ -114,6 +136,112 @@ def test_transcribe_with_whisper_cpu(audio_data, mock_whisper_model):
         assert "language" in result
 
 
+def test_transcribe_with_whisper_reuses_cached_model(audio_data, mock_whisper_model):
+    """Test that repeated transcriptions with the same configuration load the model once."""
+    with patch(
+        "app.whisperx_services.load_model", return_value=mock_whisper_model
+    ) as mock_load:
+        for _ in range(2):
+            transcribe_with_whisper(
+                audio=audio_data,
+                task="transcribe",
+                asr_options={},
+                vad_options={},
+                language="en",
+                model=WhisperModel.tiny,
+                device="cpu",
+                compute_type="float32",
+            )
+
+        assert mock_load.call_count == 1
+        assert mock_whisper_model.transcribe.call_count == 2
+        assert whisper_models.stats()["hits"] == 1
+
+
+def test_language_detection_shares_the_model_of_all_languages(
+    audio_data, mock_whisper_model, monkeypatch
+):
+    """Test that detection and transcription without a model language load one model."""
+    monkeypatch.setattr(whisperx_services.Config, "ASR_BATCHING", False)
+    mock_whisper_model.detect_language.return_value = "de"
+    options = dict(
+        task="transcribe",
+        asr_options={},
+        vad_options={},
+        model=WhisperModel.tiny,
+        device="cpu",
+        compute_type="float32",
+    )
+    with patch(
+        "app.whisperx_services.load_model", return_value=mock_whisper_model
+    ) as mock_load:
+        assert detect_language_with_whisper(audio=audio_data, **options) == "de"
+        for language in ("de", "en"):
+            transcribe_with_whisper(
+                audio=audio_data, language=language, model_language=False, **options
+            )
+
+    assert mock_load.call_count == 1
+    assert mock_load.call_args.kwargs["language"] is None
+    assert [
+        call.kwargs["language"] for call in mock_whisper_model.transcribe.call_args_list
+    ] == ["de", "en"]
+
+
+@pytest.mark.parametrize("supported", [True, False])
+def test_segments_are_reported_per_forward_only_on_supported_whisperx(
+    audio_data, mock_whisper_model, monkeypatch, supported
+):
+    """Test that other whisperx releases transcribe with the pipeline instead of its internals."""
+    monkeypatch.setattr(whisperx_services.Config, "ASR_BATCHING", True)
+    monkeypatch.setattr(segment_batching, "PIPELINE_INTERNALS_SUPPORTED", supported)
+    streamed = {
+        "segments": [{"start": 0.0, "end": 1.0, "text": " Hi"}],
+        "language": "en",
+    }
+    with (
+        patch("app.whisperx_services.load_model", return_value=mock_whisper_model),
+        patch.object(segment_batching, "transcribe_batched", return_value=streamed),
+        reporting(TaskProgress("task")),
+    ):
+        result = transcribe_with_whisper(
+            audio=audio_data,
+            task="transcribe",
+            asr_options={},
+            vad_options={},
+            language="en",
+            model=WhisperModel.tiny,
+            device="cpu",
+            compute_type="float32",
+        )
+
+    assert result == (
+        streamed if supported else mock_whisper_model.transcribe.return_value
+    )
+    assert mock_whisper_model.transcribe.called is not supported
+
+    monkeypatch.setattr(whisperx_services.Config, "ASR_BATCHING", False)
+    with (
+        patch("app.whisperx_services.load_model", return_value=mock_whisper_model),
+        patch.object(
+            segment_batching, "transcribe_segments", return_value=streamed
+        ) as transcribe_segments,
+        reporting(TaskProgress("task")),
+    ):
+        transcribe_with_whisper(
+            audio=audio_data,
+            task="transcribe",
+            asr_options={},
+            vad_options={},
+            language="en",
+            model=WhisperModel.tiny,
+            device="cpu",
+            compute_type="float32",
+        )
+
+    assert transcribe_segments.called is supported
+
+
 @pytest.mark.skipif(not torch.cuda.is_available(), reason="CUDA not available")
 def test_diarize_gpu(audio_data, mock_diarization_pipeline):
     """Test diarize function with GPU."""
@@ -129,6 +257,82 @@ def test_diarize_gpu(audio_data, mock_diarization_pipeline):
         assert result["segment"].isna().all()  # Verify segment column is all None
 
 
+def test_warm_up_whisper_serves_default_requests(mock_whisper_model, monkeypatch):
+    """Test that the warmed-up model is the one a request with default options uses."""
+    monkeypatch.setattr(whisperx_services.Config, "ASR_BATCHING", False)
+    with patch(
+        "app.whisperx_services.load_model", return_value=mock_whisper_model
+    ) as mock_load:
+        warm_up_whisper(language="de", model="tiny", device="cpu", compute_type="int8")
+        request = WhisperModelParams(
+            **{
+                **query_defaults(WhisperModelParams),
+                "language": "de",
+                "model": "tiny",
+                "device": "cpu",
+                "compute_type": "int8",
+            }
+        )
+        transcribe_with_whisper(
+            audio=torch.zeros(16000).numpy(),
+            task=request.task.value,
+            asr_options=ASROptions(**query_defaults(ASROptions)),
+            vad_options=VADOptions(**query_defaults(VADOptions)),
+            language=request.language,
+            batch_size=request.batch_size,
+            chunk_size=request.chunk_size,
+            model=request.model,
+            device=request.device,
+            device_index=request.device_index,
+            compute_type=request.compute_type,
+            threads=request.threads,
+        )
+
+    assert mock_load.call_count == 1
+    assert mock_whisper_model.transcribe.call_count == 2
+    assert whisper_models.stats()["hits"] == 1
+
+
+def test_warm_up_runs_models_on_clip(mock_align_model, mock_diarization_pipeline):
+    """Test that alignment and diarization warm-up run the models on the given clip."""
+    clip = torch.zeros(16000).numpy()
+    with (
+        patch(
+            "app.whisperx_services.load_align_model",
+            return_value=(mock_align_model, {}),
+        ),
+        patch(
+            "app.whisperx_services.align", return_value={"segments": []}
+        ) as mock_align,
+        patch(
+            "app.whisperx_services.DiarizationPipeline",
+            return_value=mock_diarization_pipeline,
+        ),
+    ):
+        failed = warm_up_align_models(["de"], device="cpu", audio=clip)
+        warm_up_diarization(device="cpu", audio=clip)
+
+    assert failed == []
+    assert mock_align.call_args.args[3] is clip
+    mock_diarization_pipeline.assert_called_once_with(audio=clip)
+
+
+def test_diarize_reuses_pipeline(audio_data, mock_diarization_pipeline):
+    """Test that the diarization pipeline is constructed once per device."""
+    with patch(
+        "app.whisperx_services.DiarizationPipeline",
+        return_value=mock_diarization_pipeline,
+    ) as mock_pipeline_cls:
+        load_seconds = warm_up_diarization(device="cpu")
+        for _ in range(2):
+            result = diarize(audio=audio_data, device="cpu", min_speakers=1)
+
+        assert isinstance(result, pd.DataFrame)
+        assert load_seconds >= 0
+        assert mock_pipeline_cls.call_count == 1
+        assert mock_diarization_pipeline.call_count == 2
+
+
 def test_align_whisper_output(audio_data, mock_align_model):
     """Test align_whisper_output function."""
     transcript = [{"text": "Test", "start": 0.0, "end": 1.0}]
@@ -152,6 +356,38 @@ def test_align_whisper_output(audio_data, mock_align_model):
             assert isinstance(result["segments"], list)
 
 
+def test_align_whisper_output_reuses_cached_model(audio_data, mock_align_model):
+    """Test that alignment models are loaded once per language and model name."""
+    transcript = [{"text": "Test", "start": 0.0, "end": 1.0}]
+
+    with patch(
+        "app.whisperx_services.load_align_model", return_value=(mock_align_model, {})
+    ) as mock_load:
+        with patch(
+            "app.whisperx_services.align", return_value={"segments": transcript}
+        ):
+            for language_code in ("de", "de", "en"):
+                align_whisper_output(
+                    transcript=transcript,
+                    audio=audio_data,
+                    language_code=language_code,
+                    device="cpu",
+                )
+
+        assert mock_load.call_count == 2
+        assert align_models.stats()["hits"] == 1
+
+
+def test_warm_up_align_models(mock_align_model):
+    """Test that warm-up preloads the configured languages."""
+    with patch(
+        "app.whisperx_services.load_align_model", return_value=(mock_align_model, {})
+    ):
+        warm_up_align_models(["de", "en"], device="cpu")
+
+    assert len(align_models.keys()) == 2
+
+
 @pytest.mark.skipif(not torch.cuda.is_available(), reason="CUDA not available")
 def test_process_audio_common_gpu(
     audio_data, mock_whisper_model, mock_align_model, mock_diarization_pipeline
@@ -268,3 +504,256 @@ def test_error_handling():
             device=Device.cpu,
             compute_type=ComputeType.float16,  # This should raise an error on CPU
         )
+
+
+def cpu_processing_params(audio, identifier, audio_hash=None, min_speakers=None):
+    """Return parameters of a full speech-to-text run on CPU."""
+    return SpeechToTextProcessingParams(
+        audio=audio,
+        identifier=identifier,
+        audio_hash=audio_hash,
+        whisper_model_params=WhisperModelParams(
+            language="en",
+            model=WhisperModel.tiny,
+            device=Device.cpu,
+            device_index=0,
+            compute_type=ComputeType.int8,
+            task=TaskEnum.transcribe,
+            threads=0,
+            batch_size=8,
+            chunk_size=20,
+        ),
+        asr_options=ASROptions(
+            beam_size=5,
+            best_of=5,
+            patience=1,
+            length_penalty=1,
+            temperatures=0.0,
+            compression_ratio_threshold=2.4,
+            log_prob_threshold=-1.0,
+            no_speech_threshold=0.6,
+            initial_prompt=None,
+            suppress_tokens=[-1],
+            suppress_numerals=True,
+            hotwords=None,
+        ),
+        vad_options=VADOptions(vad_onset=0.5, vad_offset=0.363),
+        alignment_params=AlignmentParams(
+            align_model=None,
+            interpolate_method=InterpolateMethod.nearest,
+            return_char_alignments=False,
+        ),
+        diarization_params=DiarizationParams(
+            min_speakers=min_speakers, max_speakers=None
+        ),
+    )
+
+
+def test_diarization_runs_concurrently_with_transcription(audio_data):
+    """Diarization overlaps ASR and alignment, and the stage timings are recorded."""
+    diarization_started = threading.Event()
+    params = cpu_processing_params(audio_data, "test-456")
+
+    def fake_transcribe(**kwargs):
+        # Only returns once diarization is running next to it
+        assert diarization_started.wait(timeout=5)
+        return {"segments": [], "language": "en"}
+
+    def fake_diarize(audio, **kwargs):
+        diarization_started.set()
+        return pd.DataFrame()
+
+    with (
+        patch(
+            "app.whisperx_services.transcribe_with_whisper", side_effect=fake_transcribe
+        ),
+        patch(
+            "app.whisperx_services.align_whisper_output",
+            return_value={"segments": [], "word_segments": []},
+        ),
+        patch("app.whisperx_services.diarize", side_effect=fake_diarize),
+        patch(
+            "app.whisperx_services.assign_word_speakers",
+            return_value={"segments": [], "word_segments": []},
+        ),
+        patch("app.whisperx_services.update_task_status_in_db") as update,
+    ):
+        process_audio_common(params, session=Mock())
+
+    result_update, metrics_update = update.call_args_list
+    assert result_update.kwargs["update_data"]["status"] == "completed"
+    metrics = metrics_update.kwargs["update_data"]["metrics"]
+    assert metrics["audio_seconds"] == len(audio_data) / 16000
+    assert set(metrics["stages"]) == {
+        "transcription",
+        "alignment",
+        "diarization",
+        "diarization_wait",
+        "speaker_assignment",
+        "db_write",
+        "total",
+    }
+    total = metrics["stages"]["total"]
+    assert total["rtf"] == total["seconds"] / metrics["audio_seconds"]
+
+
+@pytest.mark.parametrize("error", [RuntimeError("alignment failed"), TypeError("bug")])
+def test_failed_alignment_waits_for_diarization(audio_data, error):
+    """Diarization is finished before a task whose alignment failed is released."""
+    diarization_started = threading.Event()
+    diarization_finished = threading.Event()
+    params = cpu_processing_params(audio_data, "test-789")
+
+    def fake_diarize(audio, **kwargs):
+        diarization_started.set()
+        time.sleep(0.2)
+        diarization_finished.set()
+        return pd.DataFrame()
+
+    def fake_align(**kwargs):
+        # Fails while diarization is running, so it cannot be cancelled anymore
+        assert diarization_started.wait(timeout=5)
+        raise error
+
+    with (
+        patch(
+            "app.whisperx_services.transcribe_with_whisper",
+            return_value={"segments": [], "language": "en"},
+        ),
+        patch("app.whisperx_services.align_whisper_output", side_effect=fake_align),
+        patch("app.whisperx_services.diarize", side_effect=fake_diarize),
+        patch("app.whisperx_services.update_task_status_in_db") as update,
+    ):
+        if isinstance(error, RuntimeError):
+            process_audio_common(params, session=Mock())
+            assert update.call_args.kwargs["update_data"]["status"] == "failed"
+        else:
+            with pytest.raises(TypeError):
+                process_audio_common(params, session=Mock())
+
+    assert diarization_finished.is_set()
+
+
+def test_resubmission_resumes_from_cached_stages(audio_data, tmp_path, monkeypatch):
+    """Only diarization runs again when just the speaker settings change."""
+    monkeypatch.setattr(
+        whisperx_services,
+        "artifact_cache",
+        ArtifactCache(str(tmp_path / "artifacts"), max_mb=10),
+    )
+
+    with (
+        patch(
+            "app.whisperx_services.transcribe_with_whisper",
+            return_value={"segments": [], "language": "en"},
+        ) as transcribe,
+        patch(
+            "app.whisperx_services.align_whisper_output",
+            return_value={"segments": [], "word_segments": []},
+        ) as align,
+        patch(
+            "app.whisperx_services.diarize", return_value=pd.DataFrame()
+        ) as diarize_mock,
+        patch(
+            "app.whisperx_services.assign_word_speakers",
+            side_effect=lambda *args: {"segments": [], "word_segments": []},
+        ),
+        patch("app.whisperx_services.update_task_status_in_db") as update,
+    ):
+        for min_speakers in (None, 2, 2):
+            process_audio_common(
+                cpu_processing_params(audio_data, "test-789", "abc", min_speakers),
+                session=Mock(),
+            )
+
+    assert transcribe.call_count == 1
+    assert align.call_count == 1
+    assert diarize_mock.call_count == 2
+    statuses = [
+        call.kwargs["update_data"].get("status") for call in update.call_args_list
+    ]
+    assert [status for status in statuses if status] == ["completed"] * 3
+
+
+def test_draft_is_stored_before_the_final_result(audio_data):
+    """The draft model transcribes first, the final result then replaces its draft."""
+    params = cpu_processing_params(audio_data, "test-draft")
+    params.whisper_model_params.model = WhisperModel.large_v3
+    params.draft_params = DraftParams(draft_model=WhisperModel.tiny)
+
+    def fake_transcribe(model, **kwargs):
+        return {
+            "segments": [
+                {
+                    "start": 0.0,
+                    "end": 1.0,
+                    "text": f" {model.value}",
+                    "avg_logprob": -0.1,
+                }
+            ],
+            "language": "en",
+        }
+
+    with (
+        patch(
+            "app.whisperx_services.transcribe_with_whisper", side_effect=fake_transcribe
+        ) as transcribe,
+        patch(
+            "app.whisperx_services.align_whisper_output",
+            return_value={"segments": [], "word_segments": []},
+        ),
+        patch("app.whisperx_services.diarize", return_value=pd.DataFrame()),
+        patch(
+            "app.whisperx_services.assign_word_speakers",
+            return_value={"segments": [], "word_segments": []},
+        ),
+        patch("app.whisperx_services.update_task_status_in_db") as update,
+    ):
+        process_audio_common(params, session=Mock())
+
+    assert [call.kwargs["model"] for call in transcribe.call_args_list] == [
+        WhisperModel.tiny,
+        WhisperModel.large_v3,
+    ]
+    draft_update, result_update, _ = update.call_args_list
+    assert draft_update.kwargs["update_data"] == {
+        "draft_result": {
+            "model": "tiny",
+            "language": "en",
+            "segments": [{"start": 0.0, "end": 1.0, "text": " tiny"}],
+        }
+    }
+    assert result_update.kwargs["update_data"]["status"] == "completed"
+    assert result_update.kwargs["update_data"]["draft_result"] is None
+
+
+def test_failing_draft_does_not_fail_the_task(audio_data):
+    """An error of the draft model, e.g. a failed download, only skips the draft."""
+    params = cpu_processing_params(audio_data, "test-draft-error")
+    params.whisper_model_params.model = WhisperModel.large_v3
+    params.draft_params = DraftParams(draft_model=WhisperModel.tiny)
+
+    def fake_transcribe(model, **kwargs):
+        if model == WhisperModel.tiny:
+            raise OSError("Model download failed")
+        return {"segments": [], "language": "en"}
+
+    with (
+        patch(
+            "app.whisperx_services.transcribe_with_whisper", side_effect=fake_transcribe
+        ),
+        patch(
+            "app.whisperx_services.align_whisper_output",
+            return_value={"segments": [], "word_segments": []},
+        ),
+        patch("app.whisperx_services.diarize", return_value=pd.DataFrame()),
+        patch(
+            "app.whisperx_services.assign_word_speakers",
+            return_value={"segments": [], "word_segments": []},
+        ),
+        patch("app.whisperx_services.update_task_status_in_db") as update,
+    ):
+        process_audio_common(params, session=Mock())
+
+    result_update, _ = update.call_args_list
+    assert result_update.kwargs["update_data"]["status"] == "completed"